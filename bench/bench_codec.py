@@ -0,0 +1,96 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+#!/usr/bin/env python
+'''
+bench_codec.py
+
+micro-benchmark for the emtools.msg.jsonmsg JSON codec: decoding, compact
+(wire) encoding and pretty (human) encoding of representative messages,
+for each installed backend, as the message size grows
+'''
+import getopt
+import sys
+import timeit
+
+import emtools.msg.jsonmsg as jsonmsg
+from bench_jsonmsg import fact_reply, command_reply, config_request
+
+def usage():
+    print '''usage: bench_codec.py [-n hosts,...] [-r repeat] [-s stdout_bytes]
+
+    -n hosts    comma separated numbers of hosts/items per message (default 10,100,1000)
+    -r repeat   number of times each message is encoded/decoded (default 20)
+    -s bytes    size of the calpontConsole stdout in each CommandReply item (default 2000)
+    '''
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
+        opts, args = getopt.getopt(argv, 'n:r:s:h')
+    except getopt.GetoptError, err:
+        print str(err)
+        usage()
+        sys.exit(2)
+
+    sizes = [ 10, 100, 1000 ]
+    repeat = 20
+    stdout_bytes = 2000
+    for o, a in opts:
+        if o == '-n':
+            sizes = [ int(n) for n in a.split(',') ]
+        elif o == '-r':
+            repeat = int(a)
+        elif o == '-s':
+            stdout_bytes = int(a)
+        elif o == '-h':
+            usage()
+            sys.exit(0)
+
+    backends = []
+    for name in jsonmsg.BACKENDS:
+        try:
+            jsonmsg.use_backend(name)
+            backends.append(name)
+        except ImportError:
+            print '%s is not installed' % name
+
+    cases = []
+    for n in sizes:
+        cr = command_reply(n)
+        for r in cr['replies']:
+            r['stdout'] = 'x' * stdout_bytes
+        cases += [ ('FactReply', n, fact_reply(n)),
+                   ('CommandReply', n, cr),
+                   ('ConfigRequest', n, config_request(n)) ]
+
+    print '%-10s %-14s %6s %10s %10s %10s %10s' % ('backend', 'message', 'hosts', 'bytes',
+                                                   'loads MB/s', 'wire MB/s', 'pretty MB/s')
+    for name in backends:
+        jsonmsg.use_backend(name)
+        for msg, n, d in cases:
+            s = jsonmsg.dumps(d)
+            mb = len(s) * repeat / 1e6
+            t_loads = min(timeit.repeat(lambda: jsonmsg.loads(s), number=repeat, repeat=3))
+            t_wire = min(timeit.repeat(lambda: jsonmsg.dumps(d), number=repeat, repeat=3))
+            t_pretty = min(timeit.repeat(lambda: jsonmsg.dumps(d, jsonmsg.PRETTY), number=repeat, repeat=3))
+            print '%-10s %-14s %6d %10d %10.1f %10.1f %10.1f' % (name, msg, n, len(s),
+                                                                 mb / t_loads, mb / t_wire, mb / t_pretty)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA. 
+
+#!/usr/bin/env python
+'''
+bench_console.py
+
+micro-benchmark for the calpontConsole output parsers in
+emtools.cluster.console using synthetic output for a large cluster
+'''
+import getopt
+import sys
+import timeit
+
+import emtools.cluster.console as console
+
+def system_output(nmodules):
+    out = [ 'getsystemstatus   Mon Feb 17 01:20:16 2014',
+            '',
+            'System and Module statuses',
+            '',
+            'Component     Status                       Last Status Change',
+            '------------  --------------------------   ------------------------',
+            'System        ACTIVE                       Mon Feb  3 22:36:19 2014',
+            '' ]
+    for i in range(nmodules):
+        out.append('Module pm%-4d ACTIVE                       Mon Feb  3 22:35:52 2014' % (i + 1))
+    out.append('')
+    out.append("Active Parent OAM Performance Module is 'pm1'")
+    return '\n'.join(out)
+
+def process_output(nmodules):
+    out = [ 'getprocessstatus   Mon Feb 17 01:18:20 2014',
+            '',
+            'InfiniDB Process statuses',
+            '',
+            'Process             Module    Status            Last Status Change        Process ID',
+            '------------------  ------    ---------------   ------------------------  ----------' ]
+    for i in range(nmodules):
+        for proc in ['ProcessMonitor', 'ProcessManager', 'DBRMControllerNode', 'ServerMonitor',
+                     'DBRMWorkerNode', 'PrimProc', 'ExeMgr', 'WriteEngineServer', 'DDLProc', 'DMLProc']:
+            out.append('%-18s  pm%-4d    ACTIVE            Wed Jan 22 14:38:23 2014  %10d' % \
+                       (proc, i + 1, 10000 + i))
+    return '\n'.join(out)
+
+def alarm_output(nalarms):
+    out = [ 'getactivealarms   Sun Mar 23 20:47:45 2014', '' ]
+    for i in range(nalarms):
+        out.extend([ 'AlarmID           = %d' % (i % 40),
+                     'Brief Description = DISK_USAGE_LOW',
+                     'Alarm Severity    = MINOR',
+                     'Time Issued       = Sun Mar 23 20:42:51 2014',
+                     'Reporting Module  = pm%d' % (i + 1),
+                     'Reporting Process = ServerMonitor',
+                     'Reported Device   = /',
+                     '' ])
+    return '\n'.join(out)
+
+def lock_output(nlocks):
+    out = [ '  Table     LockID  Process  PID    Session  Txn     CreationTime              State    DBRoots' ]
+    for i in range(nlocks):
+        out.append('  test.t%-3d %-6d  DMLProc  17916  14029    340729  Sun Mar 23 20:45:41 2014  LOADING  1,2' % \
+                   (i % 1000, i))
+    return '\n'.join(out)
+
+def usage():
+    print '''usage: bench_console.py [-n modules] [-r repeat]
+
+    -n modules  number of modules/alarms/locks in the synthetic output (default 500)
+    -r repeat   number of calls to time for each parser (default 20)
+    '''
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
+        opts, args = getopt.getopt(argv, 'n:r:h')
+    except getopt.GetoptError, err:
+        print str(err)
+        usage()
+        sys.exit(2)
+
+    nmodules = 500
+    repeat = 20
+    for o, a in opts:
+        if o == '-n':
+            nmodules = int(a)
+        elif o == '-r':
+            repeat = int(a)
+        elif o == '-h':
+            usage()
+            sys.exit(0)
+
+    cases = [ ('getsystemstatus', console.getsystemstatus, system_output(nmodules)),
+              ('getprocessstatus', console.getprocessstatus, process_output(nmodules)),
+              ('getactivealarms', console.getactivealarms, alarm_output(nmodules)),
+              ('gettablelocks', console.gettablelocks, lock_output(nmodules)),
+              ('tablelock_columns', console.tablelock_columns, lock_output(nmodules)),
+              ('iter_tablelocks', lambda s: list(console.iter_tablelocks(s, state='CLEANUP')),
+               lock_output(nmodules)) ]
+
+    print '%-18s %8s %8s %14s %14s' % ('parser', 'lines', 'bytes', 'string ms', 'lines ms')
+    for name, fn, stdout in cases:
+        lines = stdout.split('\n')
+        t_str = min(timeit.repeat(lambda: fn(stdout), number=repeat, repeat=3)) / repeat
+        t_lines = min(timeit.repeat(lambda: fn(iter(lines)), number=repeat, repeat=3)) / repeat
+        print '%-18s %8d %8d %14.3f %14.3f' % (name, len(lines), len(stdout), 
+                                               t_str * 1000, t_lines * 1000)
+
+if __name__ == "__main__":
+    main()
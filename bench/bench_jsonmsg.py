@@ -0,0 +1,123 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+#!/usr/bin/env python
+'''
+bench_jsonmsg.py
+
+micro-benchmark for constructing the emtools.msg messages, both from a
+JSON string and through the *_from_dict helpers
+'''
+import getopt
+import json
+import sys
+import timeit
+
+import emtools.msg.jsonmsg as jsonmsg
+import emtools.msg.errormsg as errormsg
+import emtools.msg.factreq as factreq
+import emtools.msg.factreply as factreply
+import emtools.msg.commandreply as commandreply
+import emtools.msg.configreq as configreq
+import emtools.msg.installreq as installreq
+
+def fact_request(nhosts):
+    return { 'cluster_name' : 'c1', 'ssh_user' : 'root', 'ssh_key' : 'x' * 1600,
+             'hostnames' : [ 'host%d.calpont.com' % i for i in range(nhosts) ] }
+
+def fact_reply(nhosts):
+    instances = {}
+    for i in range(nhosts):
+        instances['host%d.calpont.com' % i] = {
+            'valid' : True, 'reason' : '', 'ip_address' : '10.0.0.%d' % (i % 250),
+            'hostname' : 'host%d' % i, 'os_family' : 'CentOS', 'gluster_version' : '',
+            'hadoop_version' : '', 'infinidb_version' : '4.5.1-2', 'processor_count' : 8,
+            'memory_available' : 16000, 'em_components' : { 'collectd' : '', 'tools' : '' } }
+    return { 'cluster_info' : { 'valid' : True, 'name' : 'c1', 'os_family' : 'CentOS',
+                                'gluster_version' : '', 'hadoop_version' : '',
+                                'infinidb_version' : '4.5.1-2', 'em_version' : '1.0' },
+             'instance_info' : instances,
+             'role_info' : { 'pm1' : 'host0.calpont.com' } }
+
+def command_reply(nhosts):
+    replies = [ { 'command' : 'getprocessstatus', 'rc' : 0, 'stdout' : 'x' * 200, 'stderr' : '',
+                  'results' : { 'pm%d' % i : 'ACTIVE' } } for i in range(nhosts) ]
+    return { 'cluster_name' : 'c1', 'command' : 'getprocessstatus', 'console_host' : 'pm1',
+             'rc' : 0, 'stdout' : '', 'stderr' : '', 'replies' : replies }
+
+def config_request(nhosts):
+    return { 'cluster_name' : 'c1', 'action' : 'setConfig',
+             'set_params' : [ { 'em_category' : 'PM', 'em_parameter' : 'NumBlocksPct',
+                                'value' : '%d' % i } for i in range(nhosts) ] }
+
+def install_request(nhosts):
+    return { 'cluster_name' : 'c1',
+             'cluster_info' : { 'infinidb_version' : '4.5.1-2', 'dbroots_per_pm' : 1,
+                                'infinidb_user' : 'root', 'storage_type' : 'local',
+                                'pm_query' : False, 'um_replication' : False },
+             'role_info' : dict( ('pm%d' % (i + 1), 'host%d.calpont.com' % i) for i in range(nhosts) ) }
+
+def usage():
+    print '''usage: bench_jsonmsg.py [-n hosts] [-r repeat] [-v validation]
+
+    -n hosts    number of hosts/items in each message (default 50)
+    -r repeat   number of messages to construct for each case (default 200)
+    -v validation  validation mode: strict, sample, lazy or none (default strict)
+    '''
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
+        opts, args = getopt.getopt(argv, 'n:r:v:h')
+    except getopt.GetoptError, err:
+        print str(err)
+        usage()
+        sys.exit(2)
+
+    nhosts = 50
+    repeat = 200
+    validation = jsonmsg.STRICT
+    for o, a in opts:
+        if o == '-n':
+            nhosts = int(a)
+        elif o == '-r':
+            repeat = int(a)
+        elif o == '-v':
+            validation = a
+        elif o == '-h':
+            usage()
+            sys.exit(0)
+
+    cases = [ ('ErrorMsg', errormsg.ErrorMsg,
+               lambda d, v: errormsg.ErrorMsg_from_parms(d['msg'], d['cmd'], d['rc'], d['stdout'], d['stderr'], v),
+               { 'failed' : True, 'msg' : 'failed', 'cmd' : 'ls', 'rc' : 1, 'stdout' : 'out', 'stderr' : 'err' }),
+              ('FactRequest', factreq.FactRequest, factreq.FactRequest_from_dict, fact_request(nhosts)),
+              ('FactReply', factreply.FactReply, factreply.FactReply_from_dict, fact_reply(nhosts)),
+              ('CommandReply', commandreply.CommandReply, commandreply.CommandReply_from_dict, command_reply(nhosts)),
+              ('ConfigRequest', configreq.ConfigRequest, configreq.ConfigRequest_from_dict, config_request(nhosts)),
+              ('InstallReq', installreq.InstallReq, installreq.InstallReq_from_dict, install_request(nhosts)) ]
+
+    print '%-14s %8s %14s %14s' % ('message', 'bytes', 'string msg/s', 'dict msg/s')
+    for name, cls, from_dict, d in cases:
+        s = json.dumps(d)
+        t_str = min(timeit.repeat(lambda: cls(s, validation), number=repeat, repeat=3))
+        t_dict = min(timeit.repeat(lambda: from_dict(d, validation), number=repeat, repeat=3))
+        print '%-14s %8d %14.0f %14.0f' % (name, len(s), repeat / t_str, repeat / t_dict)
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ Accepts a config request message as input and produces a config Reply
 '''
 import getopt
 import os, sys
+import pipes
 
 from emtools.playbookmgr import PlaybookMgr
 import emtools.msg.configreq as configreq
@@ -38,9 +39,9 @@ import emtools.common.logutils as logutils
 version = '0.1'
 
 class ConfigGetter(object):
-    def __init__(self, req):
+    def __init__(self, req, pmgr=None):
         self.__req = req
-        self.__pmgr = PlaybookMgr( req['cluster_name'] )
+        self.__pmgr = pmgr if pmgr else PlaybookMgr( req['cluster_name'] )
         schema = { 
             "type":"object",
             "properties": {
@@ -92,9 +93,12 @@ class ConfigGetter(object):
             validator.validate( self.__data, schema )
         except Exception, exc:
             msg = 'Error loading config.json: %s' % exc
-            e = errormsg.ErrorMsg_from_parms(msg=msg)
-            print e
-            sys.exit(1)
+            raise errormsg.ErrorMsg_from_parms(msg=msg)
+        # em_parameter (lower case) -> config.json entry, for set requests
+        self.__index = {}
+        for w in self.__data["infinidbconfig"]:
+            if w.has_key("em_parameter"):
+                self.__index.setdefault( w["em_parameter"].lower(), w )
         
     def run(self, req):
         #for a in req['set_params']:
@@ -104,8 +108,8 @@ class ConfigGetter(object):
             if rc == 0:         
                 parmInfos = []     
                 xml = idbxml.IdbXml( '%s/cluster_files/Calpont.xml' % (self.__pmgr.get_rootdir()) )
-                for w in self.__data["infinidbconfig"]:
-                    value = xml.get_parm( w["xml_section"],w["xml_parameter"] )
+                values = xml.get_parms( [ (w["xml_section"], w["xml_parameter"]) for w in self.__data["infinidbconfig"] ] )
+                for w, value in zip( self.__data["infinidbconfig"], values ):
                     param_info = dict(
                         em_category=w["em_category"],
                         em_parameter=w["xml_parameter"],
@@ -120,32 +124,41 @@ class ConfigGetter(object):
                                                     stderr=err)
             reply = configreply.ConfigReply_from_dict( { "cluster_name" : req['cluster_name'], "config" : parmInfos} )        
         elif req['action'].lower() == 'set':
-            parmInfos = []
+            # look up the Calpont.xml section of every parameter first, so
+            # nothing is set if any of them is unknown
+            cmds = []
             for parms in req['set_params']:
-                #get the section name in Calpont.xml
-                for w in self.__data["infinidbconfig"]:
-                    if w["em_parameter"].lower() == parms['em_parameter'].lower():
-                        break
-                
-                values = ' ' + w["xml_section"] + ' ' + w['xml_parameter'] + ' ' + parms['value']
-                
-                try:
-                    # we don't need the return value.  If it fails we catch the exception
-                    # if it works then we know the value was set
-                    cmdstr = '{{ infinidb_installdir }}/bin/setConfig %s' % values
+                w = self.__index.get( parms['em_parameter'].lower() )
+                if not w or not w.has_key("xml_section") or not w.has_key("xml_parameter"):
+                    return errormsg.ErrorMsg_from_parms(msg="unknown em_parameter: %s" % parms['em_parameter'], rc=1)
+                cmds.append( '{{ infinidb_installdir }}/bin/setConfig %s %s %s' % 
+                             (w["xml_section"], w['xml_parameter'], pipes.quote( parms['value'] )) )
+
+            # all of the parameters are set in one remote shell
+            try:
+                reslt = self.__pmgr.run_commands( 'infinidb', 'pm1', cmds, sudo=False )
+            except errormsg.ErrorMsg, exc:
+                return exc
+            host = reslt['contacted'].keys()[0]
 
-                    self.__pmgr.run_module( 'infinidb', 'pm1', 'command', cmdstr, sudo=False )
-                except errormsg.ErrorMsg, exc:
-                    return exc
-                              
+            parmInfos = []
+            failed = 0
+            for parms, r in zip( req['set_params'], reslt['contacted'][host]['results'] ):
                 param_info = dict(
                     em_category=parms["em_category"],
                     em_parameter=parms['em_parameter'],
                     value=parms['value'],
+                    rc=r['rc']
                 )
+                if r['rc'] != 0:
+                    param_info['stderr'] = r['stderr'] if r['stderr'] else r['stdout']
+                    failed += 1
                 parmInfos.append( param_info )                   
                 
-            reply = configreply.ConfigReply_from_dict( { "cluster_name" : req['cluster_name'], "config" : parmInfos} )  
+            replydict = { "cluster_name" : req['cluster_name'], "config" : parmInfos }
+            if failed:
+                replydict['rc'] = 1
+            reply = configreply.ConfigReply_from_dict( replydict )
         else:
             reply = errormsg.ErrorMsg_from_parms(msg="config requires an action string: get or set")            
             
@@ -219,7 +232,11 @@ def main(argv):
     Log = logutils.getLogger('config')
     Log.info('request: %s' % req.json_dumps())
 
-    fget = ConfigGetter( req )
+    try:
+        fget = ConfigGetter( req )
+    except errormsg.ErrorMsg, exc:
+        print exc
+        sys.exit(1)
     reply = fget.run( req )
 
     Log.info('reply: %s' % reply.json_dumps())
@@ -0,0 +1,274 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+#!/usr/bin/env python
+'''
+emtoolsd.py
+
+Resident server that handles the same JSON requests as the other bin
+utilities without starting a new process for each one.  Can also be used
+as a client to send a request to a running server.
+'''
+import getopt
+import os, sys
+import imp
+import json
+import signal
+
+import emtools.msg.factreq as factreq
+import emtools.msg.commandreq as commandreq
+import emtools.msg.configreq as configreq
+import emtools.msg.playbookreq as playbookreq
+import emtools.msg.inventoryreq as inventoryreq
+import emtools.msg.installreq as installreq
+import emtools.msg.jsonmsg as jsonmsg
+from emtools.server import EmToolsServer, send_request
+import emtools.common.logutils as logutils
+import emtools.common as common
+
+# roll this version for any significant changes
+version = '0.1'
+
+def load_utility(name):
+    '''Loads one of the sibling bin/<name>.py utilities as a module.'''
+    path = '%s/%s.py' % (os.path.dirname(os.path.abspath(__file__)), name)
+    return imp.load_source( 'emtoolsd_%s' % name, path )
+
+getfacts = load_utility('getfacts')
+idbconsole = load_utility('idbconsole')
+config = load_utility('config')
+runplaybook = load_utility('runplaybook')
+writeinventory = load_utility('writeinventory')
+installdatabase = load_utility('installdatabase')
+
+Log = logutils.getLogger('emtoolsd')
+
+#-------------------------------------------------------------------------------
+# request handlers - each returns (rc, reply) matching the bin utility.  The
+# server runs requests in parallel, so each handler holds the lock of its
+# cluster while it uses the cluster's playbook and cached objects
+#-------------------------------------------------------------------------------
+def handle_getfacts(server, jsonstr):
+    req = factreq.FactRequest( jsonstr )
+    Log.info('getfacts request: %s' % req.json_dumps())
+    names = [ req['cluster_name'] ]
+    server.lock_clusters( names )
+    try:
+        fget = getfacts.FactGetter( req, pmgr=server.get_pmgr( req['cluster_name'] ) )
+        return 0, fget.run()
+    finally:
+        server.unlock_clusters( names )
+
+def handle_idbconsole(server, jsonstr):
+    cmd = commandreq.CommandReq( jsonstr )
+    Log.info('idbconsole request: %s' % cmd.json_dumps())
+    names = [ cmd['cluster_name'] ]
+    server.lock_clusters( names )
+    try:
+        runner = idbconsole.ConsoleRunner( cmd, pmgr=server.get_pmgr( cmd['cluster_name'] ) )
+        reply = runner.run()
+    finally:
+        server.unlock_clusters( names )
+    return ( reply['rc'] if reply.has_key('rc') else 0 ), reply
+
+def handle_config(server, jsonstr):
+    req = configreq.ConfigRequest( jsonstr )
+    Log.info('config request: %s' % req.json_dumps())
+    name = req['cluster_name']
+    # config.json is loaded and validated again only when it changes
+    try:
+        mtime = os.stat( '%s/config.json' % common.props['emtools.confdir'] ).st_mtime
+    except OSError:
+        mtime = None
+    names = [ name ]
+    server.lock_clusters( names )
+    try:
+        fget = server.get_cached( name, 'config',
+                                  lambda: config.ConfigGetter( req, pmgr=server.get_pmgr( name ) ),
+                                  stamp=mtime )
+        reply = fget.run( req )
+    finally:
+        server.unlock_clusters( names )
+    return ( reply['rc'] if reply.has_key('rc') else 0 ), reply
+
+def handle_runplaybook(server, jsonstr):
+    req = playbookreq.PlaybookRequest( jsonstr )
+    Log.info('runplaybook request: %s' % req.json_dumps())
+    names = [ req['cluster_name'] ]
+    server.lock_clusters( names )
+    try:
+        reply = runplaybook.run_request( req, pmgr=server.get_pmgr( req['cluster_name'] ) )
+    finally:
+        server.unlock_clusters( names )
+    return reply['rc'], reply
+
+def handle_writeinventory(server, jsonstr):
+    req = inventoryreq.InventoryRequest( jsonstr )
+    Log.info('writeinventory request: %s' % req.json_dumps())
+    names = [ req['cluster_name'] ]
+    server.lock_clusters( names )
+    try:
+        writeinventory.run_request( req, pmgr=server.get_pmgr( req['cluster_name'] ) )
+    finally:
+        server.unlock_clusters( names )
+    return 0, '{ "rc" : 0 }'
+
+def handle_installdatabase(server, jsonstr):
+    req = installreq.InstallReq( jsonstr )
+    Log.info('installdatabase request: %s' % req.json_dumps())
+    names = [ req['cluster_name'] ]
+    server.lock_clusters( names )
+    try:
+        # the install lays down a new playbook for the cluster
+        server.invalidate( req['cluster_name'] )
+        return 0, installdatabase.run_request( req )
+    finally:
+        server.unlock_clusters( names )
+
+def handle_installbatch(server, jsonstr):
+    reqs = [ installreq.InstallReq( json.dumps( r ) ) for r in json.loads( jsonstr ) ]
+    names = [ req['cluster_name'] for req in reqs ]
+    server.lock_clusters( names )
+    try:
+        for req in reqs:
+            Log.info('installbatch request: %s' % req.json_dumps())
+            server.invalidate( req['cluster_name'] )
+        replies = installdatabase.run_batch( reqs )
+    finally:
+        server.unlock_clusters( names )
+    return 0, jsonmsg.dumps( [ r.to_dict() for r in replies ] )
+
+def handle_playbooksync(server, jsonstr):
+    cluster = json.loads( jsonstr )['cluster_name']
+    names = [ cluster ]
+    server.lock_clusters( names )
+    try:
+        server.invalidate( cluster )
+        server.get_pmgr( cluster )
+    finally:
+        server.unlock_clusters( names )
+    return 0, 'Playbook for %s is synced' % cluster
+
+handlers = {
+    'getfacts'        : handle_getfacts,
+    'idbconsole'      : handle_idbconsole,
+    'config'          : handle_config,
+    'runplaybook'     : handle_runplaybook,
+    'writeinventory'  : handle_writeinventory,
+    'installdatabase' : handle_installdatabase,
+    'installbatch'    : handle_installbatch,
+    'playbooksync'    : handle_playbooksync
+}
+
+#-------------------------------------------------------------------------------
+def usage():
+    '''
+    Print command line usage
+    '''
+
+    print 'emtoolsd.py [hvis:c:] [--json=]'
+    print ''
+    print 'Version: %s' % version
+    print ''
+    print 'Without -c this runs the emtools server on a local unix socket.  With'
+    print '-c it sends one request to a running server and prints the reply that'
+    print 'the corresponding utility would print, as compact JSON.  The request'
+    print 'is read from the --json file or from STDIN with -i.'
+    print ''
+    print '    -h            show help'
+    print '    -v            print version'
+    print '    -s <socket>   unix socket path (default emtools.emtoolsd.socket)'
+    print '    -c <type>     send a request of <type> to the server.  One of:'
+    print '                  %s' % ', '.join( sorted( handlers.keys() ) )
+    print '    -i            read request from STDIN'
+    print ''
+    print '    --json <file> read request from <file>'
+
+#-------------------------------------------------------------------------------
+def main(argv):
+    '''
+    main function
+    '''
+
+    try:
+        opts, args = getopt.getopt(argv, "hvis:c:", ['json='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    # defaults
+    use_stdin = False
+    json_file = ''
+    sockpath = common.props['emtools.emtoolsd.socket']
+    reqtype = None
+
+    for o,a in opts:
+        if o == '-h':
+            usage()
+            sys.exit(2)
+        elif o == '-v':
+            print 'emtoolsd.py Version: %s' % version
+            sys.exit(1)
+        elif o == '-i':
+            use_stdin = True
+        elif o == '-s':
+            sockpath = a
+        elif o == '-c':
+            reqtype = a
+        elif o == '--json':
+            json_file = a
+        else:
+            print 'unsupported option: %s' % o
+            usage()
+            sys.exit(2)
+
+    if not reqtype:
+        server = EmToolsServer( sockpath, handlers )
+        Log.info('emtoolsd listening on %s' % sockpath)
+        # exit through the finally below so the socket gets removed
+        signal.signal( signal.SIGTERM, lambda signum, frame: sys.exit(0) )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    if (use_stdin and json_file) or (not use_stdin and not json_file):
+        print 'ERROR: Must specify exactly one of -i or --json'
+        usage()
+        sys.exit(2)
+
+    jsonstr = None
+    if use_stdin:
+        lines = sys.stdin.readlines()
+        jsonstr = ''.join(lines)
+    elif json_file:
+        f = open( json_file )
+        lines = f.readlines()
+        jsonstr = ''.join(lines)
+
+    rc, reply = send_request( sockpath, reqtype, jsonstr )
+    print reply
+    return rc
+
+#-------------------------------------------------------------------------------
+# main entry point
+#-------------------------------------------------------------------------------
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -30,28 +30,51 @@ import emtools.msg.factreq as factreq
 import emtools.msg.factreply as factreply
 import emtools.msg.errormsg as errormsg
 import emtools.idbxml as idbxml
+from emtools.cluster.factcache import FactCache
 import json
 import socket
 import emtools.common.logutils as logutils
+import emtools.common as common
+import emtools.common.hostprobe as hostprobe
 
 # roll this version for any significant changes
 version = '0.1'
 
 class FactGetter(object):
-    def __init__(self, req):
+    def __init__(self, req, forks=None, pmgr=None):
+        '''
+        Constructor.
+        
+        :param req: FactRequest message
+        :param forks: [optional] number of hosts to gather in parallel.  Uses
+                      the emtools.getfacts.forks property if not set.  A
+                      value of 1 gathers one host at a time.
+        :param pmgr: [optional] existing PlaybookMgr for the cluster
+        '''
         self.__req = req
+        if forks is None:
+            forks = common.props['emtools.getfacts.forks']
+        self.__forks = forks
         
-        self.__pmgr = PlaybookMgr( req['cluster_name'] )
+        self.__pmgr = pmgr if pmgr else PlaybookMgr( req['cluster_name'] )
         # TODO - add support for ssh_pass
         ssh_port = None
         if req.has_key('ssh_port'):
             ssh_port = req['ssh_port']
+        self.__ssh_port = int(ssh_port) if ssh_port else 22
         if req.has_key('ssh_key'):
             self.__pmgr.config_ssh( req['ssh_user'], req['ssh_key'], ssh_port=ssh_port )
         else:
             self.__pmgr.config_ssh( req['ssh_user'], ssh_pass=req['ssh_pass'], ssh_port=ssh_port )
             
-        self.__pmgr.write_inventory( 'default', { 'all' : req['hostnames'] })
+        self.__inventory = self.__pmgr.inventory( 'default' )
+        self.__inventory.reset( { 'all' : req['hostnames'] } )
+        self.__inventory.save()
+        self.__fact_module = common.props['emtools.getfacts.fact_module']
+        self.__fact_cache = FactCache( '%s/fact_cache.json' % self.__pmgr.get_rootdir(),
+                                       self.__fact_module,
+                                       common.props['emtools.getfacts.fact_cache_ttl'] )
+        self.__refresh = req.has_key('refresh_facts') and req['refresh_facts']
         self.__role_info = {}
         self.__instance_info = {}
         self.__parsed_idbxml = False
@@ -66,116 +89,249 @@ class FactGetter(object):
             if os.environ.has_key(var):
                 f.write('export %s=%s\n' % (var, os.environ[var]))
                 
+    def probe_hosts(self, hostnames):
+        '''
+        Checks that the ssh port of each host accepts connections.  Hosts 
+        that do not are marked invalid in the instance info right away 
+        rather than waiting on ansible's ssh timeout.  Returns the hosts 
+        that are reachable.
+        
+        :param hostnames: list of hostnames from the inventory
+        '''
+        props = common.props
+        timeout = props['emtools.getfacts.probe_timeout_ms']
+        if timeout <= 0:
+            return hostnames
+        dead = hostprobe.probe_hosts( hostnames, self.__ssh_port, timeout / 1000.0,
+                                      props['emtools.getfacts.probe_retries'],
+                                      props['emtools.getfacts.probe_backoff_ms'] / 1000.0,
+                                      props['emtools.getfacts.probe_concurrency'] )
+        for h, reason in dead.iteritems():
+            self.__instance_info[h] = dict( valid=False, reason=reason )
+        return [ h for h in hostnames if not dead.has_key(h) ]
+
     def run_host(self, hostname):
         # debug only
         #print 'Running host %s' % hostname
         
-        reslt = self.__pmgr.run_module( 'default', hostname, 'setup', no_raise=True, sudo=False )
+        facts = self.__cached_facts(hostname)
+        if facts is not None:
+            reslt = { 'contacted' : { hostname : { 'ansible_facts' : facts } }, 'dark' : {} }
+        else:
+            reslt = self.__pmgr.run_module( 'default', hostname, self.__fact_module, no_raise=True, sudo=False )
+            self.__cache_facts(reslt)
         
+        def site_facts(h):
+            try:
+                site_reslt = self.__pmgr.run_module( 'default', hostname, 'site_facts', sudo=False )
+            except errormsg.ErrorMsg, exc:
+                return None, exc['msg']
+            return site_reslt['contacted'][h]['ansible_facts'], None
+
         fqdn = ''
+        h = hostname
         for h in reslt['dark']:
-            fqdn = h
-            self.__instance_info[fqdn] = dict( valid=False,
-                                     reason=reslt['dark'][h]['msg'] )
+            fqdn = self.__merge_dark(h, reslt['dark'][h])
         for h in reslt['contacted']:
-            
-            if reslt['contacted'][h].has_key('failed'):
-                # module execution failed, we need to report the error
-                self.__instance_info[h] = dict( valid=False,
-                                         reason=reslt['contacted'][h]['msg'] )
-            elif reslt['contacted'][h].has_key('ansible_facts'):
-                host_facts = reslt['contacted'][h]['ansible_facts']
-                fqdn = host_facts['ansible_fqdn']
-                
-                # do a test here to make sure that the server running emtools
-                # can resolve the FQDN that ansible found.  This guards against
-                # a local, unrouteable hostname.  Note that we already know the
-                # original IP was ok because ansible was able to contact the host
-                try:
-                    # try a lookup
-                    host = socket.gethostbyname(fqdn)
-                except:
-                    # this is bad - it means the hostname is non-routable from the server
-                    self.__instance_info[fqdn] = dict( valid=False,
-                                                    reason='non-routeable FQDN: %s' % h)
-                    continue
-                
-                # we made contact so let's run our site_facts module
-                try:
-                    site_reslt = self.__pmgr.run_module( 'default', hostname, 'site_facts', sudo=False )
-                except errormsg.ErrorMsg, exc:
-                    self.__instance_info[h] = dict( valid=False,
-                                                    reason=exc['msg'] )
+            host_fqdn = self.__merge_contacted(h, reslt['contacted'][h], site_facts)
+            if host_fqdn is not None:
+                fqdn = host_fqdn
 
-                    continue
+        self.__check_idbxml(hostname, fqdn, h)
 
-                site_facts = site_reslt['contacted'][h]['ansible_facts']
+    def run_hosts(self, hostnames):
+        '''
+        Gathers facts for a list of hosts in one batched pass.  The fact
+        and site_facts modules are run together in a single ansible run
+        against the whole list with up to forks hosts in parallel.  Hosts
+        with cached facts only run site_facts.  The per-host results are 
+        merged into the instance info the same way run_host does.
+        
+        :param hostnames: list of hostnames from the inventory
+        '''
+        cached = {}
+        for hostname in hostnames:
+            facts = self.__cached_facts(hostname)
+            if facts is not None:
+                cached[hostname] = facts
+        gather = [ h for h in hostnames if not cached.has_key(h) ]
 
-                self.__instance_info[fqdn] = dict()
-                
-                # this first group of checks will determine whether the node is valid from 
-                # an EM perspective
-                self.__instance_info[fqdn]['homedir'] = site_facts['homedir']                
-                self.__instance_info[fqdn]['python_version'] = host_facts['ansible_python_version']
-                self.__instance_info[fqdn]['sudo'] = site_facts['sudo']
-                valid = True if ( self.__instance_info[fqdn]['sudo'] and
-                                  ( self.__instance_info[fqdn]['python_version'][0:3] == '2.6' or 
-                                    self.__instance_info[fqdn]['python_version'][0:3] == '2.7') ) else False
-                self.__instance_info[fqdn]['valid'] = valid        
-                if not valid:
-                    reason = 'no posswardless sudo' if not self.__instance_info[fqdn]['sudo'] else 'unsupported python version'
-                else:
-                    reason = ''
-                self.__instance_info[fqdn]['reason'] = reason
-                
-                self.__instance_info[fqdn]['ip_address'] = host_facts['ansible_all_ipv4_addresses'][0]
-                self.__instance_info[fqdn]['hostname'] = host_facts['ansible_hostname']
-                self.__instance_info[fqdn]['os_family'] = host_facts['ansible_distribution']                                
-                self.__instance_info[fqdn]['gluster_version'] = site_facts['gluster_version']
-                self.__instance_info[fqdn]['hadoop_version'] = site_facts['hadoop_version']
-                self.__instance_info[fqdn]['pdsh_version'] = site_facts['pdsh_version']
-                self.__instance_info[fqdn]['infinidb_version'] = site_facts['infinidb_version']
-                self.__instance_info[fqdn]['infinidb_installdir'] = site_facts['infinidb_installdir']
-                self.__instance_info[fqdn]['infinidb_user'] = site_facts['infinidb_user']
-                # ansible does not report ansible_processor_vcpus on Mac OS
-                if host_facts.has_key('ansible_processor_vcpus'):
-                    self.__instance_info[fqdn]['processor_count'] = host_facts['ansible_processor_vcpus']
-                else:
-                    self.__instance_info[fqdn]['processor_count'] = host_facts['ansible_processor_cores']                    
-                self.__instance_info[fqdn]['memory_available'] = host_facts['ansible_memtotal_mb']
-                # ansible does not report ansible_swaptotal_mb on Mac OS
-                if host_facts.has_key('ansible_swaptotal_mb'):
-                    self.__instance_info[fqdn]['swap_configured'] = host_facts['ansible_swaptotal_mb']
-                self.__instance_info[fqdn]['em_components'] = {}
-                self.__instance_info[fqdn]['em_components']['collectd'] = site_facts['collectd_version']
-                self.__instance_info[fqdn]['em_components']['python-stack'] = site_facts['python-stack_version']
-                self.__instance_info[fqdn]['em_components']['graphite'] = site_facts['graphite_version']
-                self.__instance_info[fqdn]['em_components']['tools'] = site_facts['tools_version']
-                self.__instance_info[fqdn]['em_components']['oam-server'] = ''
-                self.__instance_info[fqdn]['deployment_type'] = ''
-                self.__instance_info[fqdn]['storage_type'] = ''
-                self.__instance_info[fqdn]['system_name'] = ''
-                self.__instance_info[fqdn]['port3306available'] = site_facts['port3306available']
-            else:
-                # no clue what happened - didn't see Failed but no ansible facts, return the whole result in the reason field
+        reslt = { 'contacted' : {}, 'dark' : {} }
+        site_reslt = { 'contacted' : {}, 'dark' : {} }
+        for hosts, modules in ( ( gather, [ (self.__fact_module, ''), ('site_facts', '') ] ),
+                                ( [ h for h in hostnames if cached.has_key(h) ], [ ('site_facts', '') ] ) ):
+            if not hosts:
+                continue
+            reslts = self.__pmgr.run_modules( 'default', ':'.join(hosts), modules,
+                                              no_raise=True, sudo=False, forks=self.__forks )
+            if isinstance(reslts, errormsg.ErrorMsg):
+                for hostname in hosts:
+                    self.__instance_info[hostname] = dict( valid=False,
+                                                           reason=reslts['msg'] )
+                continue
+            if len(reslts) == 2:
+                self.__cache_facts(reslts[0])
+                for key in ( 'contacted', 'dark' ):
+                    reslt[key].update( reslts[0][key] )
+            for key in ( 'contacted', 'dark' ):
+                site_reslt[key].update( reslts[-1][key] )
+        for hostname, facts in cached.iteritems():
+            reslt['contacted'][hostname] = { 'ansible_facts' : facts }
+
+        def site_facts(h):
+            msg = self.__pmgr.host_error(site_reslt, h)
+            if msg:
+                return None, msg
+            return site_reslt['contacted'][h]['ansible_facts'], None
+
+        fqdns = {}
+        for h in reslt['dark']:
+            fqdns[h] = self.__merge_dark(h, reslt['dark'][h])
+        for h in reslt['contacted']:
+            fqdns[h] = self.__merge_contacted(h, reslt['contacted'][h], site_facts)
+
+        # Calpont.xml discovery stays in request order so the first valid 
+        # InfiniDB host wins just like the serial case
+        for hostname in hostnames:
+            fqdn = fqdns.get(hostname)
+            if fqdn and self.__instance_info.has_key(fqdn):
+                self.__check_idbxml(hostname, fqdn, hostname)
+
+    def __cached_facts(self, hostname):
+        '''Returns the cached facts for hostname, None if they need gathering.'''
+        if self.__refresh:
+            return None
+        return self.__fact_cache.get(hostname)
+
+    def __cache_facts(self, reslt):
+        '''Caches the facts of each host the fact module succeeded on.'''
+        if isinstance(reslt, errormsg.ErrorMsg):
+            return
+        facts = dict( (h, r['ansible_facts']) for h, r in reslt['contacted'].iteritems()
+                      if r.has_key('ansible_facts') and not r.has_key('failed') )
+        self.__fact_cache.put_many(facts)
+
+    def __merge_dark(self, h, host_reslt):
+        '''
+        Records a host that ansible could not contact.  Returns the key used
+        in the instance info.
+        '''
+        fqdn = h
+        self.__instance_info[fqdn] = dict( valid=False,
+                                 reason=host_reslt['msg'] )
+        return fqdn
+
+    def __merge_contacted(self, h, host_reslt, site_facts_fn):
+        '''
+        Records a host that ansible contacted.  Returns the FQDN of the host
+        if setup returned facts, otherwise None.
+        
+        :param h: host name as it appears in the ansible result
+        :param host_reslt: setup module result for h
+        :param site_facts_fn: function returning a (site_facts, error msg) 
+                              tuple for h
+        '''
+        fqdn = None
+        if host_reslt.has_key('failed'):
+            # module execution failed, we need to report the error
+            self.__instance_info[h] = dict( valid=False,
+                                     reason=host_reslt['msg'] )
+        elif host_reslt.has_key('ansible_facts'):
+            host_facts = host_reslt['ansible_facts']
+            fqdn = host_facts['ansible_fqdn']
+            
+            # do a test here to make sure that the server running emtools
+            # can resolve the FQDN that ansible found.  This guards against
+            # a local, unrouteable hostname.  Note that we already know the
+            # original IP was ok because ansible was able to contact the host
+            try:
+                # try a lookup
+                host = socket.gethostbyname(fqdn)
+            except:
+                # this is bad - it means the hostname is non-routable from the server
+                self.__instance_info[fqdn] = dict( valid=False,
+                                                reason='non-routeable FQDN: %s' % h)
+                return fqdn
+            
+            # we made contact so let's get our site_facts module results
+            site_facts, msg = site_facts_fn(h)
+            if site_facts is None:
                 self.__instance_info[h] = dict( valid=False,
-                                         reason='%s' % reslt['contacted'][h] )
+                                                reason=msg )
+                return fqdn
+
+            self.__instance_info[fqdn] = dict()
+            
+            # this first group of checks will determine whether the node is valid from 
+            # an EM perspective
+            self.__instance_info[fqdn]['homedir'] = site_facts['homedir']                
+            self.__instance_info[fqdn]['python_version'] = host_facts['ansible_python_version']
+            self.__instance_info[fqdn]['sudo'] = site_facts['sudo']
+            valid = True if ( self.__instance_info[fqdn]['sudo'] and
+                              ( self.__instance_info[fqdn]['python_version'][0:3] == '2.6' or 
+                                self.__instance_info[fqdn]['python_version'][0:3] == '2.7') ) else False
+            self.__instance_info[fqdn]['valid'] = valid        
+            if not valid:
+                reason = 'no posswardless sudo' if not self.__instance_info[fqdn]['sudo'] else 'unsupported python version'
+            else:
+                reason = ''
+            self.__instance_info[fqdn]['reason'] = reason
+            
+            self.__instance_info[fqdn]['ip_address'] = host_facts['ansible_all_ipv4_addresses'][0]
+            self.__instance_info[fqdn]['hostname'] = host_facts['ansible_hostname']
+            self.__instance_info[fqdn]['os_family'] = host_facts['ansible_distribution']                                
+            self.__instance_info[fqdn]['gluster_version'] = site_facts['gluster_version']
+            self.__instance_info[fqdn]['hadoop_version'] = site_facts['hadoop_version']
+            self.__instance_info[fqdn]['pdsh_version'] = site_facts['pdsh_version']
+            self.__instance_info[fqdn]['infinidb_version'] = site_facts['infinidb_version']
+            self.__instance_info[fqdn]['infinidb_installdir'] = site_facts['infinidb_installdir']
+            self.__instance_info[fqdn]['infinidb_user'] = site_facts['infinidb_user']
+            # ansible does not report ansible_processor_vcpus on Mac OS
+            if host_facts.has_key('ansible_processor_vcpus'):
+                self.__instance_info[fqdn]['processor_count'] = host_facts['ansible_processor_vcpus']
+            else:
+                self.__instance_info[fqdn]['processor_count'] = host_facts['ansible_processor_cores']                    
+            self.__instance_info[fqdn]['memory_available'] = host_facts['ansible_memtotal_mb']
+            # ansible does not report ansible_swaptotal_mb on Mac OS
+            if host_facts.has_key('ansible_swaptotal_mb'):
+                self.__instance_info[fqdn]['swap_configured'] = host_facts['ansible_swaptotal_mb']
+            self.__instance_info[fqdn]['em_components'] = {}
+            self.__instance_info[fqdn]['em_components']['collectd'] = site_facts['collectd_version']
+            self.__instance_info[fqdn]['em_components']['python-stack'] = site_facts['python-stack_version']
+            self.__instance_info[fqdn]['em_components']['graphite'] = site_facts['graphite_version']
+            self.__instance_info[fqdn]['em_components']['tools'] = site_facts['tools_version']
+            self.__instance_info[fqdn]['em_components']['oam-server'] = ''
+            self.__instance_info[fqdn]['deployment_type'] = ''
+            self.__instance_info[fqdn]['storage_type'] = ''
+            self.__instance_info[fqdn]['system_name'] = ''
+            self.__instance_info[fqdn]['port3306available'] = site_facts['port3306available']
+        else:
+            # no clue what happened - didn't see Failed but no ansible facts, return the whole result in the reason field
+            self.__instance_info[h] = dict( valid=False,
+                                     reason='%s' % host_reslt )
+        return fqdn
 
+    def __check_idbxml(self, hostname, fqdn, h):
+        '''
+        If this is the first valid host found with InfiniDB installed, 
+        retrieves and parses its Calpont.xml to fill in the role info.
+        '''
         if not self.__parsed_idbxml and self.__instance_info[fqdn]['valid'] and self.__instance_info[fqdn]['infinidb_version'] and self.__instance_info[fqdn]['sudo']:
             self.__parsed_idbxml = True
             # we found infinidb software.  Run our getinfo playbook to retrieve Calpont.xml
             rc, results, out, err = self.__pmgr.run_playbook('getinfo.yml', 'default', host_subset=hostname)
             if rc == 0:
                 xml = idbxml.IdbXml( '%s/cluster_files/Calpont.xml' % (self.__pmgr.get_rootdir()) )
+                install_info = { 'deployment_type' : xml.get_parm('Installation', 'ServerTypeInstall'),
+                                 'storage_type' : xml.get_parm('Installation', 'DBRootStorageType'),
+                                 'system_name' : xml.get_parm('SystemConfig', 'SystemName') }
+                # hosts in Calpont.xml that were not in the request
+                new_hosts = []
                 for r in xml.get_all_roles():
                     # eoch role here has role= and ip_address= but we need to put
                     # map role to hostname for our reply.
                     role = r['role']
                     ip = r['ip_address']
-                    for i in self.__instance_info.iterkeys():
-                        self.__instance_info[i]['deployment_type'] = xml.get_parm('Installation', 'ServerTypeInstall')
-                        self.__instance_info[i]['storage_type'] = xml.get_parm('Installation', 'DBRootStorageType')
-                        self.__instance_info[i]['system_name'] = xml.get_parm('SystemConfig', 'SystemName')
 
                     host = ''
                     try:
@@ -193,10 +349,24 @@ class FactGetter(object):
                     self.__role_info[role] = host
 
                     # check to see if this host needs to be added to the request
-                    if not self.__instance_info.has_key(host):
+                    if not self.__instance_info.has_key(host) and not self.__inventory.has_host(host):
                         self.__req['hostnames'].append(host)
-                        self.__pmgr.write_inventory( 'default', { 'all' : self.__req['hostnames'] })
+                        self.__inventory.add_host(host)
+                        new_hosts.append(host)
+
+                # the inventory is written once for all of the new hosts
+                self.__inventory.save()
+                new_hosts = self.probe_hosts(new_hosts)
+                if self.__forks > 1:
+                    if new_hosts:
+                        self.run_hosts(new_hosts)
+                else:
+                    for host in new_hosts:
                         self.run_host(host)
+
+                # set after gathering so that the new hosts get them too
+                for i in self.__instance_info.iterkeys():
+                    self.__instance_info[i].update( install_info )
         
                 if self.__instance_info[fqdn]['valid']:
                     # only do these updates if the node is still considered valid - may get set to False
@@ -240,9 +410,16 @@ class FactGetter(object):
         cluster_homedir = ''
         cluster_port3306available = True
         
-        for hostname in self.__req['hostnames']:
-            if not self.__instance_info.has_key(hostname):
-                self.run_host(hostname)
+        pending = [ h for h in self.__req['hostnames'] if not self.__instance_info.has_key(h) ]
+        pending = self.probe_hosts(pending)
+        if self.__forks > 1:
+            if pending:
+                self.run_hosts(pending)
+        else:
+            for hostname in pending:
+                # an earlier host's Calpont.xml may have added it already
+                if not self.__instance_info.has_key(hostname):
+                    self.run_host(hostname)
 
         for i in self.__instance_info.itervalues():
             
@@ -340,7 +517,7 @@ def usage():
     Print command line usage
     '''
 
-    print 'getfacts.py [hvik:] [--json=]'
+    print 'getfacts.py [hvik:f:] [--json=]'
     print ''
     print 'Version: %s' % version
     print ''
@@ -354,6 +531,7 @@ def usage():
     print '    -i            read FactRequest from STDIN'
     print '    -k <file>     prints a JSON-friendly version of the ssh private' 
     print '                  key file <file> for inclusion into a FactRequet'
+    print '    -f <forks>    number of hosts to gather in parallel (1 = serial)'
     print ''
     print '    --json <file> read FactRequest from <file>'
 
@@ -364,7 +542,7 @@ def main(argv):
     '''
     
     try:                                
-        opts, args = getopt.getopt(argv, "hvik:", ['json='])
+        opts, args = getopt.getopt(argv, "hvik:f:", ['json='])
     except getopt.GetoptError:
         usage()
         sys.exit(2)   
@@ -372,6 +550,7 @@ def main(argv):
     # defaults
     use_stdin = False
     json_file = ''
+    forks = None
     
     for o,a in opts:
         if o == '-h':
@@ -389,6 +568,8 @@ def main(argv):
             keystr = ''.join(f.readlines())
             print json.dumps(keystr)
             sys.exit(0)
+        elif o == '-f':
+            forks = int(a)
         else:
             print 'unsupported option: %s' % o
             usage()
@@ -415,7 +596,7 @@ def main(argv):
     # debug only
     # print '%s' % req
     
-    fget = FactGetter( req )
+    fget = FactGetter( req, forks )
     reply = fget.run()
     
     Log.info('reply: %s' % reply.json_dumps())
@@ -31,58 +31,167 @@ import emtools.msg.errormsg as errormsg
 import json
 import re
 import emtools.cluster.console as console
+from emtools.cluster.consolecache import ConsoleCache, is_read_only
 import emtools.common.logutils as logutils
+import emtools.common as common
 
 # roll this version for any significant changes
 version = '0.1'
 
 class ConsoleRunner(object):
-    def __init__(self, cmd):
+    def __init__(self, cmd, pmgr=None):
         self.__cmd = cmd
-        self.__pmgr = PlaybookMgr( cmd['cluster_name'] )
+        self.__pmgr = pmgr if pmgr else PlaybookMgr( cmd['cluster_name'] )
+        self.__cache = None
+        ttl = common.props['emtools.idbconsole.cache_ttl']
+        if ttl > 0:
+            self.__cache = ConsoleCache( '%s/.console_cache.json' % self.__pmgr.get_rootdir(), ttl )
         
     def run(self):
+        if self.__cmd.has_key('commands'):
+            return self.run_batch()
         
-        cmdstr = ''
-        if self.__cmd['command'] == 'gettablelocks':
-            cmdstr = cmdstr + '{{ infinidb_installdir }}/bin/viewtablelock'
-        else:
-            cmdstr = cmdstr + '{{ infinidb_installdir }}/bin/calpontConsole %s' % self.__cmd['command']
+        command = self.__cmd['command']
+        if self.__cache:
+            if not is_read_only( command ):
+                self.__cache.invalidate()
+            else:
+                cached = self.__cache.get( command )
+                if cached:
+                    replydict = { "cluster_name" : self.__cmd['cluster_name'], "command" : command }
+                    replydict.update( cached )
+                    return commandreply.CommandReply_from_dict( replydict )
         
+        cmdstr = self.__console_cmd( command )
+        started = self.__cache.now() if self.__cache else None
         try:
             reslt = self.__pmgr.run_module( 'infinidb', 'pm1', 'command', cmdstr, sudo=False)
         except errormsg.ErrorMsg, exc:
-            replydict = {
-                "cluster_name" : self.__cmd['cluster_name'],
-                "command" : self.__cmd['command'],
-                "console_host" : '',
-                "rc" : exc['rc'],
-                "stdout" : exc['stdout'],
-                "stderr" : exc['stderr'],
-                "msg"    : exc['msg'],
-                "ansible_cmd" : exc['cmd']
-                }
-
-            return commandreply.CommandReply_from_dict( replydict )
+            return self.__error_reply( command, exc )
+        finally:
+            if self.__cache and not is_read_only( command ):
+                # results of queries that ran during the change are stale too
+                self.__cache.invalidate()
         
         host = reslt['contacted'].keys()[0]
         replydict = {
             "cluster_name" : self.__cmd['cluster_name'],
-            "command" : self.__cmd['command'],
+            "command" : command,
             "console_host" : host,
             "rc" : reslt['contacted'][host]['rc'],
             "stdout" : reslt['contacted'][host]['stdout'],
             "stderr" : reslt['contacted'][host]['stderr']
             }
         
-        try:
-            fn = getattr(console,self.__cmd['command'])
-            replydict['results'] = fn(reslt['contacted'][host]['stdout'])
-        except:
-            pass
+        results = self.__parse( command, reslt['contacted'][host]['stdout'] )
+        if results is not None:
+            replydict['results'] = results
+        
+        if self.__cache and replydict['rc'] == 0:
+            self.__cache.put( command, dict( (k, replydict[k]) for k in 
+                              ('console_host', 'rc', 'stdout', 'stderr', 'results') if replydict.has_key(k) ),
+                              started )
         
         return commandreply.CommandReply_from_dict( replydict )
     
+    def run_batch(self):
+        '''
+        Runs all of the commands in the request in one remote shell and 
+        replies with a result per command.  With the console cache enabled
+        only commands without a fresh cached result are run.  A batch that
+        contains a mutating command is run in full and not cached.
+        '''
+        commands = self.__cmd['commands']
+        batch = '; '.join( commands )
+        
+        replies = [ None ] * len(commands)
+        host = ''
+        use_cache = False
+        if self.__cache:
+            use_cache = all( [ is_read_only( c ) for c in commands ] )
+            if use_cache:
+                for i, c in enumerate( commands ):
+                    cached = self.__cache.get( c )
+                    if cached:
+                        host = cached['console_host']
+                        replies[i] = dict( (k, v) for k, v in cached.iteritems() if k != 'console_host' )
+                        replies[i]['command'] = c
+            else:
+                self.__cache.invalidate()
+        
+        torun = [ i for i in range(len(commands)) if replies[i] is None ]
+        replydict = {
+            "cluster_name" : self.__cmd['cluster_name'],
+            "command" : batch,
+            "console_host" : host,
+            "rc" : 0,
+            "stdout" : '',
+            "stderr" : ''
+            }
+        if torun:
+            started = self.__cache.now() if self.__cache else None
+            try:
+                reslt = self.__pmgr.run_commands( 'infinidb', 'pm1', 
+                            [ self.__console_cmd( commands[i] ) for i in torun ], sudo=False )
+            except errormsg.ErrorMsg, exc:
+                return self.__error_reply( batch, exc )
+            finally:
+                if self.__cache and not use_cache:
+                    # results of queries that ran during the change are stale too
+                    self.__cache.invalidate()
+            
+            host = reslt['contacted'].keys()[0]
+            for i, r in zip( torun, reslt['contacted'][host]['results'] ):
+                reply = {
+                    "command" : commands[i],
+                    "rc" : r['rc'],
+                    "stdout" : r['stdout'],
+                    "stderr" : r['stderr']
+                }
+                results = self.__parse( commands[i], r['stdout'] )
+                if results is not None:
+                    reply['results'] = results
+                replies[i] = reply
+                if use_cache and reply['rc'] == 0:
+                    cached = dict( (k, v) for k, v in reply.iteritems() if k != 'command' )
+                    cached['console_host'] = host
+                    self.__cache.put( commands[i], cached, started )
+            replydict.update( {
+                "console_host" : host,
+                "rc" : reslt['contacted'][host]['rc'],
+                "stdout" : reslt['contacted'][host]['stdout'],
+                "stderr" : reslt['contacted'][host]['stderr']
+            } )
+        
+        replydict['replies'] = replies
+        return commandreply.CommandReply_from_dict( replydict )
+    
+    def __console_cmd(self, command):
+        if command == 'gettablelocks':
+            return '{{ infinidb_installdir }}/bin/viewtablelock'
+        else:
+            return '{{ infinidb_installdir }}/bin/calpontConsole %s' % command
+    
+    def __parse(self, command, stdout):
+        '''Runs the emtools.cluster.console parser for command if there is one.'''
+        try:
+            fn = getattr(console,command)
+            return fn(stdout)
+        except:
+            return None
+    
+    def __error_reply(self, command, exc):
+        replydict = {
+            "cluster_name" : self.__cmd['cluster_name'],
+            "command" : command,
+            "console_host" : '',
+            "rc" : exc['rc'],
+            "stdout" : exc['stdout'],
+            "stderr" : exc['stderr'],
+            "msg"    : exc['msg'],
+            "ansible_cmd" : exc['cmd']
+            }
+        return commandreply.CommandReply_from_dict( replydict )
         
 #-------------------------------------------------------------------------------
 def usage():
@@ -25,9 +25,12 @@ Performs an install of InfiniDB to the cluster / roles defined
 import getopt
 import sys
 import os
+import traceback
+from multiprocessing.pool import ThreadPool
 
 import emtools.msg.installreq as installreq
 import emtools.msg.playbookreply as playbookreply
+import emtools.msg.jsonmsg as jsonmsg
 from emtools.cluster.configspec import ConfigSpec
 from emtools.cluster.emcluster  import EmCluster
 from emtools.cluster.emversionmgr import EmVersionManager
@@ -141,13 +144,111 @@ class ConfigSpecBuilder(object):
 
         return cfg,machines
 
+#-------------------------------------------------------------------------------
+def run_request(req):
+    '''
+    Installs the database described by an InstallReq.
+    
+    :param req: InstallReq message
+    
+    Returns a PlaybookReply for the install playbook run
+    '''
+    Log = logutils.getLogger('installdatabase')
+
+    # construct configspec
+    cfgspecbld = ConfigSpecBuilder( req )
+    cfgspec,machines = cfgspecbld.run()
+
+    # determine the approprate package file to be installed
+    emVM = EmVersionManager()
+    pkgfile = emVM.retrieve(cfgspec['idbversion'],'binary')
+    Log.info('pkgfile: %s' % pkgfile)
+
+    # create runtime directory
+    root = common.props['emtools.playbookmgr.cluster_base']
+    rundir = '%s/%s' % (root, cfgspec['name'])
+    if not os.path.exists( rundir ):
+        mkdir_p( rundir )
+
+    # create the cluster
+    emCluster = EmCluster(cfgspec['name'],
+                          cfgspec,
+                          rundir,
+                          pkgfile,
+                          machines)
+
+    # create the postconfig response file
+    h = PostConfigureHelper()
+    pfile = '%s/postconfigure.in' % rundir
+    h.write_input(pfile, emCluster, 'binary')
+
+    # perform the db install
+    rc, results, out, err = emCluster.run_install_recipe()
+
+    reply_dict = {
+        'cluster_name' : cfgspec['name'],
+        'playbook_info': {
+            'name'     : emCluster.get_playbook_filename(),
+            'hostspec' : emCluster.get_inventory_filename(),
+            'extravars': emCluster.get_extra_vars()
+        },
+        'rc'           : rc,
+        'stdout'       : out,
+        'stderr'       : err,
+        'recap_info'   : results
+    }
+    return playbookreply.PlaybookReply_from_dict(reply_dict)
+
+#-------------------------------------------------------------------------------
+def run_batch(reqs, concurrency=None):
+    '''
+    Installs the databases described by a list of InstallReqs, running 
+    several installs at once.  Each cluster installs from its own playbook
+    directory so the requests must all be for different clusters.
+    
+    :param reqs: list of InstallReq messages
+    :param concurrency: [optional] most installs to run at once.  Defaults
+                        to emtools.installdatabase.concurrency
+    
+    Returns a list with, for each request in order, a PlaybookReply for the
+    install playbook run or an ErrorMsg if the install could not be run
+    '''
+    if not reqs:
+        return []
+    if not concurrency:
+        concurrency = common.props['emtools.installdatabase.concurrency']
+
+    names = [ req['cluster_name'] for req in reqs ]
+    dups = set( n for n in names if names.count(n) > 1 )
+
+    def install(req):
+        Log = logutils.getLogger('installdatabase')
+        if req['cluster_name'] in dups:
+            return errormsg.ErrorMsg_from_parms( 
+                msg='cluster %s appears more than once in the batch' % req['cluster_name'] )
+        try:
+            return run_request( req )
+        except errormsg.ErrorMsg, e:
+            return e
+        except (Exception, SystemExit):
+            # one failed install doesn't stop the others
+            Log.error('install of %s failed: %s' % (req['cluster_name'], traceback.format_exc()))
+            return errormsg.ErrorMsg_from_parms( msg=traceback.format_exc() )
+
+    pool = ThreadPool( min( concurrency, len(reqs) ) )
+    try:
+        return pool.map( install, reqs )
+    finally:
+        pool.close()
+        pool.join()
+
 #-------------------------------------------------------------------------------
 def usage():
     '''
     Print command line usage
     '''
 
-    print 'installdatabase.py [hvi] [--json=]'
+    print 'installdatabase.py [hvi] [--json=] [--batch]'
     print ''
     print 'Version: %s' % version
     print ''
@@ -160,6 +261,10 @@ def usage():
     print '    -i            read installdatabase input from STDIN'
     print ''
     print '    --json <file> read installdatabase input from <file>'
+    print '    --batch       input is a list of installdatabase requests for different'
+    print '                  clusters.  The installs run in parallel (up to'
+    print '                  emtools.installdatabase.concurrency at once) and a list of'
+    print '                  replies is printed in request order'
 
 #-------------------------------------------------------------------------------
 def main(argv):
@@ -168,7 +273,7 @@ def main(argv):
     '''
 
     try:                                
-        opts, args = getopt.getopt(argv, "hvi", ['json='])
+        opts, args = getopt.getopt(argv, "hvi", ['json=', 'batch'])
     except getopt.GetoptError:
         usage()
         sys.exit(2)   
@@ -176,6 +281,7 @@ def main(argv):
     # defaults
     use_stdin = False
     json_file = ''
+    batch = False
 
     # parse command line arguments
     for o,a in opts:
@@ -189,6 +295,8 @@ def main(argv):
             use_stdin = True
         elif o == '--json':
             json_file = a
+        elif o == '--batch':
+            batch = True
         else:
             print 'unsupported option: %s' % o
             usage()
@@ -211,51 +319,20 @@ def main(argv):
             jsonstr = ''.join(lines)
 
         Log = logutils.getLogger('installdatabase')
+        if batch:
+            reqs = [ installreq.InstallReq( json.dumps( r ) ) for r in json.loads( jsonstr ) ]
+            for req in reqs:
+                Log.info('request: %s' % req.json_dumps())
+            replies = run_batch( reqs )
+            for reply in replies:
+                Log.info('reply: %s' % reply.json_dumps())
+            print jsonmsg.dumps( [ r.to_dict() for r in replies ], jsonmsg.str_format() )
+            return 0
+
         req = installreq.InstallReq( jsonstr )
         Log.info('request: %s' % req.json_dumps())
 
-        # construct configspec
-        cfgspecbld = ConfigSpecBuilder( req )
-        cfgspec,machines = cfgspecbld.run()
-
-        # determine the approprate package file to be installed
-        emVM = EmVersionManager()
-        pkgfile = emVM.retrieve(cfgspec['idbversion'],'binary')
-        Log.info('pkgfile: %s' % pkgfile)
-
-        # create runtime directory
-        root = common.props['emtools.playbookmgr.cluster_base']
-        rundir = '%s/%s' % (root, cfgspec['name'])
-        if not os.path.exists( rundir ):
-            mkdir_p( rundir )
-
-        # create the cluster
-        emCluster = EmCluster(cfgspec['name'],
-                              cfgspec,
-                              rundir,
-                              pkgfile,
-                              machines)
-
-        # create the postconfig response file
-        h = PostConfigureHelper()
-        pfile = '%s/postconfigure.in' % rundir
-        h.write_input(pfile, emCluster, 'binary')
-
-        # perform the db install
-        rc, results, out, err = emCluster.run_install_recipe()
-
-        reply_dict = {
-            'cluster_name' : cfgspec['name'],
-            'playbook_info': {
-                'name'     : emCluster.get_playbook_filename(),
-                'hostspec' : emCluster.get_inventory_filename(),
-                'extravars': emCluster.get_extra_vars()
-            },
-            'rc'           : rc,
-            'stdout'       : out,
-            'stderr'       : err,
-            'recap_info'   : results
-        }
+        preply = run_request( req )
 
         # test stub output
         #reply_dict = {
@@ -269,7 +346,6 @@ def main(argv):
         #    'stdout'       : 'test_stdout',
         #    'stderr'       : 'test_stderr',
         #}
-        preply = playbookreply.PlaybookReply_from_dict(reply_dict)
 
         Log.info('reply: %s' % preply.json_dumps())
         print preply
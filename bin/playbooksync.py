@@ -24,19 +24,86 @@ synchronize a playbook from the current template
 import getopt
 import os, sys
 
-from emtools.playbookmgr import PlaybookMgr
-    
+import emtools.templatesync as templatesync
+import emtools.common as common
+
+#-------------------------------------------------------------------------------
+def usage():
+    print "usage: playbooksync.py <cluster-name>"
+    print "       playbooksync.py --all [-f]"
+    print ""
+    print "    --all    sync every cluster playbook under emtools.playbookmgr.cluster_base"
+    print "             in one pass.  Each template is scanned once and a playbook is"
+    print "             only copied to if its template changed since the last sync."
+    print "    -f       with --all, copy to every playbook regardless"
+
+#-------------------------------------------------------------------------------
+def sync_cluster(name, manifests, force):
+    '''
+    Syncs one cluster playbook from the template directories recorded at its
+    last sync (the playbook template for playbooks never synced before).
+    Templates are always re-scanned so that the manifest cache is refreshed.
+
+    Returns True if anything was copied
+    '''
+    props = common.props
+    base = props['emtools.playbookmgr.cluster_base']
+    rootdir = '%s/%s' % (base, name)
+    srcroots = [ src for src, digest in templatesync.read_stamp( rootdir ) ]
+    if not srcroots:
+        srcroots = [ props['emtools.playbookmgr.playbook_template'] ]
+    synced = templatesync.sync_playbook( rootdir, srcroots, '%s/.manifests' % base,
+                                         manifests=manifests, force=force )
+    return len(synced) > 0
+
+#-------------------------------------------------------------------------------
+def sync_all(force=False):
+    '''
+    Syncs all cluster playbooks under emtools.playbookmgr.cluster_base.
+    '''
+    base = common.props['emtools.playbookmgr.cluster_base']
+    # manifests are shared so that each template is only scanned once
+    manifests = {}
+    for name in sorted( os.listdir( base ) ):
+        if name.startswith('.') or not os.path.isdir( '%s/%s' % (base, name) ):
+            continue
+        if sync_cluster( name, manifests, force ):
+            print 'Playbook for %s is synced' % name
+        else:
+            print 'Playbook for %s is up to date' % name
+
 #-------------------------------------------------------------------------------
 # main entry point
 #-------------------------------------------------------------------------------
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print "usage: playbooksync.py <cluster-name>"
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hf", ['all'])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(1)
+
+    all_ = False
+    force = False
+    for o,a in opts:
+        if o == '--all':
+            all_ = True
+        elif o == '-f':
+            force = True
+        else:
+            usage()
+            sys.exit(1)
+
+    if all_:
+        sync_all( force )
+        sys.exit(0)
+
+    if len(args) < 1:
+        usage()
         sys.exit(1)
         
-    cluster = sys.argv[1]
+    cluster = args[0]
     
-    pmgr = PlaybookMgr( cluster )
+    sync_cluster( cluster, {}, True )
     print 'Playbook for %s is synced' % cluster
     
     sys.exit(0)
@@ -34,13 +34,43 @@ import emtools.common.logutils as logutils
 # roll this version for any significant changes
 version = '0.1'
 
+#-------------------------------------------------------------------------------
+def run_request(req, pmgr=None, progress=None):
+    '''
+    Runs the playbook specified in a PlaybookRequest.
+    
+    :param req: PlaybookRequest message
+    :param pmgr: [optional] existing PlaybookMgr for the cluster
+    :param progress: [optional] function called with each PlaybookStream
+                     event while the playbook runs.  When set only the tail
+                     of the playbook output is returned in the reply.
+    
+    Returns a PlaybookReply
+    '''
+    if not pmgr:
+        pmgr = PlaybookMgr( req['cluster_name'] )
+    if progress:
+        stream = pmgr.stream_playbook(req['playbook_info']['name'], 'infinidb', req['playbook_info']['hostspec'], playbook_args=req['playbook_info']['extravars'])
+        rc, results, out, err = stream.run( progress )
+    else:
+        rc, results, out, err = pmgr.run_playbook(req['playbook_info']['name'], 'infinidb', req['playbook_info']['hostspec'], playbook_args=req['playbook_info']['extravars'])
+    preply_dict = {
+        'cluster_name' : req['cluster_name'],
+        'playbook_info' : req['playbook_info'],
+        'rc' : rc,
+        'stdout' : out,
+        'stderr' : err,
+        'recap_info' : results
+    }
+    return playbookreply.PlaybookReply_from_dict(preply_dict)
+
 #-------------------------------------------------------------------------------
 def usage():
     '''
     Print command line usage
     '''
 
-    print 'runplaybook.py [hvi] [--json=]'
+    print 'runplaybook.py [hvip] [--json=]'
     print ''
     print 'Version: %s' % version
     print ''
@@ -52,6 +82,7 @@ def usage():
     print '    -h            show help'
     print '    -v            print version'
     print '    -i            read ConsoleCmd from STDIN'
+    print '    -p            write progress events to STDERR as JSON lines'
     print ''
     print '    --json <file> read ConsoleCmd from <file>'
 
@@ -62,7 +93,7 @@ def main(argv):
     '''
     
     try:                                
-        opts, args = getopt.getopt(argv, "hvi", ['json='])
+        opts, args = getopt.getopt(argv, "hvip", ['json='])
     except getopt.GetoptError:
         usage()
         sys.exit(2)   
@@ -70,6 +101,7 @@ def main(argv):
     # defaults
     use_stdin = False
     json_file = ''
+    progress = None
     
     for o,a in opts:
         if o == '-h':
@@ -80,6 +112,10 @@ def main(argv):
             sys.exit(1)
         elif o == '-i':
             use_stdin = True
+        elif o == '-p':
+            def progress(event):
+                sys.stderr.write( json.dumps( event ) + '\n' )
+                sys.stderr.flush()
         elif o == '--json':
             json_file = a
         else:
@@ -110,20 +146,10 @@ def main(argv):
         Log = logutils.getLogger('runplaybook')
         Log.info('request: %s' % req.json_dumps())
 
-        pmgr = PlaybookMgr( req['cluster_name'] )
-        rc, results, out, err = pmgr.run_playbook(req['playbook_info']['name'], 'infinidb', req['playbook_info']['hostspec'], playbook_args=req['playbook_info']['extravars'])
-        preply_dict = {
-            'cluster_name' : req['cluster_name'],
-            'playbook_info' : req['playbook_info'],
-            'rc' : rc,
-            'stdout' : out,
-            'stderr' : err,
-            'recap_info' : results
-        }
-        preply = playbookreply.PlaybookReply_from_dict(preply_dict)
+        preply = run_request( req, progress=progress )
         Log.info('reply: %s' % preply.json_dumps())
         print preply
-        return rc
+        return preply['rc']
         
     except:
         import traceback
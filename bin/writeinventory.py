@@ -33,6 +33,29 @@ import emtools.common.logutils as logutils
 # roll this version for any significant changes
 version = '0.1'
 
+#-------------------------------------------------------------------------------
+def run_request(req, pmgr=None):
+    '''
+    Writes the 'infinidb' inventory file described by an InventoryRequest.
+    
+    :param req: InventoryRequest message
+    :param pmgr: [optional] existing PlaybookMgr for the cluster
+    '''
+    if not pmgr:
+        pmgr = PlaybookMgr( req['cluster_name'] )
+    
+    # the write_inventory method expects a list for each role
+    role_map = {}
+    for r in req['role_info'].iterkeys():
+        if isinstance( req['role_info'][r], list ):
+            role_map[r] = req['role_info'][r]
+        elif isinstance( req['role_info'][r], basestring ):
+            role_map[r] = [ req['role_info'][r] ]
+        else:
+            raise Exception("writeinventory ERROR: unsupported type in role info %s : %s" % (r, req['role_info'][r]))
+        
+    pmgr.write_inventory('infinidb', role_map )
+
 #-------------------------------------------------------------------------------
 def usage():
     '''
@@ -108,19 +131,7 @@ def main(argv):
         Log = logutils.getLogger('writeinventory')
         Log.info('request: %s' % req.json_dumps())
 
-        pmgr = PlaybookMgr( req['cluster_name'] )
-        
-        # the write_inventory method expects a list for each role
-        role_map = {}
-        for r in req['role_info'].iterkeys():
-            if type( req['role_info'][r] ) == list:
-                role_map[r] = req['role_info'][r]
-            elif type( req['role_info'][r] ) == unicode:
-                role_map[r] = [ req['role_info'][r] ]
-            else:
-                raise Exception("writeinventory ERROR: unsupported type in role info %s : %s" % r, req['role_info'][r])
-            
-        pmgr.write_inventory('infinidb', role_map )
+        run_request( req )
     except:
         import traceback
         print errormsg.ErrorMsg_from_parms( msg=json.dumps( traceback.format_exc() ) )
@@ -23,8 +23,8 @@ Manages JSON decoding and validation
 '''
 import json
 import emtools.common as common
-import re
 import emtools.common.logutils as logutils
+from emtools.cluster.version import version_key, parse_version
 
 Log = logutils.getLogger(__name__)
 
@@ -240,126 +240,16 @@ class ConfigSpec(object):
      
     @classmethod
     def _version_cmp(cls,version,minver):
-        if version == minver:
-            return 0
-        elif ConfigSpec._version_greaterthan(version, minver):
-            return 1
-        else:
-            return -1
+        return cmp(version_key(version), version_key(minver))
 
     @classmethod
     def _version_greaterthan(cls,version,minver):
-        # check special cases around 'Latest' first
-        if version == 'Latest':
-            # latest means trunk nightly which be definition is always >
-            return True
-        elif minver == 'Latest':
-            # any compare against Latest (except Latest > Latest) is false
-            return False
-        
-        thisver = cls._convert_to_ver_tuple(version)
-        min_ = cls._convert_to_ver_tuple(minver)
-        # check major version first
-        if thisver[0][0] < min_[0][0]:
-            return False
-        elif thisver[0][0] > min_[0][0]:
-            return True
-        
-        # guaranteed Major == Major, now minor version
-        if thisver[0][1] < min_[0][1]:
-            return False
-        elif thisver[0][1] > min_[0][1]:
-            return True
-        
-        # guaranteed Major == Major and Minor == Minor
-        if len(thisver[0]) == 2:
-            # special case for nightly, always latest on its stream
-            return True
-        elif len(min_[0]) == 2:
-            # no way version is greater if more specifiers than X.Y
-            return False
-        elif thisver[0][2] < min_[0][2]:
-            return False
-        elif thisver[0][2] > min_[0][2]:
-            return True
-
-        # guaranteed Major == Major and Minor == Minor and dot1==dot1
-        if len(thisver[0]) != len(min_[0]):
-            # longer version is always greater than shorter
-            return len(thisver[0]) > len(min_[0])
-        elif len(thisver[0]) == 3:
-            # both inputs had only 3 parts so need to check dash part
-            if thisver[1] != None and min_[1] != None:
-                # they both had a dash
-                if thisver[1] == min_[1]:
-                    # dash numbers are equal.  need to check any extra text - extra text
-                    # is always less than any without
-                    if thisver[2] != None and min_[2] == None:
-                        return False
-                    elif thisver[2] == None and min_[2] != None:
-                        return True
-                    else:
-                        return thisver[2] >= min_[2]
-                else:
-                    return thisver[1] >= min_[1]
-            elif thisver[1] == None and min_[1] == None:
-                return True
-            else:
-                return thisver[1] != None
-        elif thisver[0][3] < min_[0][3]:
-            return False
-        elif thisver[0][3] > min_[0][3]:
-            return True
-
-        # guaranteed Major == Major and Minor == Minor and dot1==dot1 and dot2==dot2
-        if thisver[1] != None and min_[1] != None:
-            # they both had a dash
-            if thisver[1] == min_[1]:
-                # dash numbers are equal.  need to check any extra text - extra text
-                # is always less than any without
-                if thisver[2] != None and min_[2] == None:
-                    return False
-                elif thisver[2] == None and min_[2] != None:
-                    return True
-                else:
-                    return thisver[2] >= min_[2]
-            else:
-                return thisver[1] >= min_[1]
-        elif thisver[1] == None and min_[1] == None:
-            return True
-        else:
-            return thisver[1] != None
+        # see emtools.cluster.version for the ordering rules
+        return version_key(version) >= version_key(minver)
         
     @classmethod
     def _convert_to_ver_tuple(cls, vers):
-
-        # there are occasionally non-standard names that show up in the
-        # packages area - ex. 4.0.0-1_old. We need to be able to detect
-        # that and make sure the version still gets processed correctly.
-        extra = re.compile('.*[0-9]([\-_a-zA-Z]+)$')
-        extratext = None
-        mat = extra.match(vers)
-        if( vers != 'Latest' and mat):
-            vers = vers[0:len(vers) - len(mat.group(1))]
-            extratext = mat.group(1)
-            
-        outerparts = vers.split('-')
-        innerparts = outerparts[0].split('.')
-
-        try:
-            innerints = [int(numeric_string) for numeric_string in innerparts]
-        except:
-            # this is a strange case that could happen trying to process
-            # directory names in the package area that aren't traditionally formed
-            # setting to some bogus value here should be ok
-            innerints = [ 99, 99 ]
-        
-        if len(innerparts) < 2:
-            raise Exception('A version must at least have <major>.<minor>: %s' % vers)
-        dash = None
-        if len(outerparts) > 1:
-            dash = int(outerparts[1])
-        return (innerints, dash, extratext)
+        return parse_version(vers)
         
     def has_key(self, key):
         """Returns bool indicating whether or not the key exists in the map."""
@@ -26,10 +26,79 @@ a function that matches the name of a calpontConsole command.  It takes
 stdout output from calpontConsole execution and returns a dictionary that
 can easily be transformed into JSON.
 
+Each parser accepts either the complete stdout string or an iterator over
+its lines (i.e. lines read from a pipe), so output does not have to be 
+collected first.  Patterns are compiled once at import and line handling
+is driven by tables keyed on the line prefix.
+
 Contains:
     getsystemstatus()
+    getprocessstatus()
+    getactivealarms()
+    gettablelocks()
+    iter_tablelocks()
+    tablelock_columns()
+    class TableLock
 '''
 import re
+import collections
+
+_SYSTEM_HEADER = re.compile('getsystemstatus\s+(.*)')
+_SYSTEM_SEPS = re.compile('(\-+)\s+(\-+)\s+(\-+)')
+_ACTIVEPM = re.compile('Active Parent OAM Performance Module is \'(\w+)\'')
+_PROCESS_HEADER = re.compile('getprocessstatus\s+(.*)')
+_PROCESS_SEPS = re.compile('(\-+)\s+(\-+)\s+(\-+)\s+(\-+)\s+(\-+)')
+_ALARMS_HEADER = re.compile('getactivealarms\s+(.*)')
+
+# getactivealarms line label -> alarm key.  Labels are padded to 17 
+# characters and the value starts in column 20.
+_ALARM_FIELDS = {
+    'AlarmID'           : 'AlarmId',
+    'Brief Description' : 'Brief Description',
+    'Alarm Severity'    : 'Alarm Severity',
+    'Time Issued'       : 'Time Issued',
+    'Reporting Module'  : 'Reporting Module',
+    'Reporting Process' : 'Reporting Process',
+    'Reported Device'   : 'Reported Device'
+}
+_ALARM_LABEL_LEN = 17
+_ALARM_VALUE_COL = 20
+
+_LOCK_FIELDS = ['Table','LockID','Process','PID','Session','Txn','CreationTime','State','DBRoots']
+_LOCK_HEADER = re.compile('\s+'.join(_LOCK_FIELDS) + '$')
+# no column but CreationTime ('Sun Mar  3 20:45:41 2014') contains spaces
+_LOCK_ROW = re.compile('(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+'
+                       '(\w+ \w+ +\d+ [\d:]+ \d+)\s+(\S+)\s+(\S+)$')
+
+TableLock = collections.namedtuple('TableLock', _LOCK_FIELDS)
+
+def _lines(stdout):
+    '''Returns an iterator over the lines of a string or line iterable.'''
+    if isinstance(stdout, basestring):
+        return iter(stdout.split('\n'))
+    return iter(stdout)
+
+def _header(lines, patt):
+    '''
+    Consumes lines up to and including the command header and returns its 
+    timestamp, or None if the header was not found.
+    '''
+    for l in lines:
+        mat = patt.match(l)
+        if mat:
+            return mat.group(1)
+    return None
+
+def _columns(lines, patt):
+    '''
+    Consumes lines up to and including the column separator line and returns
+    a list of (start, end) for each column, or None if it was not found.
+    '''
+    for l in lines:
+        mat = patt.match(l)
+        if mat:
+            return [ mat.span(i) for i in range(1, patt.groups + 1) ]
+    return None
 
 def getsystemstatus(stdout):
     '''
@@ -37,41 +106,32 @@ def getsystemstatus(stdout):
     '''
     reslt = {}
     reslt['modules'] = {}
-    header = re.compile('getsystemstatus\s+(.*)')
-    seps = re.compile('(\-+)\s+(\-+)\s+(\-+)')
-    activepm = re.compile('Active Parent OAM Performance Module is \'(\w+)\'')
-    stage = 0
-    fields = []
-    for l in stdout.split('\n'):
-        if stage == 0:
-            # looking for the command header and timestamp
-            mat = header.match(l)
-            if mat:
-                reslt['timestamp'] = mat.group(1)
-                stage = 1
-        elif stage == 1:
-            # looking for the column separator line
-            mat = seps.match(l)
-            if mat:
-                fields.append( (mat.start(1), mat.end(1)))
-                fields.append( (mat.start(2), mat.end(2)))
-                fields.append( (mat.start(3), mat.end(3)))
-                stage = 2
-        elif stage == 2:
-            mat = activepm.match(l)
+    modules = reslt['modules']
+    lines = _lines(stdout)
+    timestamp = _header(lines, _SYSTEM_HEADER)
+    if timestamp is None:
+        return reslt
+    reslt['timestamp'] = timestamp
+    fields = _columns(lines, _SYSTEM_SEPS)
+    if fields is None:
+        return reslt
+
+    (c0, c1), (s0, s1), (t0, t1) = fields
+    for l in lines:
+        if l.startswith('Active Parent'):
+            mat = _ACTIVEPM.match(l)
             if mat:
                 reslt['activepm'] = mat.group(1)
-            elif len(l) > fields[2][0]:
-                component = l[fields[0][0]:fields[0][1]].strip()
-                if component.find('Module ') == 0:
-                    component = component[7:]
-                elif component.find('System') == 0:
-                    component = 'System'
-                else:
-                    continue
-                status = l[fields[1][0]:fields[1][1]].strip()
-                changed = l[fields[2][0]:fields[2][1]].strip()
-                reslt['modules'][component] = { "status" : status, "changed": changed }
+                continue
+        if len(l) > t0:
+            component = l[c0:c1].strip()
+            if component.startswith('Module '):
+                component = component[7:]
+            elif component.startswith('System'):
+                component = 'System'
+            else:
+                continue
+            modules[component] = { "status" : l[s0:s1].strip(), "changed": l[t0:t1].strip() }
     
     return reslt
 
@@ -81,122 +141,176 @@ def getprocessstatus(stdout):
     '''
     reslt = {}
     reslt['modules'] = {}
-    header = re.compile('getprocessstatus\s+(.*)')
-    seps = re.compile('(\-+)\s+(\-+)\s+(\-+)\s+(\-+)\s+(\-+)')
-    stage = 0
-    fields = []
-    for l in stdout.split('\n'):
-        if stage == 0:
-            # looking for the command header and timestamp
-            mat = header.match(l)
-            if mat:
-                reslt['timestamp'] = mat.group(1)
-                stage = 1
-        elif stage == 1:
-            # looking for the column separator line
-            mat = seps.match(l)
-            if mat:
-                fields.append( (mat.start(1), mat.end(1)))
-                fields.append( (mat.start(2), mat.end(2)))
-                fields.append( (mat.start(3), mat.end(3)))
-                fields.append( (mat.start(4), mat.end(4)))
-                fields.append( (mat.start(5), mat.end(5)))
-                stage = 2
-        elif stage == 2:
-            # we intentionally check the 4th field since pid can be blank
-            if len(l) > fields[3][0]:
-                process = l[fields[0][0]:fields[0][1]].strip()
-                module = l[fields[1][0]:fields[1][1]].strip()
-                if not module[0:2] in ( 'pm', 'um' ):
-                    continue
-                status = l[fields[2][0]:fields[2][1]].strip()
-                changed = l[fields[3][0]:fields[3][1]].strip()
-                if len(l) > fields[4][0]:
-                    pid = l[fields[4][0]:fields[4][1]].strip()
-                else:
-                    pid = ''
-                if not reslt['modules'].has_key( module ):
-                    reslt['modules'][module] = {}
-                reslt['modules'][module][process] = { "status" : status, "changed": changed, "pid" : pid }
+    modules = reslt['modules']
+    lines = _lines(stdout)
+    timestamp = _header(lines, _PROCESS_HEADER)
+    if timestamp is None:
+        return reslt
+    reslt['timestamp'] = timestamp
+    fields = _columns(lines, _PROCESS_SEPS)
+    if fields is None:
+        return reslt
+
+    (p0, p1), (m0, m1), (s0, s1), (t0, t1), (i0, i1) = fields
+    for l in lines:
+        # we intentionally check the 4th field since pid can be blank
+        if len(l) > t0:
+            module = l[m0:m1].strip()
+            if not module[0:2] in ( 'pm', 'um' ):
+                continue
+            process = l[p0:p1].strip()
+            pid = l[i0:i1].strip() if len(l) > i0 else ''
+            procs = modules.get( module )
+            if procs is None:
+                procs = modules[module] = {}
+            procs[process] = { "status" : l[s0:s1].strip(), "changed": l[t0:t1].strip(), "pid" : pid }
     
     return reslt
 
 def getactivealarms(stdout):
     reslt = {}
     reslt['alarms'] = []
-    header = re.compile('getactivealarms\s+(.*)')
-    stage = 0
+    lines = _lines(stdout)
+    timestamp = _header(lines, _ALARMS_HEADER)
+    if timestamp is None:
+        return reslt
+    reslt['timestamp'] = timestamp
+
     cur_alarm = None
-    for l in stdout.split('\n'):
-        if stage == 0:
-            # looking for the command header and timestamp
-            mat = header.match(l)
-            if mat:
-                reslt['timestamp'] = mat.group(1)
-                stage = 1
-        elif stage == 1:
-            if l.find('AlarmID') == 0:
-                if cur_alarm:
-                    reslt['alarms'].append( cur_alarm )
-                cur_alarm = {}
-                cur_alarm['AlarmId'] = l[20:]
-            elif l.find('Brief Description') == 0:
-                cur_alarm['Brief Description'] = l[20:]
-            elif l.find('Alarm Severity') == 0:
-                cur_alarm['Alarm Severity'] = l[20:]
-            elif l.find('Time Issued') == 0:
-                cur_alarm['Time Issued'] = l[20:]
-            elif l.find('Reporting Module') == 0:
-                cur_alarm['Reporting Module'] = l[20:]
-            elif l.find('Reporting Process') == 0:
-                cur_alarm['Reporting Process'] = l[20:]
-            elif l.find('Reported Device') == 0:
-                cur_alarm['Reported Device'] = l[20:]
+    for l in lines:
+        key = _ALARM_FIELDS.get( l[:_ALARM_LABEL_LEN].rstrip() )
+        if key is None:
+            continue
+        if key == 'AlarmId':
+            if cur_alarm:
+                reslt['alarms'].append( cur_alarm )
+            cur_alarm = {}
+        elif cur_alarm is None:
+            continue
+        cur_alarm[key] = l[_ALARM_VALUE_COL:]
             
     if cur_alarm:
         reslt['alarms'].append( cur_alarm )
     
     return reslt
 
-def gettablelocks(stdout):
-    fields = ['Table','LockID','Process','PID','Session','Txn','CreationTime','State','DBRoots']
-    reslt = {}
-    reslt['locks'] = []
+def _lock_columns(header):
+    '''
+    Works out (name, start, end) for each gettablelocks column from the
+    column header line.  start is -1 for a column missing from the header
+    and end is -1 for the last column.
+    '''
     fieldindices = []
-    stage = 0
-    for l in stdout.split('\n'):
+    cur = 'Table'
+    curstart = 0
+    for i in range(1,len(_LOCK_FIELDS)):
+        next = header.find(_LOCK_FIELDS[i])
+        if next == -1:
+            # this is an error scenario - there is a column that we 
+            # expect to find and did not.
+            fieldindices.append( (_LOCK_FIELDS[i], -1, -1) )
+        else:
+            fieldindices.append( (cur, curstart, next-2) )
+            cur = _LOCK_FIELDS[i]
+            curstart = next
+    fieldindices.append( (cur, curstart, -1 ) )
+    return fieldindices
+
+def _lock_slicer(header):
+    '''
+    Returns a function that splits a lock row into a TableLock using the 
+    column offsets from the header line.  Only used when the header is 
+    not the one we expect, since offsets break as soon as a value is 
+    wider than its column.
+    '''
+    spans = {}
+    for name, start, end in _lock_columns(header):
+        spans[name] = (start, None if end == -1 else end)
+    spans = [ spans[f] for f in _LOCK_FIELDS ]
+    def slicer(l):
+        return TableLock._make( '' if start == -1 else l[start:end].strip() 
+                                for start, end in spans )
+    return slicer
+
+def _lock_filter(dbroot, state, process):
+    '''
+    Returns a predicate for TableLocks or None if there is nothing to 
+    filter on.
+    '''
+    if dbroot is None and state is None and process is None:
+        return None
+    if dbroot is not None:
+        dbroot = str(dbroot)
+    def keep(lock):
+        return (state is None or lock.State == state) and \
+               (process is None or lock.Process == process) and \
+               (dbroot is None or dbroot in lock.DBRoots.split(','))
+    return keep
+
+def iter_tablelocks(stdout, dbroot=None, state=None, process=None):
+    '''
+    Generator over the locks in gettablelocks (viewtablelock) output.  
+    Yields a TableLock for each lock row as it is read, so stdout may be an
+    iterator over the lines of a very large output.
+
+    :param dbroot: [optional] only locks that include this DBRoot
+    :param state: [optional] only locks in this State (i.e. 'LOADING')
+    :param process: [optional] only locks held by this Process
+    '''
+    lines = _lines(stdout)
+    header = None
+    for l in lines:
+        # looking for the row with column headers
+        l = l.strip()
+        if l.startswith('Table'):
+            header = l
+            break
+    if header is None:
+        return
+
+    if _LOCK_HEADER.match(header):
+        # the expected columns, rows are split on whitespace
+        def parse(l):
+            mat = _LOCK_ROW.match(l)
+            return TableLock._make(mat.groups()) if mat else slicer(l)
+        slicer = _lock_slicer(header)
+    else:
+        parse = _lock_slicer(header)
+
+    keep = _lock_filter(dbroot, state, process)
+    for l in lines:
         l = l.strip()
-        if stage == 0:
-            # looking for the row with column headers
-            if l.find('Table') == 0:
-                cur = 'Table'
-                curstart = 0
-                for i in range(1,len(fields)):
-                    next = l.find(fields[i])
-                    if next == -1:
-                        # this is an error scenario - there is a column that we 
-                        # expect to find and did not.
-                        fieldindices.append( (fields[i], -1, -1) )
-                    else:
-                        fieldindices.append( (cur, curstart, next-2) )
-                        cur = fields[i]
-                        curstart = next
-                fieldindices.append( (cur, curstart, -1 ) )
-                stage = 1
-        elif stage == 1:
-            l = l.strip()
-            lock = {}
-            if l:
-                for f in fieldindices:
-                    # f is 3-tuple, name, start, end
-                    if f[1] == -1:
-                        # this is a special case if we didn't find a column header
-                        lock[f[0]] = ''                        
-                    elif f[2] == -1:
-                        # this is a special case for the last field in the string
-                        lock[f[0]] = l[f[1]:].strip()
-                    else:
-                        lock[f[0]] = l[f[1]:f[2]].strip()
-                reslt['locks'].append(lock)
-                
-    return reslt
\ No newline at end of file
+        if not l:
+            continue
+        # cheap rejection before splitting the row
+        if state is not None and state not in l:
+            continue
+        if process is not None and process not in l:
+            continue
+        lock = parse(l)
+        if keep is None or keep(lock):
+            yield lock
+
+def tablelock_columns(stdout, dbroot=None, state=None, process=None):
+    '''
+    Columnar form of gettablelocks.  Returns a dictionary with the column 
+    names under 'fields' and, under 'locks', a dictionary mapping each 
+    column name to a list of its values (one per lock, in row order).
+
+    Filters are the same as for iter_tablelocks()
+    '''
+    locks = list( iter_tablelocks(stdout, dbroot, state, process) )
+    if locks:
+        columns = [ list(c) for c in zip(*locks) ]
+    else:
+        columns = [ [] for f in _LOCK_FIELDS ]
+    return { 'fields' : list(_LOCK_FIELDS), 'locks' : dict( zip(_LOCK_FIELDS, columns) ) }
+
+def gettablelocks(stdout, dbroot=None, state=None, process=None):
+    '''
+    Returns a dictionary with a list of locks, each a dictionary keyed on
+    the column name.  Filters are the same as for iter_tablelocks()
+    '''
+    reslt = {}
+    reslt['locks'] = [ dict( zip(_LOCK_FIELDS, lock) ) for lock in iter_tablelocks(stdout, dbroot, state, process) ]
+    return reslt
@@ -0,0 +1,60 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.cluster.consolecache
+
+Short lived cache of calpontConsole command results for a cluster.  The
+cache is a JSON file (normally in the cluster's playbook directory) so
+that it is shared by every idbconsole.py process and emtoolsd.
+
+Only read-only commands are cached.  Running any other command through
+the same runner invalidates the cluster's cache since it may change the
+state those commands report.  A result from a command that started 
+before the last invalidation is not cached (see TtlCache).
+
+Contains:
+    is_read_only()
+    class ConsoleCache
+'''
+from ttlcache import TtlCache
+
+def is_read_only(command):
+    '''
+    Returns True if a calpontConsole command only reports state.  All of
+    the get* commands are queries.
+    '''
+    words = command.split()
+    return len(words) > 0 and words[0].lower().startswith('get')
+
+class ConsoleCache(TtlCache):
+    '''
+    Maps a command string to the reply fields of its last run (rc, stdout,
+    stderr, console_host and parsed results).
+    '''
+
+    def put(self, command, reply, started=None):
+        '''
+        Caches the reply fields for a read-only command.
+
+        :param started: [optional] now() from just before the command was
+                        run.  Nothing is cached if the cache was 
+                        invalidated since then.
+        '''
+        if not is_read_only(command):
+            return
+        TtlCache.put(self, command, reply, started)
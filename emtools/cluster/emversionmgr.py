@@ -24,6 +24,11 @@ import os
 import re
 import emtools.common as common
 from pkgfilenameparser import PkgFileNameParser
+from pkgcatalog import PackageCatalog
+
+# package directory -> PackageCatalog, shared by every EmVersionManager
+# in the process (i.e. in emtoolsd)
+_catalogs = {}
 
 class EmVersionManager(object):
     '''
@@ -43,11 +48,17 @@ class EmVersionManager(object):
             raise Exception("Package reference directory %s does not exist!" % self._basedir) 
         
         self._pkgfilenameparser = PkgFileNameParser()
+        if not _catalogs.has_key(self._basedir):
+            _catalogs[self._basedir] = PackageCatalog(self._basedir, 
+                                                      common.props['cluster.emversionmgr.catalog_dir'],
+                                                      self._pkgfilenameparser)
+        self._catalog = _catalogs[self._basedir]
         
     def retrieve(self, version, ptype):
         '''locates the specified package type.
 
-        @param version - version to retrieve.
+        @param version - version to retrieve.  Only a package of exactly
+                         this version is returned (see retrieve_latest)
         @param ptype   - package type.  One of 'bin', 'deb', or 'rpm'
         Returns the relative path to the package tarball which is
         guaranteed to be located in /opt/infinidb/em/packages/database.
@@ -58,11 +69,42 @@ class EmVersionManager(object):
         if not ptype in ['binary']: # presently only support binary
             raise Exception("Unsupported package type %s!" % ptype)
 
-        # search for applicable pkg in self._basedir
-        for p in os.listdir(self._basedir):
-            mat = self._pkgfilenameparser.match(ptype,p)
-            if mat and (self._pkgfilenameparser.get_pkg_version(p) == version):
-                return p
+        p = self._catalog.lookup(ptype, version)
+        if p:
+            return p
 
         raise Exception("No %s package found in %s for version %s" %
             (ptype, self._basedir, version))
+
+    def retrieve_latest(self, ptype, stream=None):
+        '''locates the newest package of a package type.
+
+        @param ptype   - package type.  One of 'bin', 'deb', or 'rpm'
+        @param stream  - [optional] <major>.<minor> release stream to 
+                         limit the search to (i.e. '4.5')
+        Returns the relative path to the package tarball, as for retrieve.
+
+        Raises exceptions if there is no such package.
+        '''
+        if not ptype in ['binary']: # presently only support binary
+            raise Exception("Unsupported package type %s!" % ptype)
+
+        if stream is not None and not re.match('[0-9]+\.[0-9]+$', stream):
+            raise Exception("Invalid release stream %s!" % stream)
+        newest = self._catalog.latest(ptype, stream)
+        if newest:
+            return self._catalog.lookup(ptype, newest)
+
+        raise Exception("No %s package found in %s for release %s" %
+            (ptype, self._basedir, stream if stream else 'Latest'))
+
+    def versions(self, ptype, minver=None, maxver=None):
+        '''lists the versions available for a package type.
+
+        @param ptype   - package type (a PkgFileNameParser pattern name,
+                         i.e. 'binary')
+        @param minver  - [optional] lowest version to list
+        @param maxver  - [optional] only list versions less than this
+        Returns the version strings sorted oldest first.
+        '''
+        return self._catalog.range(ptype, minver, maxver)
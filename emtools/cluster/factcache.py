@@ -0,0 +1,77 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.cluster.factcache
+
+Cache of the host facts (ansible_facts from the setup or em_facts module)
+gathered for a cluster.  The cache is a JSON file in the cluster's 
+playbook directory so it is shared by every getfacts.py process and
+emtoolsd.
+
+Only facts that describe the host itself belong here.  Anything that
+changes with what is installed (i.e. site_facts) should always be 
+gathered again.  Entries are kept per fact module since the modules do 
+not return the same facts.
+
+Contains:
+    class FactCache
+'''
+import time
+from ttlcache import TtlCache
+
+class FactCache(TtlCache):
+    '''
+    Maps a host, as it appears in the inventory, to the facts last gathered
+    for it by the fact module.
+    '''
+
+    def __init__(self, cachefile, module, ttl, clock=time.time):
+        '''
+        Constructor.
+
+        :param cachefile: JSON file holding the cache
+        :param module: fact module the facts are gathered with
+        :param ttl: seconds cached facts stay valid (0 = no caching)
+        :param clock: [optional] time source, for unit tests
+        '''
+        TtlCache.__init__(self, cachefile, ttl, clock)
+        self.__module = module
+
+    def get(self, host):
+        '''Returns the cached facts for host or None if missing or stale.'''
+        return TtlCache.get(self, self.__key(host))
+
+    def put_many(self, facts, started=None):
+        '''
+        Caches facts for a number of hosts with a single write.
+
+        :param facts: dictionary of host -> facts
+        :param started: [optional] now() from just before the facts were 
+                        gathered
+        '''
+        TtlCache.put_many(self, dict( (self.__key(h), f) for h, f in facts.iteritems() ), started)
+
+    def invalidate(self, host=None):
+        '''Forgets the cached facts for host, or for every host if not set.'''
+        if host is None:
+            TtlCache.invalidate(self)
+        else:
+            TtlCache.invalidate(self, [ self.__key(host) ])
+
+    def __key(self, host):
+        return '%s:%s' % (self.__module, host)
@@ -0,0 +1,188 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.cluster.pkgcatalog
+
+Index of the database packages in a package directory by package type
+and version.
+
+The index is rebuilt whenever the directory's mtime changes (a file was
+added, removed or renamed) and is saved to a JSON file (one per package
+directory, in the directory set by cluster.emversionmgr.catalog_dir) so
+that each process does not have to rescan the directory.
+
+contains:
+    class PackageCatalog
+'''
+import os
+import time
+import bisect
+import hashlib
+import threading
+from emtools.common.utils import mkdir_p, read_json, write_json_atomic
+from pkgfilenameparser import PkgFileNameParser
+from version import version_key, parse_version
+
+# a directory modified this recently may still be changing within the
+# resolution of its mtime, so the scan is not saved as current
+_SETTLE_SECS = 2
+
+class PackageCatalog(object):
+    '''
+    Package type -> version -> package file for one package directory.
+    '''
+
+    def __init__(self, basedir, indexdir=None, parser=None):
+        '''
+        Constructor.
+
+        :param basedir: package directory
+        :param indexdir: [optional] directory for the saved index, if not
+                         set the index is only kept in memory
+        :param parser: [optional] PkgFileNameParser to classify files
+        '''
+        self.__basedir = basedir
+        self.__indexfile = None
+        if indexdir:
+            key = hashlib.sha1(os.path.abspath(basedir)).hexdigest()[:16]
+            self.__indexfile = '%s/%s.json' % (indexdir, key)
+        self.__parser = parser or PkgFileNameParser()
+        self.__mtime = None
+        self.__packages = {}
+        # ptype -> ([sort keys], [versions]) built on demand
+        self.__sorted = {}
+        self.__lock = threading.Lock()
+
+    def lookup(self, ptype, version):
+        '''Returns the package file for an exact version or None.'''
+        return self.__current().get(ptype, {}).get(version)
+
+    def versions(self, ptype):
+        '''Returns the versions available for ptype sorted oldest first.'''
+        return list(self.__sorted_versions(ptype)[1])
+
+    def latest(self, ptype, stream=None):
+        '''
+        Returns the newest version of ptype or None if there is none.
+
+        :param stream: [optional] '<major>.<minor>' to only consider
+                       versions from that release stream
+        '''
+        if stream is None:
+            vers = self.__sorted_versions(ptype)[1]
+            return vers[-1] if vers else None
+        (ints, dash, extra) = parse_version(stream)
+        # the stream's nightly sorts above all of its <major>.<minor>.x
+        # versions, and nothing outside the stream sorts between them
+        found = self.range(ptype, '%d.%d.0' % (ints[0], ints[1]), '%d.%d' % (ints[0], ints[1]), True)
+        return found[-1] if found else None
+
+    def range(self, ptype, minver=None, maxver=None, inclusive=False):
+        '''
+        Returns the versions of ptype from minver up to maxver, sorted
+        oldest first.
+
+        :param minver: [optional] lowest version to include
+        :param maxver: [optional] versions must be less than this
+        :param inclusive: [optional] include versions equal to maxver
+        '''
+        keys, vers = self.__sorted_versions(ptype)
+        lo = 0 if minver is None else bisect.bisect_left(keys, version_key(minver))
+        if maxver is None:
+            hi = len(keys)
+        elif inclusive:
+            hi = bisect.bisect_right(keys, version_key(maxver))
+        else:
+            hi = bisect.bisect_left(keys, version_key(maxver))
+        return vers[lo:hi]
+
+    def refresh(self):
+        '''Rescans the package directory.'''
+        self.__lock.acquire()
+        try:
+            self.__scan(os.stat(self.__basedir).st_mtime)
+        finally:
+            self.__lock.release()
+
+    def __sorted_versions(self, ptype):
+        self.__lock.acquire()
+        try:
+            packages = self.__check()
+            if not self.__sorted.has_key(ptype):
+                vers = sorted(packages.get(ptype, {}).iterkeys(), key=version_key)
+                self.__sorted[ptype] = ([ version_key(v) for v in vers ], vers)
+            return self.__sorted[ptype]
+        finally:
+            self.__lock.release()
+
+    def __current(self):
+        self.__lock.acquire()
+        try:
+            return self.__check()
+        finally:
+            self.__lock.release()
+
+    def __check(self):
+        '''Returns the index, reloading or rescanning it if the directory changed.'''
+        mtime = os.stat(self.__basedir).st_mtime
+        if mtime == self.__mtime:
+            return self.__packages
+        if self.__indexfile:
+            saved = self.__load()
+            if saved and saved['mtime'] == mtime:
+                packages = dict( (str(ptype), dict( (str(v), str(f)) for v, f in bytype.iteritems() ))
+                                 for ptype, bytype in saved['packages'].iteritems() )
+                self.__set(packages, mtime)
+                return self.__packages
+        self.__scan(mtime)
+        return self.__packages
+
+    def __scan(self, mtime):
+        packages = {}
+        # (ptype, version) indexed from a name that only starts with a 
+        # package file name (i.e. x.tar.gz.md5)
+        partial = set()
+        for rec in self.__parser.classify(sorted(os.listdir(self.__basedir))):
+            for ptype in rec.ptypes:
+                bytype = packages.setdefault(ptype, {})
+                if not bytype.has_key(rec.version) or (ptype, rec.version) in partial:
+                    bytype[rec.version] = rec.name
+                    if rec.complete:
+                        partial.discard((ptype, rec.version))
+                    else:
+                        partial.add((ptype, rec.version))
+
+        if time.time() - mtime < _SETTLE_SECS:
+            # use it but check the directory again next time
+            self.__set(packages, None)
+        else:
+            self.__set(packages, mtime)
+            if self.__indexfile:
+                self.__save({ 'mtime' : mtime, 'packages' : packages })
+
+    def __set(self, packages, mtime):
+        self.__packages = packages
+        self.__mtime = mtime
+        self.__sorted = {}
+
+    def __load(self):
+        return read_json(self.__indexfile)
+
+    def __save(self, data):
+        mkdir_p(os.path.dirname(self.__indexfile))
+        write_json_atomic(self.__indexfile, data)
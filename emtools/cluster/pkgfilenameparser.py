@@ -19,14 +19,64 @@
 emtools.cluster.pkgfilenameparser
 
 Utility used to parse a package file name.
+
+PkgFileNameParser.classify() identifies the package type(s), edition and
+version of file names with one combined pattern and remembers recent
+results, so the same package directory can be scanned repeatedly without
+re-matching every name.
 '''
 import os
 import re
+import threading
+import collections
 import emtools.common as common
 import emtools.common.utils as utils
 
 #TODO: Consider changing autooam to use this class to avoid duplicate code
 
+# one alternative per file name form, equivalent to the _filepatt patterns
+_CLASSIFY_PATT = re.compile(
+    '(?:calpont-|)infinidb-ent-(?P<ent>[0-9\-\.]*).(?P<ent_fmt>x86_64.bin|amd64.deb|x86_64.rpm).tar.gz|'
+    'calpont-infinidb-datdup-(?P<datdup>.*).x86_64.bin.tar.gz|'
+    'calpont-datdup-(?P<rpm_datdup>.*).x86_64.rpm|'
+    'infinidb-(?P<std>[0-9\-\.]*).(?P<std_fmt>x86_64.bin|amd64.deb|x86_64.rpm).tar.gz')
+
+# package format in the file name (last 3 characters of x86_64.bin, etc.)
+# -> package type name for the ent edition
+_FORMATS = {
+    'bin' : 'binary',
+    'deb' : 'deb',
+    'rpm' : 'rpm'
+}
+
+# classify() result for one file name
+#   ptypes   - tuple of the package types (match() names) the name matches
+#   edition  - 'ent', 'std' or 'datdup'
+#   version  - version embedded in the name
+#   complete - False if the name only starts with a package file name 
+#              (i.e. x.tar.gz.md5)
+PkgFile = collections.namedtuple('PkgFile', ['name', 'ptypes', 'edition', 'version', 'complete'])
+
+_CACHE_SIZE = 4096
+
+# file name -> PkgFile (or None), least recently used first
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+def _classify(name):
+    m = _CLASSIFY_PATT.match(name)
+    if not m:
+        return None
+    complete = m.end() == len(name)
+    if m.group('ent') is not None:
+        return PkgFile(name, (_FORMATS[m.group('ent_fmt')[-3:]],), 'ent', m.group('ent'), complete)
+    if m.group('std') is not None:
+        return PkgFile(name, (_FORMATS[m.group('std_fmt')[-3:]] + '-std',), 'std', m.group('std'), complete)
+    if m.group('datdup') is not None:
+        # debian support is via the binary package for now
+        return PkgFile(name, ('binary-datdup', 'deb-datdup'), 'datdup', m.group('datdup'), complete)
+    return PkgFile(name, ('rpm-datdup',), 'datdup', m.group('rpm_datdup'), complete)
+
 class PkgFileNameParser(object):
     def __init__(self):
         '''
@@ -62,11 +112,60 @@ class PkgFileNameParser(object):
         
         @raises      - exception if the input file path is malformed.
         '''
+        rec = self.classify_one(pfile)
+        if rec and rec.complete and rec.edition != 'datdup':
+            # same as the pattern below would give
+            return rec.version
         f = os.path.split(pfile)[1]
         m = self._verspatt.match(f)
         if not m:
             raise Exception("%s does not look like a package file!" % pfile)
         return m.group(3)
 
+    def classify_one(self, pfile):
+        '''
+        Identifies a package file name.
+
+        @param pfile - package file name (any directory part is ignored)
+
+        @return      - a PkgFile or None if the name is not a package file
+        '''
+        name = os.path.split(pfile)[1]
+        _cache_lock.acquire()
+        try:
+            if name in _cache:
+                rec = _cache.pop(name)
+                _cache[name] = rec
+                return rec
+        finally:
+            _cache_lock.release()
+
+        rec = _classify(name)
+
+        _cache_lock.acquire()
+        try:
+            _cache[name] = rec
+            if len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+        finally:
+            _cache_lock.release()
+        return rec
+
+    def classify(self, pfiles):
+        '''
+        Identifies a list of package file names.
+
+        @param pfiles - iterable of file names
+
+        @return       - list of PkgFile for the names that are package 
+                        files, in the order given
+        '''
+        recs = [ self.classify_one(p) for p in pfiles ]
+        return [ r for r in recs if r is not None ]
+
     def match(self, ptype, pfile):
         return self._filepatt[ptype].match(pfile)
+
+    def ptypes(self):
+        '''Returns the package type names that match() accepts.'''
+        return sorted(self._filepatt.keys())
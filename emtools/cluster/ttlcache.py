@@ -0,0 +1,132 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.cluster.ttlcache
+
+Base class for the short lived JSON file caches kept in a cluster's 
+playbook directory.  Being a file, a cache is shared by every utility
+process and emtoolsd.
+
+Each entry expires ttl seconds after it was stored.  invalidate() records
+the time it was called in the cache file, and a value computed by an 
+operation that started before then is not stored: it may describe the 
+state from before the change.  Updates of the file are serialized with a
+lock file next to it and the file is always rewritten, never removed, so
+the invalidation time survives.
+
+Contains:
+    class TtlCache
+'''
+import time
+import fcntl
+from emtools.common.utils import read_json, write_json_atomic
+
+# cache file key holding the time of the last invalidate()
+_INVALIDATED = '__invalidated__'
+
+class TtlCache(object):
+    '''
+    Maps a string key to the last value stored for it.
+    '''
+
+    def __init__(self, cachefile, ttl, clock=time.time):
+        '''
+        Constructor.
+
+        :param cachefile: JSON file holding the cache
+        :param ttl: seconds a cached value stays valid (0 = no caching)
+        :param clock: [optional] time source, for unit tests
+        '''
+        self.__cachefile = cachefile
+        self.__ttl = ttl
+        self.__clock = clock
+
+    def now(self):
+        '''Returns the current time, to pass to put() as started.'''
+        return self.__clock()
+
+    def get(self, key):
+        '''Returns the cached value for key or None if missing or stale.'''
+        if self.__ttl <= 0 or key == _INVALIDATED:
+            return None
+        entry = self.__load().get(key)
+        if entry and self.__clock() - entry['time'] < self.__ttl:
+            return entry['value']
+        return None
+
+    def put_many(self, values, started=None):
+        '''
+        Caches a number of values with a single write.
+
+        :param values: dictionary of key -> value
+        :param started: [optional] now() from just before the values were
+                        computed.  Nothing is cached if the cache was 
+                        invalidated since then.
+        '''
+        values = dict( (k, v) for k, v in values.iteritems() if k != _INVALIDATED )
+        if self.__ttl <= 0 or not values:
+            return
+        lock = self.__lock()
+        try:
+            entries = self.__load()
+            if started is not None and started <= entries.get(_INVALIDATED, 0):
+                return
+            now = self.__clock()
+            # drop anything stale while we are rewriting the file anyway
+            entries = dict( (k, v) for k, v in entries.iteritems() 
+                            if k == _INVALIDATED or now - v['time'] < self.__ttl )
+            for key, value in values.iteritems():
+                entries[key] = { 'time' : now, 'value' : value }
+            self.__save(entries)
+        finally:
+            lock.close()
+
+    def put(self, key, value, started=None):
+        '''Caches the value for key, see put_many().'''
+        self.put_many( { key : value }, started )
+
+    def invalidate(self, keys=None):
+        '''
+        Forgets the cached values for a list of keys, or every cached value
+        if keys is not set.  Only the latter records the invalidation time.
+        '''
+        lock = self.__lock()
+        try:
+            if keys is None:
+                self.__save({ _INVALIDATED : self.__clock() })
+                return
+            entries = self.__load()
+            removed = [ k for k in keys if k != _INVALIDATED and entries.has_key(k) ]
+            for key in removed:
+                del entries[key]
+            if removed:
+                self.__save(entries)
+        finally:
+            lock.close()
+
+    def __lock(self):
+        '''Returns an open lock file holding an exclusive lock.'''
+        f = open('%s.lock' % self.__cachefile, 'a')
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return f
+
+    def __load(self):
+        return read_json(self.__cachefile, {})
+
+    def __save(self, entries):
+        write_json_atomic(self.__cachefile, entries)
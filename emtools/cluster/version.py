@@ -0,0 +1,169 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.cluster.version
+
+InfiniDB version strings (i.e. '4.5.1-2', '4.0.0-1_old', '4.6' or
+'Latest') and their ordering.  Each version string is parsed once into a
+sort key and the key is cached, so comparing two versions is a single
+tuple comparison.
+
+The ordering is the one ConfigSpec._version_greaterthan has always used:
+    - 'Latest' (trunk nightly) is greater than everything else
+    - a <major>.<minor> version is the latest of its stream, so it is
+      greater than any <major>.<minor>.x version
+    - for the same first three numbers a version with more numbers is
+      greater, otherwise the 4th number is compared
+    - a version with a dash number is greater than one without and dash
+      numbers are compared numerically
+    - for the same dash number a version with extra text (i.e. '_old') is
+      less than one without
+
+Contains:
+    parse_version()
+    version_key()
+    sort_versions()
+    class Version
+'''
+import re
+
+LATEST = 'Latest'
+
+_EXTRA = re.compile('.*[0-9]([\-_a-zA-Z]+)$')
+_LATEST_KEY = (1,)
+
+# version string -> sort key
+_keys = {}
+_KEYS_MAX = 10000
+
+def parse_version(vers):
+    '''
+    Splits a version string into ([numbers], dash, extratext).  dash and
+    extratext are None if not present.
+    '''
+    # there are occasionally non-standard names that show up in the
+    # packages area - ex. 4.0.0-1_old. We need to be able to detect
+    # that and make sure the version still gets processed correctly.
+    extratext = None
+    mat = _EXTRA.match(vers)
+    if( vers != LATEST and mat):
+        vers = vers[0:len(vers) - len(mat.group(1))]
+        extratext = mat.group(1)
+
+    outerparts = vers.split('-')
+    innerparts = outerparts[0].split('.')
+
+    try:
+        innerints = [int(numeric_string) for numeric_string in innerparts]
+    except:
+        # this is a strange case that could happen trying to process
+        # directory names in the package area that aren't traditionally formed
+        # setting to some bogus value here should be ok
+        innerints = [ 99, 99 ]
+
+    if len(innerparts) < 2:
+        raise Exception('A version must at least have <major>.<minor>: %s' % vers)
+    dash = None
+    if len(outerparts) > 1:
+        dash = int(outerparts[1])
+    return (innerints, dash, extratext)
+
+def _make_key(vers):
+    if vers == LATEST:
+        return _LATEST_KEY
+    (ints, dash, extra) = parse_version(vers)
+    if len(ints) == 2:
+        # nightly for a stream, nothing past <major>.<minor> matters
+        return (0, ints[0], ints[1], 1)
+    if dash is None:
+        # extra text only counts when there is a dash number
+        dashkey = (0,)
+    elif extra is None:
+        dashkey = (1, dash, (1,))
+    else:
+        dashkey = (1, dash, (0, extra))
+    # numbers past the 4th are never compared
+    fourth = ints[3] if len(ints) > 3 else 0
+    return (0, ints[0], ints[1], 0, ints[2], len(ints), fourth, dashkey)
+
+def version_key(vers):
+    '''
+    Returns the sort key for a version string, i.e. for sorted(key=...).
+    '''
+    try:
+        return _keys[vers]
+    except KeyError:
+        key = _make_key(vers)
+        if len(_keys) >= _KEYS_MAX:
+            _keys.clear()
+        _keys[vers] = key
+        return key
+
+def sort_versions(versions, reverse=False):
+    '''Returns a list of version strings sorted oldest first.'''
+    return sorted(versions, key=version_key, reverse=reverse)
+
+class Version(object):
+    '''
+    A comparable, hashable version value.  Versions with the same sort key
+    compare equal even if the strings differ (i.e. '4.5' and '4.5-1').
+    '''
+    __slots__ = ('vers', 'key')
+
+    def __init__(self, vers):
+        '''
+        Constructor.
+
+        :param vers: version string or another Version
+        '''
+        if isinstance(vers, Version):
+            vers = vers.vers
+        self.vers = vers
+        self.key = version_key(vers)
+
+    def __eq__(self, other):
+        return self.key == _key_of(other)
+
+    def __ne__(self, other):
+        return self.key != _key_of(other)
+
+    def __lt__(self, other):
+        return self.key < _key_of(other)
+
+    def __le__(self, other):
+        return self.key <= _key_of(other)
+
+    def __gt__(self, other):
+        return self.key > _key_of(other)
+
+    def __ge__(self, other):
+        return self.key >= _key_of(other)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __str__(self):
+        return self.vers
+
+    def __repr__(self):
+        return 'Version(%r)' % self.vers
+
+def _key_of(other):
+    if isinstance(other, Version):
+        return other.key
+    return version_key(other)
@@ -0,0 +1,84 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.common.hostprobe
+
+Quick reachability check of a list of hosts by opening a TCP connection
+to their ssh port.  A host that can not be reached this way would only
+make ansible wait out its full ssh timeout, so callers can report it
+right away and leave it out of the ansible run.
+
+Each host is tried up to 1 + retries times.  The connect timeout and the
+pause between attempts both double after each failed attempt, so a slow
+host gets more time while a dead one is given up on quickly.  Hosts are
+probed in parallel.
+
+contains:
+    probe_host()
+    probe_hosts()
+'''
+import socket
+import time
+from multiprocessing.pool import ThreadPool
+
+def probe_host(host, port=22, timeout=2.0, retries=0, backoff=0.5):
+    '''
+    Tries to connect to host:port.  Returns None if the connection was
+    accepted, otherwise the reason the host is unreachable.
+
+    :param timeout: seconds to wait for the first connect
+    :param retries: number of additional attempts after a failure
+    :param backoff: seconds to wait before the first retry
+    '''
+    reason = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff)
+            backoff *= 2
+            timeout *= 2
+        try:
+            s = socket.create_connection((host, port), timeout)
+            s.close()
+            return None
+        except socket.gaierror, e:
+            # retrying will not make the name resolve
+            return 'unable to resolve host %s: %s' % (host, e.args[-1])
+        except socket.timeout:
+            reason = 'timed out'
+        except socket.error, e:
+            reason = e.args[-1]
+    return 'ssh port %s on %s is not reachable: %s' % (port, host, reason)
+
+def probe_hosts(hosts, port=22, timeout=2.0, retries=0, backoff=0.5, concurrency=32):
+    '''
+    Probes a list of hosts in parallel.  Returns a dictionary of host ->
+    reason for each host that could not be reached.  Arguments are the
+    same as for probe_host.
+
+    :param concurrency: maximum number of hosts probed at once
+    '''
+    hosts = list(hosts)
+    if not hosts:
+        return {}
+    pool = ThreadPool(max(1, min(concurrency, len(hosts))))
+    try:
+        reasons = pool.map(lambda h: probe_host(h, port, timeout, retries, backoff), hosts)
+    finally:
+        pool.close()
+        pool.join()
+    return dict( (h, r) for h, r in zip(hosts, reasons) if r )
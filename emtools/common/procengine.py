@@ -0,0 +1,245 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.common.procengine
+
+A poll() based engine for running subprocesses.  Any number of commands
+can run at once, each with its own timeout, and their output is captured
+as it arrives.  A command with a timeout runs in its own process group
+so that the timeout kills everything the command started.  Other commands
+stay in the caller's process group, so a Ctrl-C at the terminal reaches
+them directly.  If wait() is interrupted (i.e. by KeyboardInterrupt) the
+commands it was waiting for are killed.
+
+No signals or process-global state are used so separate engines can be
+used from separate threads.
+
+Example:
+    engine = ProcessEngine()
+    a = engine.start(['ansible', ...], timeout=60)
+    b = engine.start(['ansible-playbook', ...], on_stdout=callback)
+    engine.wait()
+    print a.returncode, a.stdout
+
+contains:
+    class Process
+    class ProcessEngine
+'''
+import os
+import select
+import errno
+import time
+from collections import deque
+from signal import SIGKILL
+from subprocess import PIPE, Popen
+
+_READ_SIZE = 65536
+
+class Process(object):
+    '''
+    A command started by a ProcessEngine.
+
+    After it completes returncode is set, timed_out tells if it was killed
+    because of its timeout, and stdout/stderr hold the output that was not
+    passed to an on_stdout/on_stderr callback.  If maxbuf is set only the
+    last maxbuf bytes of each are kept, and truncated names the ones that
+    were cut.
+    '''
+
+    def __init__(self, popen, timeout, on_stdout, on_stderr, maxbuf=-1):
+        self.popen = popen
+        self.pid = popen.pid
+        self.returncode = None
+        self.timed_out = False
+        self.deadline = time.time() + timeout if timeout > 0 else None
+        self.own_group = self.deadline is not None
+        self.truncated = set()
+        self.__maxbuf = maxbuf
+        self.__on = { 'stdout' : on_stdout, 'stderr' : on_stderr }
+        self.__out = { 'stdout' : deque(), 'stderr' : deque() }
+        self.__size = { 'stdout' : 0, 'stderr' : 0 }
+        self.open_pipes = 2
+
+    def __text(self, which):
+        out = ''.join(self.__out[which])
+        if self.__maxbuf >= 0 and len(out) > self.__maxbuf:
+            out = out[len(out) - self.__maxbuf:]
+        return out
+
+    @property
+    def stdout(self):
+        return self.__text('stdout')
+
+    @property
+    def stderr(self):
+        return self.__text('stderr')
+
+    def done(self):
+        return self.returncode is not None
+
+    def output(self, which, data):
+        if self.__on[which]:
+            self.__on[which](data)
+            return
+        out = self.__out[which]
+        out.append(data)
+        self.__size[which] += len(data)
+        if self.__maxbuf >= 0 and self.__size[which] > self.__maxbuf:
+            self.truncated.add(which)
+            while len(out) > 1 and self.__size[which] - len(out[0]) >= self.__maxbuf:
+                self.__size[which] -= len(out.popleft())
+
+    def kill(self):
+        '''Kills the command, and its whole process group if it has one.'''
+        try:
+            if self.own_group:
+                os.killpg(self.pid, SIGKILL)
+            else:
+                os.kill(self.pid, SIGKILL)
+        except OSError:
+            # already gone
+            pass
+
+class ProcessEngine(object):
+    '''
+    Runs and tracks any number of subprocesses.  Nothing happens in the
+    background - output is read and timeouts are enforced from within
+    poll_once()/wait() so an engine should only be used by one thread at
+    a time.
+    '''
+
+    def __init__(self):
+        self.__poller = select.poll()
+        # fd -> (process, 'stdout'|'stderr', file object)
+        self.__fds = {}
+        self.__procs = []
+
+    def start(self, args, timeout=-1, cwd=None, env=None, on_stdout=None, on_stderr=None, maxbuf=-1):
+        '''
+        Starts a command.
+
+        :param args: argument list for the command
+        :param timeout: seconds after which the command and everything it
+                        started are killed (-1 or 0 for no timeout).  Only
+                        a command with a timeout gets its own process group
+        :param cwd: [optional] working directory for the command
+        :param env: [optional] environment for the command
+        :param on_stdout: [optional] function called with each chunk of
+                        stdout as it is read.  If not set the output is
+                        collected in Process.stdout
+        :param on_stderr: [optional] same as on_stdout for stderr
+        :param maxbuf: [optional] most bytes of stdout and of stderr kept
+                        in the Process (-1 for no limit)
+
+        Returns a Process
+        '''
+        # close_fds keeps a command started from another thread at the same
+        # time from inheriting (and holding open) this command's pipes
+        popen = Popen(args, stdout = PIPE, stderr = PIPE, cwd = cwd, env = env,
+                      close_fds = True, preexec_fn = os.setsid if timeout > 0 else None)
+        proc = Process(popen, timeout, on_stdout, on_stderr, maxbuf)
+        for which, f in (('stdout', popen.stdout), ('stderr', popen.stderr)):
+            self.__fds[f.fileno()] = (proc, which, f)
+            self.__poller.register(f.fileno(), select.POLLIN | select.POLLPRI)
+        self.__procs.append(proc)
+        return proc
+
+    def active(self):
+        '''Returns the processes that have not completed.'''
+        return [ p for p in self.__procs if not p.done() ]
+
+    def poll_once(self, max_wait=-1):
+        '''
+        Waits for output, exits or timeouts and handles whatever happened.
+
+        :param max_wait: most seconds to wait (-1 waits until something
+                         happens or the next timeout is due)
+        '''
+        now = time.time()
+        wait = max_wait
+        for p in self.active():
+            if p.open_pipes == 0:
+                # output finished but the command hasn't exited yet
+                wait = 0.05 if wait < 0 else min(wait, 0.05)
+            if p.deadline is not None:
+                left = max(p.deadline - now, 0)
+                wait = left if wait < 0 else min(wait, left)
+
+        try:
+            events = self.__poller.poll(None if wait < 0 else int(wait * 1000))
+        except select.error, exc:
+            if exc.args[0] != errno.EINTR:
+                raise
+            events = []
+
+        for fd, event in events:
+            proc, which, f = self.__fds[fd]
+            data = os.read(fd, _READ_SIZE)
+            if data:
+                proc.output(which, data)
+            else:
+                # EOF
+                self.__close(fd)
+
+        now = time.time()
+        for p in self.active():
+            if p.deadline is not None and now >= p.deadline:
+                p.timed_out = True
+                p.kill()
+                self.__reap(p, True)
+            elif p.open_pipes == 0:
+                self.__reap(p, False)
+
+    def wait(self, procs=None):
+        '''
+        Runs until the given processes (or all of them) complete.  If this
+        is interrupted the processes that are still running are killed.
+        '''
+        pending = []
+        try:
+            while True:
+                pending = [ p for p in (procs or self.__procs) if not p.done() ]
+                if not pending:
+                    return
+                self.poll_once()
+        except:
+            for p in pending:
+                if not p.done():
+                    self.kill(p)
+            raise
+
+    def kill(self, proc):
+        '''Kills a process and everything it started.'''
+        proc.kill()
+        self.__reap(proc, True)
+
+    def __close(self, fd):
+        proc, which, f = self.__fds.pop(fd)
+        self.__poller.unregister(fd)
+        f.close()
+        proc.open_pipes -= 1
+
+    def __reap(self, proc, block):
+        if block:
+            for fd in [ fd for fd, v in self.__fds.iteritems() if v[0] is proc ]:
+                self.__close(fd)
+            proc.returncode = proc.popen.wait()
+        else:
+            proc.returncode = proc.popen.poll()
+        if proc.done():
+            self.__procs.remove(proc)
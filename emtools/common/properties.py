@@ -47,9 +47,53 @@ class Properties(object):
         self.__defns = {
             'emtools.playbookmgr.cluster_base':      (str, '%s/clusters' % (os.environ['INFINIDB_EM_TOOLS_HOME'])),
             'emtools.playbookmgr.playbook_template': (str, '%s/playbook_template' % (os.environ['INFINIDB_EM_TOOLS_HOME'])),
+            # use the cached template manifest without re-scanning playbook_template.
+            # If set, run 'playbooksync.py --all' after every template update.
+            # Otherwise each PlaybookMgr() stats every template directory and
+            # file, and only walks/hashes the template if one of them changed
+            'emtools.playbookmgr.manifest_trust': (bool, False),
+            # bytes of ansible-playbook output kept in memory by stream_playbook
+            'emtools.playbookmgr.stream_maxbuf': (int, 1048576),
+            # seconds an idle ssh master connection stays open (0 = no connection sharing)
+            'emtools.playbookmgr.ssh_control_persist': (int, 60),
             'emtools.confdir':                       (str, '%s/conf' % (os.environ['INFINIDB_EM_TOOLS_HOME'])),
             'emtools.logname':                       (str, '%s/emtools.log' % os.environ['INFINIDB_EM_TOOLS_HOME']),
             'emtools.unittest':                      (bool, False),
+            'emtools.emtoolsd.socket':               (str, '%s/emtoolsd.sock' % os.environ['INFINIDB_EM_TOOLS_HOME']),
+
+            # seconds idbconsole.py reuses results of read-only (get*) commands (0 = no caching)
+            'emtools.idbconsole.cache_ttl':          (int, 0),
+
+            # number of installs installdatabase.py --batch runs at once
+            'emtools.installdatabase.concurrency':   (int, 4),
+
+            # number of hosts getfacts.py will gather in parallel (1 = serial)
+            'emtools.getfacts.forks':                (int, 10),
+
+            # ssh port check getfacts.py runs before ansible so unreachable hosts
+            # are reported without waiting for ssh (probe_timeout_ms 0 = no check).
+            # the timeout and backoff double with each retry.  off by default:
+            # hosts reached through an ssh ProxyCommand or jump host can not be
+            # connected to directly and would be reported as unreachable
+            'emtools.getfacts.probe_timeout_ms':     (int, 0),
+            'emtools.getfacts.probe_retries':        (int, 1),
+            'emtools.getfacts.probe_backoff_ms':     (int, 500),
+            'emtools.getfacts.probe_concurrency':    (int, 32),
+
+            # module getfacts.py gathers host facts with: setup (all of ansible's
+            # facts) or em_facts (only the ones getfacts.py uses - quicker, but
+            # it names some distributions differently, i.e. OEL is RedHat)
+            'emtools.getfacts.fact_module':           (str, 'setup'),
+            # seconds getfacts.py reuses a host's facts (0 = no caching)
+            'emtools.getfacts.fact_cache_ttl':        (int, 0),
+
+            # validation of the replies emtools builds itself: strict, sample
+            # (only some items of each list), lazy (on first use) or none.
+            # requests are always validated strictly
+            'emtools.msg.reply_validation':          (str, 'strict'),
+            # format of the messages the utilities print: pretty (sorted and
+            # indented) or compact
+            'emtools.msg.str_format':                (str, 'pretty'),
 
             # for unit testing
             'emtools.test.user':                     (str, os.environ['USER']),
@@ -67,6 +111,8 @@ class Properties(object):
 
             # where the emversionmgr will look for DB packages
             'cluster.emversionmgr.packages_base':    (str, '/opt/infinidb/em/packages/database'),
+            # where the emversionmgr saves its index of the package directory ('' = don't save)
+            'cluster.emversionmgr.catalog_dir':      (str, '%s/clusters/.catalog' % os.environ['INFINIDB_EM_TOOLS_HOME']),
             }
         
         # we well set appropriate defaults here then allow override via
@@ -22,9 +22,12 @@ Miscellaneous utilities
 '''
 
 import os,errno
+import json
+import tempfile
 import subprocess
 import shlex
 import time
+from collections import deque
 import emtools.common as common
 
 def mkdir_p(path):
@@ -36,7 +39,45 @@ def mkdir_p(path):
         if exc.errno == errno.EEXIST and os.path.isdir(path):
             pass
         else: raise
-        
+
+def write_file_atomic(path, text, mode=None):
+    '''write text to path through a temporary file in the same directory that
+    is then renamed over path, so readers never see a partial file.  the
+    temporary file is removed if anything fails.  mode is applied to the new
+    file if specified (mkstemp creates it 0600).'''
+    fd, tmpname = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        f = os.fdopen(fd, 'w')
+        try:
+            f.write(text)
+        finally:
+            f.close()
+        if mode is not None:
+            os.chmod(tmpname, mode)
+        os.rename(tmpname, path)
+    except:
+        try:
+            os.remove(tmpname)
+        except OSError:
+            pass
+        raise
+
+def write_json_atomic(path, data):
+    '''write data as JSON to path atomically (see write_file_atomic).'''
+    write_file_atomic(path, json.dumps(data))
+
+def read_json(path, default=None):
+    '''return the contents of the JSON file at path, or default if it is
+    missing or not valid JSON.'''
+    try:
+        f = open(path)
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return default
+
 syscall_cb = None
 
 def sleep(sleepfor):
@@ -48,47 +89,21 @@ def sleep(sleepfor):
     if not common.props['emtools.unittest']:
         time.sleep(sleepfor)
     
-from os import kill
-from signal import alarm, signal, SIGALRM, SIGKILL
-from subprocess import PIPE, Popen
+from procengine import ProcessEngine
 
-def syscall_with_timeout(args, timeout = -1):
+def syscall_with_timeout(args, timeout = -1, cwd = None):
     '''
-    Run a command with a timeout after which it will be forcibly
-    killed.
+    Run a command with a timeout after which it and any processes it
+    started will be forcibly killed.  Safe to call from multiple threads.
     '''
-    class Alarm(Exception):
-        pass
-    def alarm_handler(signum, frame):
-        raise Alarm
-    p = Popen(args, stdout = PIPE, stderr = PIPE)
-    if timeout != -1:
-        signal(SIGALRM, alarm_handler)
-        alarm(timeout)
-    try:
-        stdout, stderr = p.communicate()
-        if timeout != -1:
-            alarm(0)
-    except Alarm:
-        pids = [p.pid]
-        pids.extend(get_process_children(p.pid))
-        for pid in pids:
-            # process might have died before getting to this line
-            # so wrap to avoid OSError: no such process
-            try: 
-                kill(pid, SIGKILL)
-            except OSError:
-                pass
+    engine = ProcessEngine()
+    p = engine.start(args, timeout=timeout, cwd=cwd)
+    engine.wait()
+    if p.timed_out:
         return -9, '', ''
-    return p.returncode, stdout, stderr
+    return p.returncode, p.stdout, p.stderr
 
-def get_process_children(pid):
-    p = Popen('ps --no-headers -o pid --ppid %d' % pid, shell = True,
-              stdout = PIPE, stderr = PIPE)
-    stdout, stderr = p.communicate()
-    return [int(p) for p in stdout.split()]
-    
-def syscall_log(cmd, outfile=None, timeout=-1):
+def syscall_log(cmd, outfile=None, timeout=-1, cwd=None):
     '''
     syscall_log performs execution of a system call.  It takes two parameters:
     
@@ -97,6 +112,8 @@ def syscall_log(cmd, outfile=None, timeout=-1):
                      name that will be opened for append with all stdout/stderr
                      output going to it.  If not present, the full stduout/stderr
                      is returned as a string in the second entry in the return tuple
+    @param cwd     - an optional directory to run the command in.  The caller's
+                     working directory is never changed.
     @return        - returns a tuple ( <return-code>, <output> ).
     
     Note that if the module object syscall_cb is set then syscall_log is operating
@@ -126,7 +143,7 @@ def syscall_log(cmd, outfile=None, timeout=-1):
         # use shlex to split the command-line args because we have to respect 
         # quoted arguments, etc.
         args = shlex.split(cmd.encode('utf-8'))
-        (ret, stdout, stderr) = syscall_with_timeout(args, timeout) 
+        (ret, stdout, stderr) = syscall_with_timeout(args, timeout, cwd) 
         if outfile:
             f = open(outfile,'a')
             combinedMsg = ""
@@ -142,3 +159,76 @@ def syscall_log(cmd, outfile=None, timeout=-1):
             return ( ret, "", "")
         else:
             return ( ret, stdout.strip(), stderr.strip())
+
+class StreamCall(object):
+    '''
+    A running command whose stdout is consumed line by line.  Iterating over
+    the object yields stdout lines (without the trailing newline) as the
+    command produces them.  Once iteration completes returncode and stderr
+    are available.
+    '''
+    def __init__(self, cmd, cwd=None, env=None, maxbuf=-1):
+        self.cmd = cmd
+        self.returncode = None
+        self.stderr = ''
+        self.__cwd = cwd
+        self.__env = env
+        self.__maxbuf = maxbuf
+
+    def __iter__(self):
+        if syscall_cb:
+            # this is used for unit testing
+            (ret, stdout, stderr) = syscall_cb(self.cmd)
+            for l in stdout.splitlines():
+                yield l
+            self.returncode = ret
+            self.stderr = stderr.strip()
+            return
+
+        args = shlex.split(self.cmd.encode('utf-8'))
+        engine = ProcessEngine()
+        lines = deque()
+        partial = ['']
+        def on_stdout(data):
+            data = partial[0] + data
+            parts = data.split('\n')
+            partial[0] = parts.pop()
+            lines.extend(parts)
+        env = None
+        if self.__env:
+            env = dict(os.environ)
+            env.update(self.__env)
+        p = engine.start(args, cwd=self.__cwd, env=env, on_stdout=on_stdout, maxbuf=self.__maxbuf)
+        try:
+            while not p.done():
+                engine.poll_once()
+                while lines:
+                    yield lines.popleft()
+            if partial[0]:
+                yield partial[0]
+        finally:
+            if not p.done():
+                # consumer stopped early - don't leave the command behind
+                engine.kill(p)
+            self.returncode = p.returncode
+            self.stderr = p.stderr.strip()
+            if 'stderr' in p.truncated:
+                self.stderr = '[earlier output truncated]\n%s' % self.stderr
+
+def syscall_stream(cmd, cwd=None, env=None, maxbuf=-1):
+    '''
+    Starts a system call whose output is to be processed as it arrives rather
+    than buffered until the command exits.
+    
+    @param cmd     - string containing the full command to be executed
+    @param cwd     - optional working directory for the command
+    @param env     - optional dictionary of environment variables to set for
+                     the command in addition to this process's environment
+    @param maxbuf  - optional limit on the bytes of stderr kept (the last
+                     maxbuf bytes are kept)
+    @return        - a StreamCall to iterate over for stdout lines
+    
+    If the module object syscall_cb is set it is called with the command just
+    as for syscall_log and its stdout is replayed line by line.
+    '''
+    return StreamCall(cmd, cwd, env, maxbuf)
@@ -18,12 +18,52 @@
 '''
 eminstall.idbxml
 
+Calpont.xml is flattened into a (section, parameter) -> value index when it
+is parsed, so lookups do not search the element tree.  Parsed files are 
+cached per process and reused for as long as the file's inode, mtime and
+size are unchanged.
+
 Contains:
     class IdbXml
 '''
 
+import os
 import xml.etree.ElementTree as ET
 
+# module table tags of each module type in SystemModuleConfig
+_MODULE_TYPES = { 'um' : 2, 'pm' : 3 }
+
+# path -> ((inode, mtime, size), index).  Entries are only ever replaced 
+# whole, so threads can share it without a lock: at worst two of them parse
+# the same file.
+_cache = {}
+
+def _index(root):
+    '''Returns the (section, parameter) -> value index of a Calpont.xml root.'''
+    parms = {}
+    sections = set()
+    for section in root:
+        # only the first section with a tag counts, the same as find()
+        if section.tag in sections:
+            continue
+        sections.add( section.tag )
+        for parm in section:
+            parms.setdefault( (section.tag, parm.tag), parm.text )
+    return parms
+
+def _read(file_):
+    '''Returns the index of a Calpont.xml path or open file.'''
+    if not isinstance( file_, basestring ):
+        return _index( ET.parse( file_ ).getroot() )
+    st = os.stat( file_ )
+    key = (st.st_ino, st.st_mtime, st.st_size)
+    entry = _cache.get( file_ )
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    parms = _index( ET.parse( file_ ).getroot() )
+    _cache[file_] = (key, parms)
+    return parms
+
 class IdbXml(object):
     '''
     IdbXml parses Calpont XML and derives various important information.
@@ -39,12 +79,13 @@ class IdbXml(object):
         
     def parse(self, file_):
         '''
-        Parses a Calpont.xml file.
+        Parses a Calpont.xml file.  A file that was already parsed and
+        has not changed since is not parsed again.
         
         :param file_: Calpont.xml file to parse
         '''
         self.__file = file_
-        self.__root = ET.parse( file_ ).getroot()
+        self.__parms = _read( file_ )
         
     def get_all_roles(self):
         '''
@@ -53,47 +94,37 @@ class IdbXml(object):
         '''        
         return self.get_pms() + self.get_ums()
     
-    def get_pms(self):
+    def get_modules(self, module_type):
         '''
-        Returns a list of all pm role assignments.  Each entry in the list 
-        is a dict with role= and ip_address= keys.
+        Returns a list of the role assignments of one module type from the
+        SystemModuleConfig module table.  Each entry in the list is a dict
+        with role=, ip_address= and hostname= keys.
+
+        :param module_type: 'pm' or 'um'
         '''
+        typenum = _MODULE_TYPES[module_type]
+        parms = self.__parms
+        count = int( parms[('SystemModuleConfig', 'ModuleCount%d' % typenum)] )
         ret = []
-
-        # first figure out how many UMs we have
-        ps = self.__root.find('SystemModuleConfig')
-        count = int( ps.find('ModuleCount3').text )
-
-        # now loop through each PM
         for i in range(1, count+1):
-            iptag = 'ModuleIPAddr%d-1-3' % i
-            pm_ip = ps.find( iptag )
-            hosttag = 'ModuleHostName%d-1-3' % i
-            pm_host = ps.find(hosttag)
-            ret.append( dict( role='pm%d' % i, ip_address=pm_ip.text, hostname=pm_host.text ) )
-            
+            ret.append( dict( role='%s%d' % (module_type, i),
+                              ip_address=parms[('SystemModuleConfig', 'ModuleIPAddr%d-1-%d' % (i, typenum))],
+                              hostname=parms[('SystemModuleConfig', 'ModuleHostName%d-1-%d' % (i, typenum))] ) )
         return ret
+
+    def get_pms(self):
+        '''
+        Returns a list of all pm role assignments.  Each entry in the list 
+        is a dict with role= and ip_address= keys.
+        '''
+        return self.get_modules('pm')
     
     def get_ums(self):
         '''
         Returns a list of all um role assignments.  Each entry in the list 
         is a dict with role= and ip_address= keys.
         '''
-        ret = []
-        
-        # first figure out how many UMs we have
-        ps = self.__root.find('SystemModuleConfig')
-        count = int( ps.find('ModuleCount2').text )
-
-        # now loop through each PM
-        for i in range(1, count+1):
-            iptag = 'ModuleIPAddr%d-1-2' % i
-            um_ip = ps.find( iptag )
-            hosttag = 'ModuleHostName%d-1-2' % i
-            um_host = ps.find(hosttag)
-            ret.append( dict( role='um%d' % i, ip_address=um_ip.text, hostname=um_host.text ) )
-
-        return ret
+        return self.get_modules('um')
         
     def get_parm(self, section, parmname):   
         '''
@@ -102,12 +133,14 @@ class IdbXml(object):
         :param section: secion name in Calpont.xml
         :param parmname: parameter name in the section in Calpont.xml
         '''     
-        ps = self.__root.find(section)
-        if ps is None:
-            return ''
-        value = ps.find(parmname)
-        if value is None:
-            return ''
-        return value.text
-        
-        
+        return self.__parms.get( (section, parmname), '' )
+
+    def get_parms(self, parms):
+        '''
+        Returns a list with the value of each parameter in parms, '' for 
+        any that are not in Calpont.xml.
+
+        :param parms: list of (section, parmname) tuples
+        '''
+        get = self.__parms.get
+        return [ get( (section, parmname), '' ) for section, parmname in parms ]
@@ -0,0 +1,345 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.inventory
+
+In-memory model of an ansible INI inventory file: groups of hosts (with
+optional inline host variables), [<group>:children] and [<group>:vars]
+sections.  Hosts are indexed so membership checks do not scan the groups.
+
+An Inventory only writes its file when it has been changed since it was
+read or last saved, and always writes a temporary file and renames it so
+ansible never reads a partial inventory.  Parsed files are cached per
+process and reused for as long as the file's inode, mtime and size are
+unchanged.
+
+contains:
+    class Inventory
+    function read
+'''
+import os
+import shlex
+import threading
+from collections import OrderedDict
+from emtools.common.utils import write_file_atomic
+
+# hosts listed before any [group] header
+UNGROUPED = 'root'
+
+# path -> ((inode, mtime, size), parsed sections)
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _stat_key(path):
+    st = os.stat(path)
+    # a rename-based rewrite always gets a new inode, so this also catches
+    # rewrites within the mtime resolution
+    return (st.st_ino, st.st_mtime, st.st_size)
+
+def _parse(text):
+    '''
+    Parses inventory text into a list of (section, [entries]).  Host entries
+    are (host, ((var, value), ...)), :children entries are group names and
+    :vars entries are (var, value).
+    '''
+    sections = [ (UNGROUPED, []) ]
+    kind = None
+    for l in text.splitlines():
+        l = l.strip()
+        if not l or l[0] in '#;':
+            continue
+        if l[0] == '[':
+            name = l[1:len(l)-1]
+            kind = name.partition(':')[2] or None
+            sections.append( (name, []) )
+        elif kind == 'children':
+            sections[-1][1].append( l )
+        elif kind == 'vars':
+            k, _, v = l.partition('=')
+            sections[-1][1].append( (k.strip(), v.strip()) )
+        else:
+            words = shlex.split(l)
+            hvars = tuple( tuple(w.split('=', 1)) for w in words[1:] if w.find('=') > 0 )
+            sections[-1][1].append( (words[0], hvars) )
+    return sections
+
+def read(path):
+    '''
+    Returns an Inventory for an existing inventory file.  Raises IOError
+    if the file can not be read.
+    '''
+    inv = Inventory(path)
+    inv.reload()
+    return inv
+
+class Inventory(object):
+    '''
+    Ansible inventory with a host -> groups index.
+    '''
+
+    def __init__(self, path=None):
+        '''
+        Constructor.  The inventory starts out empty, use read() or reload()
+        to load an existing file.
+
+        :param path: [optional] inventory file for reload() and save()
+        '''
+        self.path = path
+        self.__clear()
+        self.__dirty = False
+
+    @property
+    def dirty(self):
+        '''True if the inventory changed since it was loaded or saved.'''
+        return self.__dirty
+
+    def groups(self):
+        '''Returns the host group names in file order.'''
+        return [ g for g in self.__hosts.iterkeys() if g != UNGROUPED ]
+
+    def has_host(self, host):
+        return self.__index.has_key(host)
+
+    def groups_of(self, host):
+        '''Returns the groups that list host directly.'''
+        return self.__index.get(host, OrderedDict()).keys()
+
+    def hosts(self, group='all'):
+        '''
+        Returns the hosts in group, including those in its child groups.
+        'all' is every host in the inventory, as for ansible.
+        '''
+        if group == 'all':
+            return self.__index.keys()
+        found = OrderedDict()
+        seen = set()
+        todo = [ group ]
+        while todo:
+            g = todo.pop(0)
+            if g in seen:
+                continue
+            seen.add(g)
+            for h in self.__hosts.get(g, {}):
+                found[h] = True
+            todo.extend( self.__children.get(g, []) )
+        return found.keys()
+
+    def host_vars(self, host):
+        '''Returns the inline variables for host (merged across its groups).'''
+        hvars = {}
+        for g in self.groups_of(host):
+            hvars.update( self.__hosts[g][host] )
+        return hvars
+
+    def children(self, group):
+        return list( self.__children.get(group, []) )
+
+    def group_vars(self, group):
+        return dict( self.__vars.get(group, {}) )
+
+    def add_host(self, host, group='all', hostvars=None):
+        '''Adds host to group (creating the group if needed).'''
+        members = self.__group(group)
+        hvars = OrderedDict( hostvars.iteritems() if hostvars else () )
+        if members.get(host) == hvars:
+            return
+        members[host] = hvars
+        self.__index.setdefault(host, OrderedDict())[group] = True
+        self.__dirty = True
+
+    def remove_host(self, host, group=None):
+        '''Removes host from group, or from every group if group is None.'''
+        for g in ( [ group ] if group else self.groups_of(host) ):
+            if self.__hosts.get(g, {}).has_key(host):
+                del self.__hosts[g][host]
+                del self.__index[host][g]
+                self.__dirty = True
+        if self.__index.has_key(host) and not self.__index[host]:
+            del self.__index[host]
+
+    def set_hosts(self, group, hosts):
+        '''Sets the hosts of group, in order, replacing any others.'''
+        members = self.__hosts.get(group)
+        if members is not None and members.keys() == list(hosts) and not [ v for v in members.itervalues() if v ]:
+            return
+        for h in self.__hosts.get(group, {}).keys():
+            self.remove_host(h, group)
+        self.__group(group)
+        for h in hosts:
+            self.add_host(h, group)
+        self.__dirty = True
+
+    def add_child(self, group, child):
+        '''Makes child a child group of group.'''
+        kids = self.__children.setdefault(group, [])
+        self.__section('%s:children' % group)
+        if child not in kids:
+            kids.append(child)
+            self.__dirty = True
+
+    def set_var(self, group, name, value):
+        '''Sets a variable in the group's :vars section.'''
+        gvars = self.__vars.setdefault(group, OrderedDict())
+        self.__section('%s:vars' % group)
+        if gvars.get(name) != value:
+            gvars[name] = value
+            self.__dirty = True
+
+    def reset(self, invdict):
+        '''
+        Replaces the contents with a dictionary in the write_inventory
+        format: each key is a section name ('<group>', '<group>:children'
+        or '<group>:vars') and each value a list of lines for that section.
+        '''
+        text = ''.join( '[%s]\n%s\n' % (name, '\n'.join(lines)) for name, lines in invdict.iteritems() )
+        before = self.__sections()
+        dirty = self.__dirty
+        self.__replace(_parse(text))
+        if self.__sections() == before:
+            # same contents, no need to rewrite the file
+            self.__dirty = dirty
+
+    def to_dict(self):
+        '''
+        Returns the contents as a dictionary of section name -> list of
+        lines (the read_inventory format).  Hosts listed before any group
+        are in the 'root' section.
+        '''
+        ret = OrderedDict()
+        ret[UNGROUPED] = self.__lines(UNGROUPED)
+        for name in self.__order:
+            ret[name] = self.__lines(name)
+        return ret
+
+    def text(self):
+        '''Returns the contents in INI inventory format.'''
+        out = [ '%s\n' % l for l in self.__lines(UNGROUPED) ]
+        for name in self.__order:
+            if name == UNGROUPED:
+                continue
+            out.append( '[%s]\n' % name )
+            out.extend( '%s\n' % l for l in self.__lines(name) )
+        return ''.join(out)
+
+    def reload(self):
+        '''Reads the inventory file, discarding any unsaved changes.'''
+        try:
+            key = _stat_key(self.path)
+        except OSError, e:
+            # the same error reading the file would have raised
+            raise IOError(e.errno, e.strerror, self.path)
+        _cache_lock.acquire()
+        try:
+            cached = _cache.get(self.path)
+        finally:
+            _cache_lock.release()
+        if cached and cached[0] == key:
+            sections = cached[1]
+        else:
+            f = open(self.path)
+            try:
+                sections = _parse(f.read())
+            finally:
+                f.close()
+            self.__cache(key, sections)
+        self.__replace(sections)
+        self.__dirty = False
+
+    def save(self, path=None):
+        '''
+        Writes the inventory file if anything changed or the file does not
+        exist yet.  Returns True if the file was written.
+
+        :param path: [optional] file to write instead of the inventory's own
+        '''
+        if path and path != self.path:
+            self.path = path
+            self.__dirty = True
+        if not self.__dirty and os.path.exists(self.path):
+            return False
+        # ansible inventories are normally 0644
+        write_file_atomic(self.path, self.text(), 0644)
+        self.__cache(_stat_key(self.path), self.__sections())
+        self.__dirty = False
+        return True
+
+    def __clear(self):
+        # group -> host -> inline vars
+        self.__hosts = OrderedDict()
+        # host -> groups listing it
+        self.__index = OrderedDict()
+        self.__children = OrderedDict()
+        self.__vars = OrderedDict()
+        # section names in file order
+        self.__order = []
+
+    def __section(self, name):
+        if name not in self.__order:
+            self.__order.append(name)
+            self.__dirty = True
+
+    def __group(self, group):
+        if group != UNGROUPED:
+            self.__section(group)
+        return self.__hosts.setdefault(group, OrderedDict())
+
+    def __replace(self, sections):
+        self.__clear()
+        for name, entries in sections:
+            group, _, kind = name.partition(':')
+            if kind == 'children':
+                self.__section(name)
+                self.__children[group] = list(entries)
+            elif kind == 'vars':
+                self.__section(name)
+                self.__vars[group] = OrderedDict(entries)
+            else:
+                members = self.__group(name)
+                for host, hvars in entries:
+                    members[host] = OrderedDict(hvars)
+                    self.__index.setdefault(host, OrderedDict())[name] = True
+        self.__dirty = True
+
+    def __sections(self):
+        '''The inverse of __replace, in the same form as _parse returns.'''
+        sections = [ (UNGROUPED, [ (h, tuple(v.iteritems())) for h, v in self.__hosts.get(UNGROUPED, {}).iteritems() ]) ]
+        for name in self.__order:
+            group, _, kind = name.partition(':')
+            if kind == 'children':
+                sections.append( (name, list(self.__children[group])) )
+            elif kind == 'vars':
+                sections.append( (name, self.__vars[group].items()) )
+            elif name != UNGROUPED:
+                sections.append( (name, [ (h, tuple(v.iteritems())) for h, v in self.__hosts[name].iteritems() ]) )
+        return sections
+
+    def __lines(self, name):
+        group, _, kind = name.partition(':')
+        if kind == 'children':
+            return list(self.__children.get(group, []))
+        elif kind == 'vars':
+            return [ '%s=%s' % kv for kv in self.__vars.get(group, {}).iteritems() ]
+        return [ ' '.join( [ h ] + [ '%s=%s' % kv for kv in v.iteritems() ] )
+                 for h, v in self.__hosts.get(name, {}).iteritems() ]
+
+    def __cache(self, key, sections):
+        _cache_lock.acquire()
+        try:
+            _cache[self.path] = (key, sections)
+        finally:
+            _cache_lock.release()
@@ -22,8 +22,7 @@ contains:
     class CommandReply
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT, reply_validation
 
 class CommandReply(JsonMsg):
     '''
@@ -31,6 +30,14 @@ class CommandReply(JsonMsg):
     
     Equivalent Thrift Message spec:
     
+    struct CommandResult {
+        1: required string       command;      // calpontConsole command
+        2: required i16          rc;           // command return code
+        3: required string       stdout;       // command stdout
+        4: required string       stderr;       // command stderr
+        5: optional map          results;      // parsed results (command dependent)
+    }
+    
     struct CommandReply {
         1: required string       cluster_name;
         2: required string       command;      // calpontConsole command
@@ -39,27 +46,46 @@ class CommandReply(JsonMsg):
         5: required string       stdout;       // command stdout
         6: required string       stderr;       // command stderr
         7: optional map          results;      // parsed results (command dependent)
+        8: optional list<CommandResult> replies; // one per command of a batch
     }
+    
+    For a batch request command holds the commands separated by '; ', rc,
+    stdout and stderr describe the batch as a whole and replies holds the
+    individual command results in request order.
     '''
 
-    def __init__(self, jsonstring):
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name":{ "type":"string", "blank":False },
+            "command":{ "type":"string", "blank":False },
+            "console_host":{ "type":"string" },
+            "rc":{ "type":"integer" },
+            "stdout":{ "type":"string" },
+            "stderr":{ "type":"string" },
+            "results":{ "type":"object", "required":False },
+            "replies":{
+                "type":"array",
+                "required":False,
+                "items":{
+                    "type":"object",
+                    "properties":{
+                        "command":{ "type":"string", "blank":False },
+                        "rc":{ "type":"integer" },
+                        "stdout":{ "type":"string" },
+                        "stderr":{ "type":"string" },
+                        "results":{ "type":"object", "required":False }
+                    }
+                }
+            },
+        }
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
         '''
         Constructor.
         '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name":{ "type":"string", "blank":False },
-                "command":{ "type":"string", "blank":False },
-                "console_host":{ "type":"string" },
-                "rc":{ "type":"integer" },
-                "stdout":{ "type":"string" },
-                "stderr":{ "type":"string" },
-                "results":{ "type":"object", "required":False },
-            }
-        }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def CommandReply_from_dict( factrequest_dict ):
-    return CommandReply( json.dumps( factrequest_dict ) )
+def CommandReply_from_dict( factrequest_dict, validation=None ):
+    return CommandReply( factrequest_dict, reply_validation(validation) )
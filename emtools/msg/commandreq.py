@@ -22,45 +22,60 @@ contains:
     class CommandReq
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT
 
 class CommandReq(JsonMsg):
     '''
-    Message sent to issue a calpontConsole command.
+    Message sent to issue a calpontConsole command or a batch of them.
     
     Equivalent Thrift Message spec:
     
     struct CommandReq {
         1: required string       cluster_name;
-        2: required string       command;  // calpontConsole command
+        2: optional string       command;  // calpontConsole command
         3: optional string       args;     // command arguments
+        4: optional list<string> commands; // calpontConsole commands run in
+                                           // one round trip
     }
+    
+    Exactly one of command and commands must be present.
     '''
 
-    def __init__(self, jsonstring):
-        '''
-        Constructor.
-        '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name":{
-                    "type":"string",
-                    "blank":False
-                },
-                "command":{
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name":{
+                "type":"string",
+                "blank":False
+            },
+            "command":{
+                "type":"string",
+                "blank":False,
+                "required":False
+            },
+            "args":{
+                "type":"string",
+                "required":False
+            },
+            "commands":{
+                "type":"array",
+                "items":{
                     "type":"string",
                     "blank":False
                 },
-                "args":{
-                    "type":"string",
-                    "required":False
-                },
-            }
+                "minItems":1,
+                "required":False
+            },
         }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
+        '''
+        Constructor.
+        '''
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
+        if self.has_key('command') == self.has_key('commands'):
+            raise ValueError("CommandReq requires exactly one of command or commands")
 
-def CommandReq_from_dict( factrequest_dict ):
-    return CommandReq( json.dumps( factrequest_dict ) )
+def CommandReq_from_dict( factrequest_dict, validation=STRICT ):
+    return CommandReq( factrequest_dict, validation )
@@ -22,8 +22,7 @@ contains:
     class ConfigReply
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT, reply_validation
 
 class ConfigReply(JsonMsg):
     '''
@@ -44,37 +43,43 @@ class ConfigReply(JsonMsg):
         1: required string       em_category;         // the cataegory of the parameter, e.g., UM or PM
         2: required string       em_parameter;        // the parameter name
         3: required string       value;               // the value of parameter
+        4: optional i32          rc;                  // setConfig only: exit status of setting it
+        5: optional string       stderr;              // setConfig only: error output if rc != 0
     }
 
     struct ConfigReply {
         1: required list of ParmInfo;        // parameter information
+        2: optional i32          rc;          // 1 if any parameter could not be set
     }
     '''
     
-    def __init__(self, jsonstring):
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name" : { "type": "string" },
+            "config" : {
+                "items": {
+                    "type":"object",
+                    "properties": {
+                        "em_category" : { "type": "string" },
+                        "em_parameter" : { "type": "string" },
+                        "value" : { "type": "string"  },
+                        "rc" : { "type": "integer", "required" : False },
+                        "stderr" : { "type": "string", "required" : False }
+                    }
+                },
+                "minItems": 0
+            },
+            "rc" : { "type": "integer", "required" : False }
+        }
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
         '''
         Constructor.
         '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name" : { "type": "string" }, 
-                "config" : {
-                    "items": {
-                        "type":"object",
-                        "properties": {
-                            "em_category" : { "type": "string" },
-                            "em_parameter" : { "type": "string" },
-                            "value" : { "type": "string"  }
-                        }
-                    },
-                    "minItems": 0 
-                }
-            }
-        }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def ConfigReply_from_dict( configreply_dict ):
-    return ConfigReply( json.dumps( configreply_dict ) )
+def ConfigReply_from_dict( configreply_dict, validation=None ):
+    return ConfigReply( configreply_dict, reply_validation(validation) )
     
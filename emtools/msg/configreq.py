@@ -22,8 +22,7 @@ contains:
     class ConfigRequest
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT
 
 class ConfigRequest(JsonMsg):
     '''
@@ -56,39 +55,40 @@ class ConfigRequest(JsonMsg):
     }
     '''
 
-    def __init__(self, jsonstring):
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name":{
+                "type":"string",
+                "blank":False
+            },
+            "action":{
+                "type":"string",
+                "blank":False
+            },
+            "set_params":{
+                "required":False,
+                "items": {
+                    "type":"object",
+                    "properties": {
+                        "em_category" : { "type": "string" },
+                        "em_parameter" : { "type": "string" },
+                        "value" : { "type": "string"  }
+                    }
+                },
+                "minItems": 0
+            }
+        }
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
         '''
         Constructor.
         '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name":{
-                    "type":"string",
-                    "blank":False
-                },
-                "action":{
-                    "type":"string",
-                    "blank":False
-                },
-                "set_params":{
-                    "required":False,
-                    "items": {
-                        "type":"object",
-                        "properties": {
-                            "em_category" : { "type": "string" },
-                            "em_parameter" : { "type": "string" },
-                            "value" : { "type": "string"  }
-                        }
-                    },
-                    "minItems": 0 
-                }
-            }
-        }   
         #print "jason string " +jsonstring
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
         if ( not self.has_key('action') ):
             raise Exception('ConfigRequest ERROR - exactly one of action must be present')
 
-def ConfigRequest_from_dict( configrequest_dict ):
-    return ConfigRequest( json.dumps( configrequest_dict ) )
+def ConfigRequest_from_dict( configrequest_dict, validation=STRICT ):
+    return ConfigRequest( configrequest_dict, validation )
@@ -22,8 +22,7 @@ contains:
     class ErrorMsg
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT, reply_validation
 
 class ErrorMsg(JsonMsg,BaseException):
     '''
@@ -41,43 +40,43 @@ class ErrorMsg(JsonMsg,BaseException):
     }
     '''
 
-    def __init__(self, jsonstring):
+    __schema = {
+        "type":"object",
+        "properties": {
+            "failed":{
+                "type":"boolean",
+                "blank":False
+            },
+            "msg":{
+                "type":"string",
+                "blank":False
+            },
+            "cmd":{
+                "type":"string",
+                "required":False
+            },
+            "rc":{
+                "type":"integer",
+                "required":False
+            },
+            "stdout":{
+                "type":"string",
+                "required":False
+            },
+            "stderr":{
+                "type":"string",
+                "required":False
+            },
+        }
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
         '''
         Constructor.
         '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "failed":{
-                    "type":"boolean",
-                    "blank":False
-                },
-                "msg":{
-                    "type":"string",
-                    "blank":False
-                },
-                "cmd":{
-                    "type":"string",
-                    "required":False
-                },
-                "rc":{
-                    "type":"integer",
-                    "required":False
-                },
-                "stdout":{
-                    "type":"string",
-                    "required":False
-                },
-                "stderr":{
-                    "type":"string",
-                    "required":False
-                },
-            }
-        }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def ErrorMsg_from_parms( msg, cmd=None, rc=None, stdout=None, stderr=None):
+def ErrorMsg_from_parms( msg, cmd=None, rc=None, stdout=None, stderr=None, validation=None ):
     errordict = {
         "failed": True,
         "msg" : msg
@@ -90,4 +89,4 @@ def ErrorMsg_from_parms( msg, cmd=None, rc=None, stdout=None, stderr=None):
         errordict['stdout'] = stdout
     if stderr is not None:
         errordict['stderr'] = stderr
-    return ErrorMsg( json.dumps( errordict ) )
+    return ErrorMsg( errordict, reply_validation(validation) )
@@ -22,8 +22,7 @@ contains:
     class FactReply
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT, reply_validation
 
 class FactReply(JsonMsg):
     '''
@@ -65,47 +64,47 @@ class FactReply(JsonMsg):
       - instance_info must contain at least one item.
     '''
     
-    def __init__(self, jsonstring):
-        '''
-        Constructor.
-        '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_info" : {
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_info" : {
+                "type":"object",
+                "properties": {
+                    "valid" : { "type": "boolean" },
+                    "name" : { "type": "string" },
+                    "os_family" : { "type": "string" },
+                    "gluster_version" : { "type": "string"  },
+                    "hadoop_version" : { "type": "string" },
+                    "infinidb_version" : { "type": "string" },
+                    "em_version" : { "type": "string" },
+                    "reason"     : { "type": "string", "required" : False }
+                }
+            },
+            "instance_info" : {
+                "type":"object",
+                "items": {
                     "type":"object",
                     "properties": {
                         "valid" : { "type": "boolean" },
-                        "name" : { "type": "string" },
-                        "os_family" : { "type": "string" },
+                        "ip_address" : { "type": "string" },
                         "gluster_version" : { "type": "string"  },
                         "hadoop_version" : { "type": "string" },
-                        "infinidb_version" : { "type": "string" },
-                        "em_version" : { "type": "string" },
                         "reason"     : { "type": "string", "required" : False }
                     }
-                },
-                "instance_info" : {
-                    "type":"object",
-                    "items": {
-                        "type":"object",
-                        "properties": {    
-                            "valid" : { "type": "boolean" },
-                            "ip_address" : { "type": "string" },
-                            "gluster_version" : { "type": "string"  },
-                            "hadoop_version" : { "type": "string" },
-                            "reason"     : { "type": "string", "required" : False }
-                        }
-                    }
-                },
-                "role_info" : {
-                    "type":"object"                               
-                }         
+                }
+            },
+            "role_info" : {
+                "type":"object"
             }
         }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
+        '''
+        Constructor.
+        '''
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def FactReply_from_dict( factreply_dict ):
-    return FactReply( json.dumps( factreply_dict ) )
+def FactReply_from_dict( factreply_dict, validation=None ):
+    return FactReply( factreply_dict, reply_validation(validation) )
     
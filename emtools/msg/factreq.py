@@ -22,8 +22,7 @@ contains:
     class FactRequest
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT
 
 class FactRequest(JsonMsg):
     '''
@@ -39,6 +38,7 @@ class FactRequest(JsonMsg):
         4: optional string       ssh_key;  // ssh private key text
         5: optional string       ssh_pass; // ssh password
         6: optional i16          ssh_part; // ssh port
+        7: optional bool         refresh_facts; // ignore cached host facts
     }
     
     ADDITIONAL VALIDATION: 
@@ -47,46 +47,50 @@ class FactRequest(JsonMsg):
       - exactly one of ssh_key and ssh_pass must be present
     '''
 
-    def __init__(self, jsonstring):
-        '''
-        Constructor.
-        '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name":{
-                    "type":"string",
-                    "blank":False
-                },
-                "hostnames": {
-                    "items": {
-                        "type":"string"
-                    },
-                    "minItems": 1
-                },
-                "ssh_user":{
-                    "type":"string",
-                    "blank":False
-                },
-                "ssh_key":{
-                    "type":"string",
-                    "required": False
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name":{
+                "type":"string",
+                "blank":False
+            },
+            "hostnames": {
+                "items": {
+                    "type":"string"
                 },
-                "ssh_pass":{
-                    "type":"string",
-                    "required": False
-                },
-                "ssh-port":{
-                    "type":"integer",
-                    "required": False
-                }
+                "minItems": 1
+            },
+            "ssh_user":{
+                "type":"string",
+                "blank":False
+            },
+            "ssh_key":{
+                "type":"string",
+                "required": False
+            },
+            "ssh_pass":{
+                "type":"string",
+                "required": False
+            },
+            "ssh-port":{
+                "type":"integer",
+                "required": False
+            },
+            "refresh_facts":{
+                "type":"boolean",
+                "required": False
             }
         }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
+        '''
+        Constructor.
+        '''
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
         if ( self.has_key('ssh_key') and self.has_key('ssh_pass') ) or\
             ( not self.has_key('ssh_key') and not self.has_key('ssh_pass') ):
             raise Exception('FoctRequest ERROR - exactly one of ssh_key, ssh_pass must be present')
 
-def FactRequest_from_dict( factrequest_dict ):
-    return FactRequest( json.dumps( factrequest_dict ) )
+def FactRequest_from_dict( factrequest_dict, validation=STRICT ):
+    return FactRequest( factrequest_dict, validation )
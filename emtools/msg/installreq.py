@@ -22,8 +22,7 @@ contains:
     Class InstallReq
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT
 
 class InstallReq(JsonMsg):
     '''
@@ -52,38 +51,38 @@ class InstallReq(JsonMsg):
     }
         '''
 
-    def __init__(self, jsonstring):
-        '''
-        Constructor.
-        '''
-        self.__schema = {
-            "type" : "object",
-            "properties" : {
-                "cluster_name" : { "type" : "string" },
-                "cluster_info" : {
-                    "type" : "object",
-                    "properties" : {
-                        "infinidb_version" : { "type": "string" },
-                        "dbroots_per_pm"   : { "type": "integer"},
-                        "dbroot_list"      : {
-                            "type": "array",
-                            "items" : {
-                                "type" : "array"
-                            },
-                            "required": False
+    __schema = {
+        "type" : "object",
+        "properties" : {
+            "cluster_name" : { "type" : "string" },
+            "cluster_info" : {
+                "type" : "object",
+                "properties" : {
+                    "infinidb_version" : { "type": "string" },
+                    "dbroots_per_pm"   : { "type": "integer"},
+                    "dbroot_list"      : {
+                        "type": "array",
+                        "items" : {
+                            "type" : "array"
                         },
-                        "infinidb_user"    : { "type": "string"  },
-                        "storage_type"     : {
-                            "enum": ["local","hdfs","gluster"]   },
-                        "pm_query"         : { "type": "boolean" },
-                        "um_replication"   : { "type": "boolean" }
-                    }
-                },
-                "role_info" : { "type" : "object" }
-            }
+                        "required": False
+                    },
+                    "infinidb_user"    : { "type": "string"  },
+                    "storage_type"     : {
+                        "enum": ["local","hdfs","gluster"]   },
+                    "pm_query"         : { "type": "boolean" },
+                    "um_replication"   : { "type": "boolean" }
+                }
+            },
+            "role_info" : { "type" : "object" }
         }
+    }
 
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+    def __init__(self, jsonstring, validation=STRICT):
+        '''
+        Constructor.
+        '''
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def InstallReq_from_dict( install_dict ):
-    return InstallReq( json.dumps( install_dict ) )
+def InstallReq_from_dict( install_dict, validation=STRICT ):
+    return InstallReq( install_dict, validation )
@@ -22,8 +22,7 @@ contains:
     class InventoryRequest
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT
 
 class InventoryRequest(JsonMsg):
     '''
@@ -45,24 +44,24 @@ class InventoryRequest(JsonMsg):
       none
     '''
     
-    def __init__(self, jsonstring):
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name":{
+                "type":"string",
+                "blank":False
+            },
+            "role_info" : {
+                "type":"object"
+            }
+        }
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
         '''
         Constructor.
         '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name":{
-                    "type":"string",
-                    "blank":False
-                },
-                "role_info" : {
-                    "type":"object"                               
-                }         
-            }
-        }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def InventoryRequest_from_dict( inv_dict ):
-    return InventoryRequest( json.dumps( inv_dict ) )
+def InventoryRequest_from_dict( inv_dict, validation=STRICT ):
+    return InventoryRequest( inv_dict, validation )
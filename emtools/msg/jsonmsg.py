@@ -20,10 +20,127 @@ emtools.jsonmsg
 
 contains:
     Class JsonMsg - Base class for JSON messages 
+    function reply_validation
+    function use_backend
+    functions loads, dumps
 '''
 
-import validictory
 import json
+from schema import get_validator
+
+# JSON libraries that can encode and decode messages, fastest first.
+# Messages use the stdlib json module unless another one is selected with
+# use_backend.  The others are not exact replacements on python 2: 
+# simplejson decodes ASCII strings as str rather than unicode, and ujson
+# formats pretty output differently
+DEFAULT_BACKEND = 'json'
+BACKENDS = ( 'ujson', 'simplejson', 'json' )
+AUTO = 'auto'
+
+# output formats: compact for messages read by programs, pretty for people
+COMPACT = 'compact'
+PRETTY = 'pretty'
+
+def _json_codec(mod):
+    '''Returns (loads, compact dumps, pretty dumps) for a json-like module.'''
+    return ( mod.loads,
+             lambda data: mod.dumps( data, separators=(',', ':') ),
+             lambda data: mod.dumps( data, sort_keys=True, indent=4 ) )
+
+def _ujson_codec(mod):
+    compact = lambda data: mod.dumps( data, escape_forward_slashes=False )
+    pretty = lambda data: mod.dumps( data, sort_keys=True, indent=4 )
+    try:
+        compact( {} )
+    except TypeError:
+        # older ujson releases always write '/' as '\/'
+        compact = _json_codec( json )[1]
+    try:
+        pretty( {} )
+    except TypeError:
+        # older ujson releases can't sort keys
+        pretty = _json_codec( json )[2]
+    return ( mod.loads, compact, pretty )
+
+_codec_makers = { 'ujson' : _ujson_codec,
+                  'simplejson' : _json_codec,
+                  'json' : _json_codec }
+
+_backend = None
+_loads = _dumps_compact = _dumps_pretty = None
+
+def use_backend(name=DEFAULT_BACKEND):
+    '''
+    Selects the JSON library used to encode and decode messages.
+
+    :param name: [optional] one of BACKENDS, or AUTO for the first one
+                 that can be imported.  The default is the stdlib json.
+
+    Returns the name of the backend selected
+    :raises ImportError: if the named backend is not installed
+    '''
+    global _backend, _loads, _dumps_compact, _dumps_pretty
+    if name == AUTO:
+        for name in BACKENDS:
+            try:
+                __import__( name )
+                break
+            except ImportError:
+                pass
+    if not _codec_makers.has_key( name ):
+        raise ValueError( 'unknown JSON backend: %s' % name )
+    _loads, _dumps_compact, _dumps_pretty = _codec_makers[name]( __import__( name ) )
+    _backend = name
+    return name
+
+use_backend()
+
+def loads(jsonstring):
+    '''
+    Decodes a JSON string with the selected backend.
+
+    :raises ValueError: on invalid JSON string
+    '''
+    return _loads( jsonstring )
+
+def dumps(data, fmt=COMPACT):
+    '''
+    Encodes data as JSON with the selected backend.
+
+    :param fmt: [optional] COMPACT (no whitespace) or PRETTY (keys sorted,
+                indented by 4)
+    '''
+    if fmt == PRETTY:
+        return _dumps_pretty( data )
+    return _dumps_compact( data )
+
+def str_format():
+    '''Returns the output format of str(msg), the emtools.msg.str_format property.'''
+    import emtools.common as common
+    return common.props['emtools.msg.str_format']
+
+# validation modes:
+#   strict - the whole message is checked when it is constructed
+#   sample - the same, but only a sample of the items of each list
+#   lazy   - the whole message is checked the first time it is used
+#   none   - the message is not checked
+STRICT = 'strict'
+SAMPLE = 'sample'
+LAZY = 'lazy'
+NONE = 'none'
+VALIDATION_MODES = ( STRICT, SAMPLE, LAZY, NONE )
+
+def reply_validation(validation=None):
+    '''
+    Returns the validation mode for a reply built by emtools itself: 
+    validation if set, otherwise the emtools.msg.reply_validation property.
+    Messages that come from outside (i.e. requests from the EM) should 
+    always be validated strictly.
+    '''
+    if validation is None:
+        import emtools.common as common
+        validation = common.props['emtools.msg.reply_validation']
+    return validation
 
 class JsonMsg(object):
     '''
@@ -39,37 +156,70 @@ class JsonMsg(object):
     Example Usage:
     
     class AMsg(JsonMsg):
-        def __init__(self, jsonstring):
-            self.__schema = { 
-                "type":"object",
-                "properties": {
-                    "numbers": {
-                        "items": {
-                            "type":"integer"
-                        },
-                        "minItems": 1
-                    }
+        __schema = { 
+            "type":"object",
+            "properties": {
+                "numbers": {
+                    "items": {
+                        "type":"integer"
+                    },
+                    "minItems": 1
                 }
             }
+        }
         
+        def __init__(self, jsonstring):
             JsonMsg.__init__( self, jsonstring, self.__schema )
         
     a = AMsg('{ "numbers" : [1, 2, 3] }')
     print a["numbers"]  # prints [1,2,3]    
+    b = AMsg({ "numbers" : [1, 2, 3] })
+
+    The schema is compiled into a validation function the first time a
+    message class is constructed (see emtools.msg.schema), so it should be
+    a class attribute rather than being built by each constructor call.
+
+    How much of a message is validated, and when, is set by the validation
+    mode (see VALIDATION_MODES).  With lazy validation the error is raised
+    by the first method call on the message.
     '''
-    def __init__(self, jsonstring, schema):
+    def __init__(self, jsonstring, schema, validation=STRICT):
         '''
         Constructor.
         
-        :param jsonstring: a JSON string representing the message instance.
+        :param jsonstring: a JSON string representing the message instance,
+                           or the message contents as a dictionary.  The
+                           message uses the dictionary itself, not a copy.
         :param schema: a validictory style JSON schema definition. 
+        :param validation: [optional] validation mode, one of VALIDATION_MODES
         
-        :raises ValueError: on invalid JSON string
+        :raises ValueError: on invalid JSON string or validation mode
         :raises FieldValidationError: on schema validation error  
         '''
-        self.__data = json.loads( jsonstring )
-        validator = validictory.validator.SchemaValidator(blank_by_default=True)
-        validator.validate( self.__data, schema )
+        if isinstance( jsonstring, dict ):
+            self.__data = jsonstring
+        else:
+            self.__data = _loads( jsonstring )
+        self.__pending = None
+        if validation == STRICT:
+            get_validator( self.__class__, schema )( self.__data )
+        elif validation == SAMPLE:
+            get_validator( self.__class__, schema, sample=True )( self.__data )
+        elif validation == LAZY:
+            self.__pending = get_validator( self.__class__, schema )
+        elif validation != NONE:
+            raise ValueError( 'unknown validation mode: %s' % validation )
+
+    def validate(self):
+        """
+        Runs a pending lazy validation.  Does nothing if the message was 
+        already validated.
+
+        :raises FieldValidationError: on schema validation error  
+        """
+        if self.__pending:
+            self.__pending( self.__data )
+            self.__pending = None
 
     def has_key(self, key):
         """
@@ -78,6 +228,8 @@ class JsonMsg(object):
         :param key: key value to check for
         :returns: boolean indicating if key is present
         """
+        if self.__pending:
+            self.validate()
         return self.__data.has_key(key)
     
     def __getitem__(self, key):
@@ -90,6 +242,8 @@ class JsonMsg(object):
          
         :raises KeyError: if key not present
         """
+        if self.__pending:
+            self.validate()
         return self.__data[key]
 
     def __setitem__(self, key, value):
@@ -101,11 +255,29 @@ class JsonMsg(object):
         :param value: value to set to
         :returns: None
         """
+        if self.__pending:
+            self.validate()
         self.__data[key] = value
 
-    def json_dumps(self):
-        """Dumps the map as a JSON encoded string."""
-        return json.dumps(self.__data)
+    def to_dict(self):
+        """
+        Returns the message contents as a dictionary, for encoding as part
+        of a larger JSON document.  This is the message's own dictionary,
+        not a copy.
+        """
+        if self.__pending:
+            self.validate()
+        return self.__data
+
+    def json_dumps(self, fmt=COMPACT):
+        """
+        Dumps the map as a JSON encoded string.
+
+        :param fmt: [optional] COMPACT or PRETTY
+        """
+        if self.__pending:
+            self.validate()
+        return dumps(self.__data, fmt)
 
     def __str__(self): 
-        return json.dumps(self.__data, sort_keys=True, indent=4)
+        return self.json_dumps( str_format() )
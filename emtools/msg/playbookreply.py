@@ -22,8 +22,7 @@ contains:
     class PlaybookReply
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT, reply_validation
 
 class PlaybookReply(JsonMsg):
     '''
@@ -57,33 +56,33 @@ class PlaybookReply(JsonMsg):
       none
     '''
     
-    def __init__(self, jsonstring):
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name":{
+                "type":"string",
+                "blank":False
+            },
+            "playbook_info" : {
+                "type":"object",
+                "properties" : {
+                    "name" : { "type" : "string", "blank" : False },
+                    "hostspec" : { "type" : "string", "blank" : False },
+                    "extravars" : { "type" : "string" },
+                }
+            },
+            "rc" : { "type" : "integer" },
+            "stdout" : { "type" : "string" },
+            "stderr" : { "type" : "string" },
+            "recap_info" : { "type" : "object", "required" : False }
+        }
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
         '''
         Constructor.
         '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name":{
-                    "type":"string",
-                    "blank":False
-                },
-                "playbook_info" : {
-                    "type":"object",
-                    "properties" : {
-                        "name" : { "type" : "string", "blank" : False },
-                        "hostspec" : { "type" : "string", "blank" : False },
-                        "extravars" : { "type" : "string" },                        
-                    }                               
-                },
-                "rc" : { "type" : "integer" },
-                "stdout" : { "type" : "string" },
-                "stderr" : { "type" : "string" },
-                "recap_info" : { "type" : "object", "required" : False }         
-            }
-        }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def PlaybookReply_from_dict( inv_dict ):
-    return PlaybookReply( json.dumps( inv_dict ) )
\ No newline at end of file
+def PlaybookReply_from_dict( inv_dict, validation=None ):
+    return PlaybookReply( inv_dict, reply_validation(validation) )
\ No newline at end of file
@@ -22,8 +22,7 @@ contains:
     class PlaybookRequest
 '''
 
-from jsonmsg import JsonMsg
-import json
+from jsonmsg import JsonMsg, STRICT
 
 class PlaybookRequest(JsonMsg):
     '''
@@ -46,29 +45,29 @@ class PlaybookRequest(JsonMsg):
       none
     '''
     
-    def __init__(self, jsonstring):
+    __schema = {
+        "type":"object",
+        "properties": {
+            "cluster_name":{
+                "type":"string",
+                "blank":False
+            },
+            "playbook_info" : {
+                "type":"object",
+                "properties" : {
+                    "name" : { "type" : "string", "blank" : False },
+                    "hostspec" : { "type" : "string", "blank" : False },
+                    "extravars" : { "type" : "string" },
+                }
+            }
+        }
+    }
+
+    def __init__(self, jsonstring, validation=STRICT):
         '''
         Constructor.
         '''
-        self.__schema = { 
-            "type":"object",
-            "properties": {
-                "cluster_name":{
-                    "type":"string",
-                    "blank":False
-                },
-                "playbook_info" : {
-                    "type":"object",
-                    "properties" : {
-                        "name" : { "type" : "string", "blank" : False },
-                        "hostspec" : { "type" : "string", "blank" : False },
-                        "extravars" : { "type" : "string" },                        
-                    }                               
-                }         
-            }
-        }
-        
-        JsonMsg.__init__( self, jsonstring, self.__schema )
+        JsonMsg.__init__( self, jsonstring, self.__schema, validation )
 
-def PlaybookRequest_from_dict( inv_dict ):
-    return PlaybookRequest( json.dumps( inv_dict ) )
\ No newline at end of file
+def PlaybookRequest_from_dict( inv_dict, validation=STRICT ):
+    return PlaybookRequest( inv_dict, validation )
\ No newline at end of file
@@ -0,0 +1,263 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.msg.schema
+
+Compiles validictory style schemas into validation functions.
+
+validictory walks the schema dictionary for every message it validates,
+looking up a validate_<keyword> method for each keyword of each field.
+compile_schema() does that walk once and returns a function made of
+closures that only perform the checks themselves.  The checks, the order
+they run in and the FieldValidationError messages are the same as
+validictory's (with required_by_default=True and blank_by_default=True,
+the settings JsonMsg has always used).
+
+Only the keywords the emtools messages use are compiled: type (a single
+type name), properties, items (a single schema), required, blank,
+minItems, maxItems, minLength, maxLength, enum, title and description.
+A schema using anything else is validated by validictory itself.
+
+A schema can also be compiled to check only a sample of the items of
+each list, for large messages from a trusted source.
+
+get_validator() keeps one compiled validator per message class.
+
+Contains:
+    compile_schema()
+    get_validator()
+'''
+import copy
+import threading
+from collections import Mapping, Container
+import validictory
+from validictory.validator import FieldValidationError
+
+# number of items of each list checked when sampling
+SAMPLE_ITEMS = 10
+
+_str_type = basestring
+_int_types = (int, long)
+
+def _is_object(val):
+    return isinstance(val, Mapping) or (hasattr(val, 'keys') and hasattr(val, 'items'))
+
+_TYPES = {
+    'string'  : lambda val: isinstance(val, _str_type),
+    'integer' : lambda val: type(val) in _int_types,
+    'number'  : lambda val: type(val) in _int_types + (float,),
+    'boolean' : lambda val: type(val) == bool,
+    'object'  : _is_object,
+    'array'   : lambda val: isinstance(val, (list, tuple)),
+    'null'    : lambda val: val is None,
+    'any'     : lambda val: True
+}
+
+# every keyword validictory acts on
+_VALIDICTORY_KEYWORDS = set( n[len('validate_'):] for n in dir(validictory.SchemaValidator)
+                             if n.startswith('validate_') and not n.startswith('validate_type_') )
+
+def _error(desc, value, fieldname, **params):
+    params['value'] = value
+    params['fieldname'] = fieldname
+    raise FieldValidationError(desc % params, fieldname, value)
+
+class _Unsupported(Exception):
+    '''Raised while compiling a schema that validictory has to handle.'''
+
+def _check_type(fieldtype, schema, sample):
+    if not fieldtype:
+        return None
+    if not isinstance(fieldtype, _str_type) or not _TYPES.has_key(fieldtype):
+        raise _Unsupported()
+    type_checker = _TYPES[fieldtype]
+    def check(x, fieldname):
+        try:
+            value = x[fieldname]
+        except KeyError:
+            return
+        if not type_checker(value):
+            _error("Value %(value)r for field '%(fieldname)s' is not of type %(fieldtype)s",
+                   value, fieldname, fieldtype=fieldtype)
+    return check
+
+def _check_properties(properties, schema, sample):
+    if not isinstance(properties, dict):
+        raise _Unsupported()
+    props = [ (name, _compile(sub, sample)) for name, sub in properties.iteritems() if sub is not None ]
+    def check(x, fieldname):
+        value = x.get(fieldname)
+        if isinstance(value, dict):
+            for name, fn in props:
+                fn(value, name)
+    return check
+
+def _sample(value):
+    '''Returns up to SAMPLE_ITEMS items spread evenly over a list.'''
+    if len(value) <= SAMPLE_ITEMS:
+        return value
+    step = len(value) / SAMPLE_ITEMS
+    return value[0:len(value):step][:SAMPLE_ITEMS - 1] + [ value[-1] ]
+
+def _check_items(items, schema, sample):
+    if not isinstance(items, dict):
+        raise _Unsupported()
+    item_fn = _compile(items, sample)
+    def check(x, fieldname):
+        value = x.get(fieldname)
+        if isinstance(value, (list, tuple)):
+            if sample:
+                value = _sample(list(value))
+            for item in value:
+                try:
+                    item_fn({ '_data' : item }, '_data')
+                except FieldValidationError, e:
+                    # the same message validictory gives for list items
+                    old_error = str(e).replace("field '_data'", 'list item')
+                    raise type(e)("Failed to validate field '%s' list schema: %s" % (fieldname, old_error),
+                                  fieldname, e.value)
+    return check
+
+def _check_required(required, schema, sample):
+    if not required:
+        return None
+    def check(x, fieldname):
+        if fieldname not in x:
+            _error("Required field '%(fieldname)s' is missing", None, fieldname)
+    return check
+
+def _check_blank(blank, schema, sample):
+    if blank:
+        return None
+    def check(x, fieldname):
+        value = x.get(fieldname)
+        if isinstance(value, _str_type) and not value:
+            _error("Value %(value)r for field '%(fieldname)s' cannot be blank'", value, fieldname)
+    return check
+
+def _check_min_length(length, schema, sample):
+    def check(x, fieldname):
+        value = x.get(fieldname)
+        if isinstance(value, (_str_type, list, tuple)) and len(value) < length:
+            _error("Length of value %(value)r for field '%(fieldname)s' "
+                   "must be greater than or equal to %(length)d", value, fieldname, length=length)
+    return check
+
+def _check_max_length(length, schema, sample):
+    def check(x, fieldname):
+        value = x.get(fieldname)
+        if isinstance(value, (_str_type, list, tuple)) and len(value) > length:
+            _error("Length of value %(value)r for field '%(fieldname)s' "
+                   "must be less than or equal to %(length)d", value, fieldname, length=length)
+    return check
+
+def _check_enum(options, schema, sample):
+    if not isinstance(options, Container):
+        raise _Unsupported()
+    def check(x, fieldname):
+        value = x.get(fieldname)
+        if value is not None and value not in options:
+            _error("Value %(value)r for field '%(fieldname)s' is not in the enumeration: %(options)r",
+                   value, fieldname, options=options)
+    return check
+
+def _check_text(text, schema, sample):
+    if not isinstance(text, (_str_type, type(None))):
+        raise _Unsupported()
+    return None
+
+_KEYWORDS = {
+    'type'        : _check_type,
+    'properties'  : _check_properties,
+    'items'       : _check_items,
+    'required'    : _check_required,
+    'blank'       : _check_blank,
+    'minItems'    : _check_min_length,
+    'minLength'   : _check_min_length,
+    'maxItems'    : _check_max_length,
+    'maxLength'   : _check_max_length,
+    'enum'        : _check_enum,
+    'title'       : _check_text,
+    'description' : _check_text
+}
+
+def _compile(schema, sample):
+    '''Returns a function(container, fieldname) validating one field.'''
+    if not isinstance(schema, dict) or 'optional' in schema or 'requires' in schema:
+        raise _Unsupported()
+    # the same defaults and keyword order validictory uses, so the first
+    # error found is the same one validictory would report
+    newschema = copy.copy(schema)
+    if 'required' not in schema:
+        newschema['required'] = True
+    if 'blank' not in schema:
+        newschema['blank'] = True
+    checks = []
+    for keyword in newschema:
+        if _KEYWORDS.has_key(keyword):
+            fn = _KEYWORDS[keyword](newschema[keyword], schema, sample)
+            if fn:
+                checks.append(fn)
+        elif keyword in _VALIDICTORY_KEYWORDS:
+            raise _Unsupported()
+    if len(checks) == 1:
+        return checks[0]
+    def check(x, fieldname):
+        for fn in checks:
+            fn(x, fieldname)
+    return check
+
+def compile_schema(schema, sample=False):
+    '''
+    Returns a function(data) that raises FieldValidationError if data does
+    not match schema, the same as validictory would.
+
+    :param sample: [optional] only check a sample of the items of each 
+                   list (see SAMPLE_ITEMS)
+    '''
+    try:
+        fn = _compile(schema, sample)
+        return lambda data: fn({ '_data' : data }, '_data')
+    except _Unsupported:
+        validator = validictory.validator.SchemaValidator(blank_by_default=True)
+        return lambda data: validator.validate(data, schema)
+
+# (message class, sample) -> (schema, validation function)
+_registry = {}
+_registry_lock = threading.Lock()
+
+def get_validator(key, schema, sample=False):
+    '''
+    Returns the compiled validation function for a message class.  A schema
+    that is not the one registered for key (i.e. one built by the message's
+    constructor) is compared with it and compiled again if different.
+
+    :param key: message class
+    :param schema: schema for the message
+    :param sample: [optional] see compile_schema
+    '''
+    entry = _registry.get((key, sample))
+    if entry is not None and ( entry[0] is schema or entry[0] == schema ):
+        return entry[1]
+    fn = compile_schema(schema, sample)
+    _registry_lock.acquire()
+    try:
+        _registry[(key, sample)] = (schema, fn)
+    finally:
+        _registry_lock.release()
+    return fn
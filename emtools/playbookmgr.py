@@ -27,12 +27,56 @@ import emtools.common.properties as properties
 import emtools.common.logutils as logutils
 from emtools.msg.errormsg import ErrorMsg_from_parms
 import shutil
-from emtools.common.utils import syscall_log,mkdir_p
+from emtools.common.utils import syscall_log,syscall_stream,mkdir_p
+from emtools.playbookstream import PlaybookStream, ModuleStream, RECAP_PATT, EVENTS_ENV
 import json
 import re
+import tempfile
+import pipes
+import uuid
+import time
+import emtools.templatesync as templatesync
+import emtools.inventory as inventory
+
+# 'fatal: [host] => msg' lines are how ansible-playbook reports unreachable hosts
+_FATAL_PATT = re.compile('^fatal: \[([^\]]+)\] => (.*)$', re.MULTILINE)
 
 Log = logutils.getLogger(__name__)
 
+def split_command_output(marker, count, stdout, stderr):
+    '''
+    Splits the output of a PlaybookMgr.run_commands shell script into one
+    dictionary per command with 'rc', 'stdout' and 'stderr' keys.
+    
+    :param marker: marker string used in the script
+    :param count: number of commands in the script
+    :param stdout: script stdout
+    :param stderr: script stderr
+    '''
+    results = [ { 'rc' : -1, 'stdout' : [], 'stderr' : [] } for i in range(count) ]
+    for which, text in (('stdout', stdout), ('stderr', stderr)):
+        cur = None
+        for l in text.split('\n'):
+            pos = l.find(marker)
+            if pos < 0:
+                if cur is not None:
+                    results[cur][which].append(l)
+                continue
+            if pos > 0 and cur is not None:
+                # the command's output did not end with a newline
+                results[cur][which].append(l[:pos])
+            parts = l[pos:].split()
+            idx = int(parts[2])
+            if parts[1] == 'begin':
+                cur = idx
+            else:
+                results[idx]['rc'] = int(parts[3])
+                cur = None
+    for r in results:
+        r['stdout'] = '\n'.join(r['stdout']).strip()
+        r['stderr'] = '\n'.join(r['stderr']).strip()
+    return results
+
 class PlaybookMgr(object):
     '''
     PlaybookMgr manages an Ansible playbook specific to installation, etc.
@@ -51,6 +95,7 @@ class PlaybookMgr(object):
         ansible.cfg      - ansible configuration file
         .ssh/            - sub-directory for ssh key
             private_key  - ssh key
+            cp/          - ssh ControlPath sockets for persistent connections
         <inventory>      - [optional] from write_inventory() 
     '''
 
@@ -73,37 +118,29 @@ class PlaybookMgr(object):
             mkdir_p( basedir )
         self.__rootdir = '%s/%s' % (basedir, name)
         
+        srcroots = [ self.__props['emtools.playbookmgr.playbook_template'] ]
+        if extra_playbook_dir != None:
+            srcroots.append( extra_playbook_dir )
         try:
             # this update may fail if the user has messed up 
             # file permissions among other reasons
-            srcroot = self.__props['emtools.playbookmgr.playbook_template']
-            self.__update_playbook( srcroot, self.__rootdir )
-        except IOError, e:
+            self.__update_playbook( srcroots, self.__rootdir )
+        except (IOError, OSError), e:
             datastructure = { "failed" : True, "msg" : 'While attempting playbook update...%s' % e }
             print json.dumps(datastructure)
             sys.exit(1)
-
-        if extra_playbook_dir != None:
-            try:
-                # this update may fail if the user has messed up
-                # file permissions among other reasons
-                self.__update_playbook( extra_playbook_dir, self.__rootdir )
-            except IOError, e:
-                datastructure = { "failed" : True, "msg" : 'While attempting extra playbook update...%s' % e }
-                print json.dumps(datastructure)
-                sys.exit(1)
             
         self.__configfile = '%s/ansible.cfg' % ( self.__rootdir )
         self.__config = ConfigParser()
         if os.path.exists( self.__configfile ):
             self.__config.read( self.__configfile )
-            self.__read_config()
+        self.__read_config()
         
     def get_rootdir(self):
         '''Returns the playbook root directory.'''
         return self.__rootdir
     
-    def run_module(self, inventory_file, host_pattern, module_name, module_args='', no_raise=False, sudo=False):
+    def run_module(self, inventory_file, host_pattern, module_name, module_args='', no_raise=False, sudo=False, forks=None, callback=None):
         '''
         Runs an ansible module.
         
@@ -112,66 +149,232 @@ class PlaybookMgr(object):
         :param module_name: module name to run.
         :param module_args: module argument string.
         :param no_raise: do not do any error checking of the ansible result
+        :param forks: [optional] number of hosts ansible will run in parallel
+        :param callback: [optional] called with each host result event 
+                         (see stream_module) as soon as ansible reports it
         '''
-        cwd = os.getcwd()
-        os.chdir( self.__rootdir )
-        
-        tmpfile = '/tmp/%d.json' % os.getpid()
-        cmd = "ansible -i %s '%s' -m %s -j %s" % (inventory_file, host_pattern, module_name, tmpfile)
-        if module_args:
-            cmd = cmd + " --args='%s'" % module_args
-        if sudo:
-            cmd = cmd + " -s"
-            
-        # make sure we don't have an old out.json
-        if os.path.exists(tmpfile):
-            os.remove(tmpfile)
-        rc, out, err = syscall_log(cmd)
-        if not os.path.exists(tmpfile):
+        s = self.stream_module(inventory_file, host_pattern, module_name, module_args, sudo, forks)
+        reslt = { 'contacted' : {}, 'dark' : {} }
+        for event in s:
+            if event['status'] == 'unreachable':
+                reslt['dark'][event['host']] = event['result']
+            else:
+                reslt['contacted'][event['host']] = event['result']
+            if callback:
+                callback(event)
+        cmd, rc, out, err = s.cmd, s.rc, s.out, s.err
+
+        if not reslt['contacted'] and not reslt['dark']:
             reslt = ErrorMsg_from_parms("no json output from ansible - likely no hosts matched host_pattern", 
                                         cmd, rc=rc, stdout=out, stderr=err)
             if not no_raise:
                 raise reslt
             else:
                 return reslt
-        else:
-            f = open(tmpfile)
-            reslt = json.load(f)
-            f.close()
-            os.remove(tmpfile)
-        
-        os.chdir(cwd)
 
         if not no_raise:
-            if reslt.has_key('failed'):
-                raise ErrorMsg_from_parms(msg='run_module failure: %s' % ( reslt['msg'] ), 
-                                          cmd=cmd, rc=rc, stdout=out, stderr=err)
-            elif len(reslt['dark']):
+            if len(reslt['dark']):
                 dark_host = reslt['dark'].keys()[0]
-                if reslt['dark'][dark_host].has_key('msg'):
-                    msg = 'dark host %s: %s' % (reslt['dark'].keys()[0], reslt['dark'][dark_host]['msg'])
-                else:
-                    # don't know if this is a real case or not
-                    msg = 'dark host %s: %s' % (reslt['dark'].keys()[0], reslt['dark'])
-                    
-                raise ErrorMsg_from_parms(msg=msg, cmd=cmd, rc=rc, stdout=out, stderr=err)
-            elif len(reslt['contacted']) >= 1:
+                raise ErrorMsg_from_parms(msg=self.host_error(reslt, dark_host), cmd=cmd, rc=rc, stdout=out, stderr=err)
+            else:
                 contacted = reslt['contacted'].keys()[0]
-                if reslt['contacted'][contacted].has_key('failed'):
-                    raise ErrorMsg_from_parms(msg='run_module failure: %s' % reslt['contacted'][contacted]['msg'],
-                                              cmd='%s' % reslt['contacted'][contacted]['cmd'],
-                                              rc=rc, stdout=out, stderr=err)
-                elif reslt['contacted'][contacted].has_key('rc') and reslt['contacted'][contacted]['rc'] != 0:
-                    raise ErrorMsg_from_parms(msg='run_module failure: %s' % 'see stdout/stderr',
-                                              cmd='%s' % reslt['contacted'][contacted]['cmd'],
+                msg = self.host_error(reslt, contacted)
+                if msg:
+                    raise ErrorMsg_from_parms(msg=msg,
+                                              cmd='%s' % reslt['contacted'][contacted].get('cmd', cmd),
                                               rc=rc, stdout=out, stderr=err)
-            else:
-                raise ErrorMsg_from_parms(msg="Unknown error, no dark or contacted hosts in %s..." % reslt,
-                                          cmd=cmd, rc=rc, stdout=out, stderr=err)
 
         return reslt
+
+    def stream_module(self, inventory_file, host_pattern, module_name, module_args='', sudo=False, forks=None):
+        '''
+        Starts an ansible module and returns a ModuleStream that yields a
+        result event for each host as ansible reports it:
+
+            { 'host' : <host>, 'status' : ok|failed|skipped|unreachable,
+              'result' : <module result> }
+
+        The events come from the emtools_events callback plugin in the
+        playbook root, so nothing is written to disk and any number of 
+        calls can run at once.  Arguments are the same as for run_module.
+
+        Example:
+            s = pmgr.stream_module('infinidb', 'all', 'ping')
+            for event in s:
+                ...
+            rc, out, err = s.rc, s.out, s.err
+        '''
+        cmd = "ansible -i %s '%s' -m %s" % (inventory_file, host_pattern, module_name)
+        if module_args:
+            cmd = cmd + " --args=%s" % pipes.quote(module_args)
+        if sudo:
+            cmd = cmd + " -s"
+        if forks:
+            cmd = cmd + " -f %d" % forks
+
+        # the environment setting overrides ansible.cfg, so keep any
+        # plugins configured there
+        plugins = './callback_plugins'
+        try:
+            plugins = '%s%s%s' % (self.__config.get('defaults', 'callback_plugins'), os.pathsep, plugins)
+        except:
+            pass
+        env = { EVENTS_ENV : '1', 'ANSIBLE_CALLBACK_PLUGINS' : plugins }
+        maxbuf = self.__props['emtools.playbookmgr.stream_maxbuf']
+        return ModuleStream( syscall_stream(cmd, cwd=self.__rootdir, env=env, maxbuf=maxbuf), maxbuf )
+
+    def host_error(self, reslt, host):
+        '''
+        Checks the result of run_module for a single host.  This applies the
+        same checks that run_module does when no_raise is not set, but to any
+        host in the result.  This is useful when a module was run against a
+        number of hosts with no_raise=True.
+        
+        :param reslt: dictionary returned by run_module
+        :param host: host name as it appears in reslt
+        
+        returns an error message string, or None if the module succeeded
+        '''
+        if reslt['dark'].has_key(host):
+            if reslt['dark'][host].has_key('msg'):
+                return 'dark host %s: %s' % (host, reslt['dark'][host]['msg'])
+            else:
+                # don't know if this is a real case or not
+                return 'dark host %s: %s' % (host, reslt['dark'])
+        elif reslt['contacted'].has_key(host):
+            if reslt['contacted'][host].has_key('failed'):
+                return 'run_module failure: %s' % reslt['contacted'][host]['msg']
+            elif reslt['contacted'][host].has_key('rc') and reslt['contacted'][host]['rc'] != 0:
+                return 'run_module failure: %s' % 'see stdout/stderr'
+            return None
+        else:
+            return "Unknown error, no dark or contacted hosts in %s..." % reslt
+           
+    def run_modules(self, inventory_file, host_pattern, modules, no_raise=False, sudo=False, forks=None):
+        '''
+        Runs an ordered list of ansible modules in a single ansible run.  A
+        throwaway playbook is generated with one task per module so that
+        each host is connected to once rather than once per module.
+        
+        :param inventory_file: inventory file to use.
+        :param host_pattern: pattern to use to select hosts (i.e. 'all').
+        :param modules: list of (module_name, module_args) tuples.
+        :param no_raise: do not do any error checking of the ansible result
+        :param sudo: run the modules with sudo
+        :param forks: [optional] number of hosts ansible will run in parallel
+        
+        returns a list with one entry per module.  Each entry is a dictionary
+        with 'dark' and 'contacted' keys as returned by run_module.
+        '''
+        if not modules:
+            return []
+
+        workdir = tempfile.mkdtemp(prefix='.run_modules-', dir=self.__rootdir)
+        try:
+            # each task registers its result and a final local task writes
+            # all of them out for the host.  ignore_errors keeps a failed 
+            # module from stopping the remaining modules on that host.
+            tmplfile = '%s/results.j2' % workdir
+            wf = open( tmplfile, 'w' )
+            wf.write('{{ [ %s ] | to_json }}\n' % 
+                     ', '.join([ 'emtools_result_%d' % i for i in range(len(modules)) ]))
+            wf.close()
+            
+            playbook_file = '%s/modules.yml' % workdir
+            wf = open( playbook_file, 'w' )
+            wf.write('---\n')
+            wf.write('- hosts: %s\n' % json.dumps(host_pattern))
+            wf.write('  gather_facts: False\n')
+            wf.write('  sudo: %s\n' % sudo)
+            wf.write('  tasks:\n')
+            for i in range(len(modules)):
+                module_name, module_args = modules[i]
+                action = module_name
+                if module_args:
+                    action = '%s %s' % (module_name, module_args)
+                wf.write('  - action: %s\n' % json.dumps(action))
+                wf.write('    register: emtools_result_%d\n' % i)
+                wf.write('    ignore_errors: True\n')
+            wf.write('  - local_action: %s\n' % 
+                     json.dumps('template src=%s dest=%s/{{ inventory_hostname }}.json' % (tmplfile, workdir)))
+            wf.write('    sudo: False\n')
+            wf.close()
+            
+            rc, results, out, err = self.run_playbook(playbook_file, inventory_file, forks=forks)
+            
+            reslts = [ { 'dark' : {}, 'contacted' : {} } for m in modules ]
+            for f in os.listdir(workdir):
+                if f.endswith('.json'):
+                    rf = open( '%s/%s' % (workdir, f) )
+                    hostreslts = json.load(rf)
+                    rf.close()
+                    for i in range(len(modules)):
+                        reslts[i]['contacted'][f[:-5]] = hostreslts[i]
+            
+            # any host in the recap that didn't write results was unreachable 
+            fatal = dict(_FATAL_PATT.findall(out))
+            for host in results.iterkeys():
+                if not reslts[0]['contacted'].has_key(host):
+                    msg = fatal[host] if fatal.has_key(host) else 'host unreachable'
+                    for r in reslts:
+                        r['dark'][host] = { 'msg' : msg }
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        cmd = 'run_modules %s' % ','.join([ m[0] for m in modules ])
+        if not len(reslts[0]['dark']) and not len(reslts[0]['contacted']):
+            reslt = ErrorMsg_from_parms("no results from ansible - likely no hosts matched host_pattern", 
+                                        cmd, rc=rc, stdout=out, stderr=err)
+            if not no_raise:
+                raise reslt
+            else:
+                return reslt
+
+        if not no_raise:
+            for reslt in reslts:
+                for host in reslt['dark'].keys() + reslt['contacted'].keys():
+                    msg = self.host_error(reslt, host)
+                    if msg:
+                        raise ErrorMsg_from_parms(msg=msg, cmd=cmd, rc=rc, stdout=out, stderr=err)
+
+        return reslts
            
-    def run_playbook(self, playbook_file, inventory_file, host_subset=None, playbook_args=None):
+    def run_commands(self, inventory_file, host_pattern, commands, no_raise=False, sudo=False):
+        '''
+        Runs a list of shell commands in one remote shell so that each host
+        is only connected to once.  Each command runs in its own subshell
+        and is bracketed by marker lines that are used to split the output
+        back up per command.
+        
+        :param inventory_file: inventory file to use.
+        :param host_pattern: pattern to use to select hosts (i.e. 'all').
+        :param commands: list of command strings
+        :param no_raise: do not do any error checking of the ansible result
+        :param sudo: run the commands with sudo
+        
+        returns the run_module result for the 'shell' module.  Each contacted
+        host additionally has a 'results' list with one dictionary per 
+        command containing 'cmd', 'rc', 'stdout' and 'stderr'.  A command 
+        that did not run to completion has an rc of -1.
+        '''
+        marker = '__emtools_%s__' % uuid.uuid4().hex
+        script = []
+        for i, c in enumerate(commands):
+            script.append('echo "%s begin %d"; echo "%s begin %d" 1>&2; ( %s ); echo "%s end %d $?"' % \
+                          (marker, i, marker, i, c, marker, i))
+        reslt = self.run_module( inventory_file, host_pattern, 'shell', '; '.join(script), 
+                                 no_raise=no_raise, sudo=sudo )
+        if reslt.has_key('contacted'):
+            for host in reslt['contacted'].iterkeys():
+                h = reslt['contacted'][host]
+                results = split_command_output( marker, len(commands), 
+                                                h.get('stdout', ''), h.get('stderr', '') )
+                for c, r in zip(commands, results):
+                    r['cmd'] = c
+                h['results'] = results
+        return reslt
+
+    def run_playbook(self, playbook_file, inventory_file, host_subset=None, playbook_args=None, forks=None):
         '''
         Runs an ansible playbook.
         
@@ -179,22 +382,17 @@ class PlaybookMgr(object):
         :param inventory_file: inventory file to use
         :param host_subset: list of hosts to receive the playbook
         :param playbook_args: quoted string passed to playbook as extra-vars argument
+        :param forks: [optional] number of hosts ansible will run in parallel
         '''
-        cwd = os.getcwd()
-        os.chdir( self.__rootdir )
-
-        cmd = "ansible-playbook -i %s %s" % (inventory_file, playbook_file)
-        if host_subset:
-            cmd = cmd + " -l '%s'" % host_subset
-        if playbook_args:
-            cmd = cmd + " --extra-vars=%s" % playbook_args
-        rc, out, err = syscall_log(cmd)
+        # ansible-playbook runs in the playbook root (for ansible.cfg and the 
+        # relative paths in it) without changing this process's directory
+        cmd = self.__playbook_cmd(playbook_file, inventory_file, host_subset, playbook_args, forks)
+        rc, out, err = syscall_log(cmd, cwd=self.__rootdir)
         recap_section = False
         results = {}
-        patt = re.compile('([a-zA-Z0-9\-_\.]+)\s+:\s+ok=([0-9]+)\s+changed=([0-9]+)\s+unreachable=([0-9]+)\s+failed=([0-9]+)')
         for l in out.split('\n'):
             if recap_section:
-                mat = patt.match(l)
+                mat = RECAP_PATT.match(l)
                 if mat:
                     results[mat.group(1)] = {
                         "ok" : int(mat.group(2)),
@@ -205,8 +403,43 @@ class PlaybookMgr(object):
             elif l.find('PLAY RECAP') == 0:
                 recap_section = True
 
-        os.chdir(cwd)
         return rc, results, out, err
+
+    def stream_playbook(self, playbook_file, inventory_file, host_subset=None, playbook_args=None, forks=None, logfile=None):
+        '''
+        Starts an ansible playbook and returns a PlaybookStream that yields
+        play, task, per-host and recap events as ansible-playbook produces
+        them.  Arguments are the same as for run_playbook.  Only the tail of
+        the output (emtools.playbookmgr.stream_maxbuf bytes) is kept in 
+        memory, the full output goes to logfile.
+        
+        :param logfile: [optional] file for the full output.  Defaults to
+                        log/<playbook>-<time>-<pid>.out under the playbook root
+        
+        Example:
+            s = pmgr.stream_playbook('bininstall.yml', 'infinidb')
+            for event in s:
+                ...
+            rc, results, out, err = s.rc, s.results, s.out, s.err
+        '''
+        if not logfile:
+            logfile = '%s/log/%s-%s-%d.out' % ( self.__rootdir, 
+                        os.path.splitext(os.path.basename(playbook_file))[0],
+                        time.strftime('%Y%m%d-%H%M%S'), os.getpid() )
+        cmd = self.__playbook_cmd(playbook_file, inventory_file, host_subset, playbook_args, forks)
+        maxbuf = self.__props['emtools.playbookmgr.stream_maxbuf']
+        return PlaybookStream( syscall_stream(cmd, cwd=self.__rootdir, maxbuf=maxbuf), logfile, maxbuf )
+
+    def __playbook_cmd(self, playbook_file, inventory_file, host_subset, playbook_args, forks):
+        '''Builds the ansible-playbook command line.'''
+        cmd = "ansible-playbook -i %s %s" % (inventory_file, playbook_file)
+        if host_subset:
+            cmd = cmd + " -l '%s'" % host_subset
+        if playbook_args:
+            cmd = cmd + " --extra-vars=%s" % playbook_args
+        if forks:
+            cmd = cmd + " -f %d" % forks
+        return cmd
              
     def write_vars(self, group_name, varlist):
         '''
@@ -224,51 +457,44 @@ class PlaybookMgr(object):
             wf.write('%s: %s\n' % (var[0],var[1]))
         wf.close()
         
+    def inventory(self, file_):
+        '''
+        Returns an emtools.inventory.Inventory for an inventory file in the
+        root directory of the playbook.  The Inventory is empty if the file
+        does not exist yet and is only written by its save() method.
+        
+        :param file_: inventory file name.
+        '''
+        path = '%s/%s' % ( self.__rootdir, file_ )
+        if os.path.exists( path ):
+            return inventory.read( path )
+        return inventory.Inventory( path )
+
     def write_inventory(self, file_, invdict):
         '''
         Creates a new Ansible inventory file.  The inventory file
         will be created in the root directory of the playbook.  Note
         that write_inventory overwrites any prior inventory file of 
-        the same name.
+        the same name (the file is left alone if its contents would not
+        change).
         
         :param file_: file name to create.
         :param invdict: dictionory containing inventory contents.  Each
                         key is a group in the file.  Each value should
                         be a list of the hostnames in that group.
         '''
-        invfile = '%s/%s' % ( self.__rootdir, file_ )
-        
-        wf = open( invfile, 'w' )
-        for group in invdict.iterkeys():
-            wf.write( '[%s]\n' % group)
-            
-            for h in invdict[group]:
-                wf.write( '%s\n' % h )
-                
-        wf.close()
+        inv = self.inventory( file_ )
+        inv.reset( invdict )
+        inv.save()
     
-    def read_inventory(self, inventory):
+    def read_inventory(self, inventory_):
         '''
         Read inventory file in the root directory of the playbook.
          
-        :param inventory: file name to read.
+        :param inventory_: file name to read.
         return dictionory containing inventory contents.  
         '''
-        cur_section = 'root'
-        ret = { 'root' : [] }
-        #print self.__rootdir+'/'+inventory
-       
-        f = open(self.__rootdir+'/'+inventory)
-        for l in f.readlines():
-            l = l.strip()
-            if len(l):
-                if l[0] == '[':
-                    cur_section = l[1:len(l)-1]
-                    ret[cur_section] = []
-                else:
-                    ret[cur_section].append( l )
-        f.close()
-        return ret
+        return inventory.read( '%s/%s' % ( self.__rootdir, inventory_ ) ).to_dict()
 
     
     def config_ssh(self, ssh_user, ssh_key=None, ssh_pass=None, ssh_port=None):
@@ -289,12 +515,26 @@ class PlaybookMgr(object):
                     "host_key_checking" : "False",
                     "log_path" : "./log/ansible.log" }
         
+        sshdir = '%s/.ssh' % self.__rootdir
+        keyfile = '%s/private_key' % sshdir
+
+        # any master connections that are still open were authenticated with
+        # the old settings so close them if the settings are changing
+        old_key = None
+        if os.path.exists( keyfile ):
+            kf = open( keyfile )
+            old_key = kf.read()
+            kf.close()
+        if self.__remote_user != ssh_user or \
+           ( ssh_port != None and self.__remote_port != '%s' % ssh_port ) or \
+           ( ssh_pass and self.__ssh_pass != ssh_pass ) or \
+           ( ssh_key and old_key != ssh_key ):
+            self.close_ssh()
+
         if ssh_key:
             # this is an actual key - we need to write a key file
-            sshdir = '%s/.ssh' % self.__rootdir
             if not os.path.exists( sshdir ):
                 os.makedirs( sshdir )
-            keyfile = '%s/private_key' % sshdir
             kf = open( keyfile, 'w' )
             kf.write( ssh_key )
             kf.close()
@@ -311,11 +551,42 @@ class PlaybookMgr(object):
         
         cfgvars['transport'] = 'ssh'
         self.__update_config( 'defaults', cfgvars )
+
+        ssh_args = ''
+        persist = self.__props['emtools.playbookmgr.ssh_control_persist']
+        if persist > 0:
+            # share one master connection per host across ansible runs.  The
+            # ControlPath is relative because ansible always runs from the 
+            # playbook root and unix socket paths are limited in length.
+            cpdir = '%s/cp' % sshdir
+            if not os.path.exists( cpdir ):
+                mkdir_p( cpdir )
+                os.chmod( cpdir, 0o700 )
+            ssh_args = '-o ControlMaster=auto -o ControlPersist=%ds -o ControlPath=./.ssh/cp/%%h-%%p-%%r' % persist
         sshvars = {
             'pipelining' : 'True',
-            'ssh_args' : ''
+            'ssh_args' : ssh_args
         }
         self.__update_config( 'ssh_connection', sshvars )
+
+    def close_ssh(self):
+        '''
+        Closes any persistent ssh master connections for this playbook and
+        removes their ControlPath sockets.  Master connections otherwise 
+        exit on their own after emtools.playbookmgr.ssh_control_persist
+        seconds of inactivity.
+        '''
+        cpdir = '%s/.ssh/cp' % self.__rootdir
+        if not os.path.isdir( cpdir ):
+            return
+        for sock in os.listdir( cpdir ):
+            # sockets are named <host>-<port>-<user>, but host and user 
+            # names can both contain '-'.  The socket path alone identifies
+            # the master, ssh only needs some destination argument
+            path = '%s/%s' % (cpdir, sock)
+            syscall_log("ssh -o ControlPath=%s -O exit localhost" % pipes.quote(path))
+            if os.path.exists( path ):
+                os.remove( path )
             
     def __read_config(self):
         '''
@@ -333,6 +604,10 @@ class PlaybookMgr(object):
             self.__ssh_pass = self.__config.get('defaults', 'ssh_pass')
         except:
             self.__ssh_pass = None
+        try:
+            self.__remote_port = self.__config.get('defaults', 'remote_port')
+        except:
+            self.__remote_port = None
         
     def __update_config(self, section, vars_):
         '''
@@ -358,58 +633,27 @@ class PlaybookMgr(object):
         wf.close()
         self.__read_config()
         
-    def __update_playbook(self, srcroot, rootdir):
+    def __update_playbook(self, srcroots, rootdir):
         '''
-        Updates a playbook from the current playbook template.
+        Updates a playbook from the current playbook template.  Nothing
+        is copied if the template manifests are unchanged since the last
+        update (see emtools.templatesync).
         
-        :param srcroot: source root directory name for the playbook
+        :param srcroots: list of source root directory names for the 
+                         playbook.  Later entries are copied over earlier.
         :param rootdir: destination directory name for the playbook
         '''
-
         destroot = rootdir
         
-        if not os.path.isdir( destroot ):
-            os.mkdir(destroot)
+        mkdir_p( destroot )
 
         # Create log directory for playbook
         # Ansible does not auto create the directory if missing
         logdir = destroot + '/log'
-        if not os.path.isdir( logdir ):
-            os.mkdir(logdir)
-        
-        # uni-directional copy from source to dest
-        starting = srcroot
-        for dirname, dirnames, filenames in os.walk(starting):
-            
-            # because we used an absolute path to walk we have to strip off
-            # the start path so that we can use it to build a local reference path
-            dirname = dirname.replace('%s' % srcroot,'')
-            if dirname.find('/') == 0:
-                dirname = dirname[1:]
-                
-            for filename in filenames:
-                # want to skip ansible.log - it is in the repo only to make the
-                # log directory be created on a clone
-
-                if filename != 'ansible.log':
-                    src_file = os.path.join(srcroot, dirname, filename)
-                    dest_file = os.path.join(destroot, dirname, filename)
-
-                    if os.path.exists(dest_file) and not os.path.isfile(dest_file):
-                        # this is odd.  There is a directory where there should be a file
-                        shutil.rmtree(dest_file)
-
-                    if not os.path.exists(dest_file) or (os.path.exists(dest_file) and
-                         (os.path.getmtime(dest_file) != os.path.getmtime(src_file))):
-                        shutil.copy2(src_file, dest_file)
-                            
-            for dir in dirnames:
-                src_dir = os.path.join(srcroot, dirname, dir)
-                dest_dir = os.path.join(destroot, dirname, dir)
- 
-                if os.path.exists(dest_dir) and not os.path.isdir(dest_dir):
-                    # this is odd.  there is a file where there should be a directory
-                    shutil.rmtree(dest_dir)
-               
-                if not os.path.exists(dest_dir):
-                    shutil.copytree(src_dir, dest_dir)
+        mkdir_p( logdir )
+
+        cachedir = '%s/.manifests' % self.__props['emtools.playbookmgr.cluster_base']
+        synced = templatesync.sync_playbook( destroot, srcroots, cachedir,
+                                             trust=self.__props['emtools.playbookmgr.manifest_trust'] )
+        if synced:
+            Log.info('playbook %s updated from %s' % (self.__name, ', '.join(synced)))
@@ -0,0 +1,215 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.playbookstream
+
+Incremental parsing of ansible-playbook output and of the per-host result
+lines written by the emtools_events callback plugin (see
+playbook_template/callback_plugins) during ansible module runs.
+
+contains:
+    class PlaybookStream
+    class ModuleStream
+'''
+import re
+import json
+from collections import deque
+
+# prefix of the lines written by the emtools_events callback plugin
+EVENT_PREFIX = 'EMTOOLS_EVENT '
+# environment variable that turns the plugin on
+EVENTS_ENV = 'EMTOOLS_EVENTS'
+
+RECAP_PATT = re.compile('([a-zA-Z0-9\-_\.]+)\s+:\s+ok=([0-9]+)\s+changed=([0-9]+)\s+unreachable=([0-9]+)\s+failed=([0-9]+)')
+_PLAY_PATT = re.compile('^PLAY \[(.*)\] \*+\s*$')
+_TASK_PATT = re.compile('^(?:TASK|NOTIFIED): \[(.*)\] \*+\s*$')
+_FACTS_PATT = re.compile('^GATHERING FACTS \*+\s*$')
+_HOST_PATT = re.compile('^(ok|changed|skipping|failed|fatal): \[([^\]]+)\](?: => (.*))?$')
+
+class _Tail(object):
+    '''The last maxbuf bytes of a sequence of output lines.'''
+
+    def __init__(self, maxbuf):
+        self.__maxbuf = maxbuf
+        self.__buf = deque()
+        self.__bufsize = 0
+        self.truncated = False
+
+    def keep(self, line):
+        self.__buf.append( line )
+        self.__bufsize += len(line) + 1
+        while self.__bufsize > self.__maxbuf and len(self.__buf) > 1:
+            self.__bufsize -= len( self.__buf.popleft() ) + 1
+            self.truncated = True
+
+    def text(self, where=''):
+        '''The buffered output, prefixed with a note if it was truncated.'''
+        out = '\n'.join( self.__buf ).strip()
+        if self.truncated:
+            out = '[earlier output truncated%s]\n%s' % (where, out)
+        return out
+
+class PlaybookStream(object):
+    '''
+    Wraps a running ansible-playbook command and turns its stdout into
+    events as the lines arrive.  Iterating over a PlaybookStream yields
+    dictionaries of the following forms:
+
+        { 'type' : 'play', 'name' : <play name> }
+        { 'type' : 'task', 'name' : <task name> }
+        { 'type' : 'host', 'host' : <host>, 'task' : <task name>,
+          'status' : ok|changed|skipping|failed|fatal, 'detail' : <text after =>> }
+        { 'type' : 'recap', 'host' : <host>, 'ok' : n, 'changed' : n,
+          'unreachable' : n, 'failed' : n }
+
+    Only the last maxbuf bytes of output are kept in memory (see out).  The
+    full output is written to logfile if one is given.  After iteration the
+    rc, results (recap per host, as returned by PlaybookMgr.run_playbook)
+    and err attributes are set.
+    '''
+
+    def __init__(self, call, logfile=None, maxbuf=1048576):
+        '''
+        Constructor.
+
+        :param call: iterable of output lines with returncode and stderr
+                     attributes once exhausted (i.e. utils.StreamCall)
+        :param logfile: [optional] file to write the full output to
+        :param maxbuf: number of bytes of output to keep in memory
+        '''
+        self.__call = call
+        self.logfile = logfile
+        self.__tail = _Tail( maxbuf )
+        self.rc = None
+        self.results = {}
+        self.err = ''
+
+    def __iter__(self):
+        logf = open( self.logfile, 'a' ) if self.logfile else None
+        task = None
+        recap = False
+        try:
+            for l in self.__call:
+                if logf:
+                    logf.write( l + '\n' )
+                self.__tail.keep( l )
+
+                if recap:
+                    mat = RECAP_PATT.match(l)
+                    if mat:
+                        counts = {
+                            "ok" : int(mat.group(2)),
+                            "changed" : int(mat.group(3)),
+                            "unreachable" : int(mat.group(4)),
+                            "failed" : int(mat.group(5))
+                        }
+                        self.results[mat.group(1)] = counts
+                        event = { 'type' : 'recap', 'host' : mat.group(1) }
+                        event.update( counts )
+                        yield event
+                    continue
+                if l.find('PLAY RECAP') == 0:
+                    recap = True
+                    continue
+
+                mat = _HOST_PATT.match(l)
+                if mat:
+                    yield { 'type' : 'host', 'host' : mat.group(2), 'task' : task,
+                            'status' : mat.group(1), 'detail' : mat.group(3) }
+                    continue
+                mat = _TASK_PATT.match(l)
+                if mat or _FACTS_PATT.match(l):
+                    task = mat.group(1) if mat else 'setup'
+                    yield { 'type' : 'task', 'name' : task }
+                    continue
+                mat = _PLAY_PATT.match(l)
+                if mat:
+                    task = None
+                    yield { 'type' : 'play', 'name' : mat.group(1) }
+        finally:
+            if logf:
+                logf.close()
+
+        self.rc = self.__call.returncode
+        self.err = self.__call.stderr
+
+    @property
+    def out(self):
+        '''The buffered output, prefixed with a note if it was truncated.'''
+        where = ' (full output in %s)' % self.logfile if self.logfile else ''
+        return self.__tail.text( where )
+
+    def run(self, callback=None):
+        '''
+        Consumes the stream, passing each event to callback if given.
+
+        Returns a tuple (rc, results, out, err) like PlaybookMgr.run_playbook
+        '''
+        for event in self:
+            if callback:
+                callback( event )
+        return self.rc, self.results, self.out, self.err
+
+class ModuleStream(object):
+    '''
+    Wraps a running ansible module command that has the emtools_events 
+    callback plugin turned on.  Iterating over a ModuleStream yields a 
+    dictionary for each host result as soon as ansible reports it:
+
+        { 'host' : <host>, 'status' : ok|failed|skipped|unreachable,
+          'result' : <module result> }
+
+    Result lines are not kept.  Only the last maxbuf bytes of any other 
+    output are kept in memory (see out).  After iteration the rc and err
+    attributes are set.
+    '''
+
+    def __init__(self, call, maxbuf=1048576):
+        '''
+        Constructor.
+
+        :param call: iterable of output lines with returncode and stderr
+                     attributes once exhausted (i.e. utils.StreamCall)
+        :param maxbuf: number of bytes of other output to keep in memory
+        '''
+        self.__call = call
+        self.__tail = _Tail( maxbuf )
+        self.rc = None
+        self.err = ''
+
+    @property
+    def cmd(self):
+        return self.__call.cmd
+
+    def __iter__(self):
+        for l in self.__call:
+            if l.startswith(EVENT_PREFIX):
+                try:
+                    yield json.loads(l[len(EVENT_PREFIX):])
+                    continue
+                except ValueError:
+                    pass
+            self.__tail.keep( l )
+
+        self.rc = self.__call.returncode
+        self.err = self.__call.stderr
+
+    @property
+    def out(self):
+        '''The buffered output, prefixed with a note if it was truncated.'''
+        return self.__tail.text()
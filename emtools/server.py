@@ -0,0 +1,220 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.server
+
+Resident request server used by bin/emtoolsd.py.  Requests arrive over a
+local unix socket so that the interpreter, properties, logging and the
+per-cluster PlaybookMgr instances stay loaded between requests.
+
+Wire format (one request per connection):
+    request:  <request type>\\n<request JSON>        client then shuts down writes
+    reply:    <rc>\\n<reply JSON>                    server then closes
+
+The reply is the same message the corresponding bin/*.py utility would
+have printed, but always in the compact JSON format (see emtools.msg.jsonmsg),
+and rc is what the utility would have exited with.
+
+Each connection is handled in its own thread.  Handlers take the lock of
+the cluster a request is for (see lock_clusters), so requests for the same
+cluster run one at a time while a long install or playbook run for one
+cluster does not hold up requests for the others.
+
+contains:
+    class EmToolsServer
+    class RequestHandler
+    function send_request
+'''
+
+import os
+import socket
+import SocketServer
+import json
+import threading
+import traceback
+
+from emtools.playbookmgr import PlaybookMgr
+import emtools.msg.errormsg as errormsg
+from emtools.msg.jsonmsg import JsonMsg
+import emtools.common.logutils as logutils
+
+Log = logutils.getLogger(__name__)
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+    '''
+    Reads one request from the connection, dispatches it to the handler
+    registered for its type and writes back the reply.
+    '''
+
+    def handle(self):
+        data = self.rfile.read()
+        reqtype, _, jsonstr = data.partition('\n')
+        reqtype = reqtype.strip()
+
+        handler = self.server.handlers.get( reqtype )
+        if not handler:
+            rc = 1
+            reply = errormsg.ErrorMsg_from_parms( msg='unsupported request type: %s' % reqtype )
+        else:
+            try:
+                rc, reply = handler( self.server, jsonstr )
+            except errormsg.ErrorMsg, exc:
+                rc, reply = 1, exc
+            except SystemExit, exc:
+                rc = exc.code if type(exc.code) == int else 1
+                reply = errormsg.ErrorMsg_from_parms( msg='%s handler exited with status %s' % (reqtype, exc.code) )
+            except Exception:
+                rc = 1
+                reply = errormsg.ErrorMsg_from_parms( msg=json.dumps( traceback.format_exc() ) )
+                Log.error('%s request failed: %s' % (reqtype, traceback.format_exc()))
+
+        # messages go back in the compact wire format, whatever str() gives
+        if isinstance( reply, JsonMsg ):
+            reply = reply.json_dumps()
+        self.wfile.write( '%d\n%s' % (rc, reply) )
+
+class EmToolsServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    '''
+    Unix socket server that keeps PlaybookMgr instances and other per-cluster
+    state warm between requests.  Requests are handled in parallel, one
+    thread per connection.
+    '''
+
+    # don't let a hung request keep the process from exiting
+    daemon_threads = True
+
+    def __init__(self, sockpath, handlers):
+        '''
+        Constructor.
+
+        :param sockpath: path of the unix socket to listen on.  A stale
+                         socket file left from a previous run is replaced.
+        :param handlers: map of request type to handler function.  Each
+                         handler is called as fn(server, jsonstr) and
+                         returns a tuple (rc, reply)
+        '''
+        self.handlers = handlers
+        self.__sockpath = sockpath
+        # (cluster, kind) -> (stamp, object)
+        self.__cache = {}
+        # cluster -> lock held while handling a request for it
+        self.__cluster_locks = {}
+        # guards both of the above
+        self.__lock = threading.Lock()
+        if os.path.exists( sockpath ):
+            os.remove( sockpath )
+        SocketServer.UnixStreamServer.__init__( self, sockpath, RequestHandler )
+        os.chmod( sockpath, 0o600 )
+
+    def lock_clusters(self, cluster_names):
+        '''
+        Waits for and takes the request locks of a list of clusters.  The 
+        locks are taken in sorted order so that two requests for several
+        clusters can not deadlock.  Release them with unlock_clusters().
+
+        :param cluster_names: list of cluster names
+        '''
+        for lock in self.__locks_for( cluster_names ):
+            lock.acquire()
+
+    def unlock_clusters(self, cluster_names):
+        '''Releases the locks taken by lock_clusters(cluster_names).'''
+        for lock in reversed( self.__locks_for( cluster_names ) ):
+            lock.release()
+
+    def get_cached(self, cluster_name, kind, factory, stamp=None):
+        '''
+        Returns the object of the given kind cached for a cluster, calling
+        factory() to create it the first time.
+
+        :param cluster_name: cluster the object belongs to
+        :param kind: string naming the type of object (i.e. 'pmgr')
+        :param factory: no-argument function that creates the object
+        :param stamp: [optional] identifies the version of whatever the 
+                      object was created from (i.e. a file's mtime).  The
+                      object is created again when the stamp changes.
+        '''
+        key = (cluster_name, kind)
+        self.__lock.acquire()
+        try:
+            entry = self.__cache.get( key )
+        finally:
+            self.__lock.release()
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        # created without holding the lock, it may take a while
+        obj = factory()
+        self.__lock.acquire()
+        try:
+            self.__cache[key] = (stamp, obj)
+        finally:
+            self.__lock.release()
+        return obj
+
+    def get_pmgr(self, cluster_name):
+        '''Returns the cached PlaybookMgr for a cluster.'''
+        return self.get_cached( cluster_name, 'pmgr', lambda: PlaybookMgr( cluster_name ) )
+
+    def invalidate(self, cluster_name):
+        '''Drops everything cached for a cluster.'''
+        self.__lock.acquire()
+        try:
+            for key in self.__cache.keys():
+                if key[0] == cluster_name:
+                    del self.__cache[key]
+        finally:
+            self.__lock.release()
+
+    def __locks_for(self, cluster_names):
+        self.__lock.acquire()
+        try:
+            return [ self.__cluster_locks.setdefault( name, threading.Lock() ) 
+                     for name in sorted( set( cluster_names ) ) ]
+        finally:
+            self.__lock.release()
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists( self.__sockpath ):
+            os.remove( self.__sockpath )
+
+def send_request(sockpath, reqtype, jsonstr):
+    '''
+    Sends a request to a running EmToolsServer.
+
+    :param sockpath: path of the server's unix socket
+    :param reqtype: request type (i.e. 'getfacts')
+    :param jsonstr: JSON request message
+
+    Returns a tuple (rc, reply) where reply is the reply JSON string
+    '''
+    s = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    try:
+        s.connect( sockpath )
+        s.sendall( '%s\n%s' % (reqtype, jsonstr) )
+        s.shutdown( socket.SHUT_WR )
+        chunks = []
+        while True:
+            chunk = s.recv( 65536 )
+            if not chunk:
+                break
+            chunks.append( chunk )
+    finally:
+        s.close()
+    rc, _, reply = ''.join(chunks).partition('\n')
+    return int(rc), reply
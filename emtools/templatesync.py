@@ -0,0 +1,258 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools.templatesync
+
+Manifest based sync of playbook template directories into cluster
+playbooks.
+
+A TemplateManifest records the directories and files (size, mtime and
+content hash) of a template directory along with a digest of the whole
+tree.  Manifests are cached in a directory (normally
+<cluster_base>/.manifests) so that files only need to be re-hashed when
+their size or mtime changes.  A cached manifest is used without walking
+the template when the mtimes of all of its directories (which change
+when entries are added, removed or renamed) and the size and mtime of
+all of its files are unchanged; that still costs one stat per file.
+
+Each cluster playbook keeps a .template_stamp file listing the template
+directories it was synced from, in order, and the digest of each at the
+time.  When the digests still match the playbook is left alone without
+looking at any of its files.
+
+contains:
+    class TemplateManifest
+    function read_stamp
+    function sync_playbook
+'''
+import os
+import shutil
+import hashlib
+from emtools.common.utils import mkdir_p, read_json, write_json_atomic
+
+# in the template only so that the log directory is created on a clone
+_SKIP_FILES = ('ansible.log',)
+# written into the template by python itself (i.e. for callback plugins)
+_SKIP_SUFFIXES = ('.pyc', '.pyo')
+
+STAMP_FILE = '.template_stamp'
+
+def _hash_file(fname):
+    h = hashlib.sha1()
+    f = open(fname, 'rb')
+    try:
+        while True:
+            buf = f.read(65536)
+            if not buf:
+                break
+            h.update(buf)
+    finally:
+        f.close()
+    return h.hexdigest()
+
+class TemplateManifest(object):
+    '''
+    Manifest of a template directory.
+
+    files maps relative path -> [size, mtime, sha1]
+    dirs is a sorted list of relative directory paths
+    dir_mtimes maps relative directory path ('' for srcroot) -> mtime
+    digest is a hash over all of the directories and file hashes
+    '''
+
+    def __init__(self, srcroot, cachedir):
+        '''
+        Constructor.
+
+        :param srcroot: template directory
+        :param cachedir: directory to cache the manifest in
+        '''
+        self.srcroot = srcroot
+        self.files = {}
+        self.dirs = []
+        self.dir_mtimes = {}
+        self.digest = None
+        self.__cachefile = '%s/%s.json' % (cachedir, hashlib.sha1(srcroot).hexdigest()[:16])
+
+    def load(self):
+        '''
+        Loads the cached manifest without looking at the template.
+
+        Returns True if a cached manifest was found.
+        '''
+        data = read_json(self.__cachefile)
+        if not data or data.get('srcroot') != self.srcroot:
+            return False
+        self.files = data['files']
+        self.dirs = data['dirs']
+        self.dir_mtimes = data.get('dir_mtimes', {})
+        self.digest = data['digest']
+        return True
+
+    def is_current(self):
+        '''
+        Returns True if the template still matches the loaded manifest,
+        judging by directory mtimes and file sizes and mtimes.
+        '''
+        if self.digest is None or len(self.dir_mtimes) != len(self.dirs) + 1:
+            return False
+        try:
+            for rel, mtime in self.dir_mtimes.iteritems():
+                if os.stat(os.path.join(self.srcroot, rel)).st_mtime != mtime:
+                    return False
+            for rel, (size, mtime, sha) in self.files.iteritems():
+                st = os.stat(os.path.join(self.srcroot, rel))
+                if st.st_size != size or st.st_mtime != mtime:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def scan(self):
+        '''
+        Walks the template and brings the manifest up to date.  Only files
+        whose size or mtime differ from the cached manifest are re-hashed.
+        The cache is rewritten if the digest changed.  Nothing is walked if
+        the cached manifest is still current (see is_current).
+        '''
+        if self.load() and self.is_current():
+            return self
+        old_digest = self.digest
+        old_files = self.files
+        old_dir_mtimes = self.dir_mtimes
+        files = {}
+        dirs = []
+        dir_mtimes = {}
+        for dirname, dirnames, filenames in os.walk(self.srcroot):
+            reldir = os.path.relpath(dirname, self.srcroot)
+            if reldir == '.':
+                reldir = ''
+            dir_mtimes[reldir] = os.stat(dirname).st_mtime
+            for d in dirnames:
+                dirs.append(os.path.join(reldir, d))
+            for filename in filenames:
+                if filename in _SKIP_FILES or filename.endswith(_SKIP_SUFFIXES):
+                    continue
+                rel = os.path.join(reldir, filename)
+                st = os.stat(os.path.join(dirname, filename))
+                old = old_files.get(rel)
+                if old and old[0] == st.st_size and old[1] == st.st_mtime:
+                    sha = old[2]
+                else:
+                    sha = _hash_file(os.path.join(dirname, filename))
+                files[rel] = [st.st_size, st.st_mtime, sha]
+
+        dirs.sort()
+        h = hashlib.sha1()
+        for d in dirs:
+            h.update('d %s\n' % d)
+        for rel in sorted(files.iterkeys()):
+            h.update('f %s %s\n' % (rel, files[rel][2]))
+
+        self.files = files
+        self.dirs = dirs
+        self.dir_mtimes = dir_mtimes
+        self.digest = h.hexdigest()
+        if self.digest != old_digest or files != old_files or dir_mtimes != old_dir_mtimes:
+            # playbooks may be set up from several threads at once
+            mkdir_p(os.path.dirname(self.__cachefile))
+            write_json_atomic(self.__cachefile, {
+                'srcroot' : self.srcroot,
+                'digest'  : self.digest,
+                'files'   : self.files,
+                'dirs'    : self.dirs,
+                'dir_mtimes' : self.dir_mtimes })
+        return self
+
+    def copy_to(self, destroot):
+        '''
+        Uni-directional copy from the template to destroot.  Files are only
+        copied if missing or their mtime differs from the template's.
+        '''
+        mkdir_p(destroot)
+
+        for d in self.dirs:
+            dest_dir = os.path.join(destroot, d)
+            if os.path.exists(dest_dir) and not os.path.isdir(dest_dir):
+                # this is odd.  there is a file where there should be a directory
+                os.remove(dest_dir)
+            mkdir_p(dest_dir)
+
+        for rel, (size, mtime, sha) in self.files.iteritems():
+            dest_file = os.path.join(destroot, rel)
+            if os.path.exists(dest_file) and not os.path.isfile(dest_file):
+                # this is odd.  There is a directory where there should be a file
+                shutil.rmtree(dest_file)
+            if not os.path.exists(dest_file) or os.path.getmtime(dest_file) != mtime:
+                shutil.copy2(os.path.join(self.srcroot, rel), dest_file)
+
+def read_stamp(destroot):
+    '''Returns the [[srcroot, digest], ...] list a playbook was last synced from.'''
+    stamp = read_json('%s/%s' % (destroot, STAMP_FILE))
+    return stamp if type(stamp) == list else []
+
+def sync_playbook(destroot, srcroots, cachedir, trust=False, manifests=None, force=False):
+    '''
+    Syncs a playbook directory from one or more template directories.
+    Later template directories are layered on top of earlier ones.
+
+    :param destroot: playbook directory
+    :param srcroots: list of template directories
+    :param cachedir: directory where template manifests are cached
+    :param trust: use a cached manifest as is instead of re-scanning the
+                  template.  Only appropriate if the template is not
+                  modified without also running a forced sync.
+    :param manifests: [optional] dict of srcroot -> TemplateManifest
+                  shared across calls so that each template is only
+                  scanned once (i.e. when syncing many playbooks)
+    :param force: copy from every template directory even if the stamp
+                  says the playbook is up to date.  This restores playbook
+                  files that were modified locally.
+
+    Returns the list of template directories that had to be copied
+    '''
+    if manifests is None:
+        manifests = {}
+
+    current = []
+    for src in srcroots:
+        if not manifests.has_key(src):
+            m = TemplateManifest(src, cachedir)
+            if not (trust and m.load()):
+                m.scan()
+            manifests[src] = m
+        current.append([src, manifests[src].digest])
+
+    stamp = read_stamp(destroot)
+    if not os.path.isdir(destroot):
+        stamp = []
+
+    # find the first layer that is out of date - it and every layer after it
+    # need to be re-applied
+    first = 0 if force else len(current)
+    for i in range(len(current)):
+        if i >= len(stamp) or stamp[i] != current[i]:
+            first = i
+            break
+    if first == len(current):
+        return []
+
+    for src, digest in current[first:]:
+        manifests[src].copy_to(destroot)
+    write_json_atomic('%s/%s' % (destroot, STAMP_FILE), current)
+    return [src for src, digest in current[first:]]
@@ -45,6 +45,15 @@ class ConsoleCmdTest(unittest.TestCase):
         self.assertEqual(m1['command'], "stopsystem")
         self.assertEqual(m1['args'], "-y")
 
+        m1 = commandreq.CommandReq('{ "cluster_name" : "cluster1", "commands" : [ "getsystemstatus", "gettablelocks" ] }')
+        self.assertEqual(m1['commands'], [ "getsystemstatus", "gettablelocks" ])
+        self.assertFalse(m1.has_key('command'))
+
+    def testFailure(self):
+        self.assertRaises(ValueError, commandreq.CommandReq, '{ "cluster_name" : "cluster1" }')
+        self.assertRaises(ValueError, commandreq.CommandReq, '{ "cluster_name" : "cluster1", "command" : "startsystem", "commands" : [ "getsystemstatus" ] }')
+        self.assertRaises(ValueError, commandreq.CommandReq, '{ "cluster_name" : "cluster1", "commands" : [] }')
+
 
 
 if __name__ == "__main__":
@@ -42,6 +42,17 @@ class ConfigReplyTest(unittest.TestCase):
         self.assertEqual(f2['config'][0]['em_category'], "UM")
         self.assertEqual(f2['config'][0]['value'], "2G")
         
+    def testSetResults(self):
+        jsonmsg = '''
+{ "cluster_name" : "cluster1", "rc" : 1, "config" :[{ "em_category" : "UM", "em_parameter" : "TotalUmMemory","value" : "2G", "rc" : 0 }, { "em_category" : "PM", "em_parameter" : "PmMaxMemorySmallSide", "value" : "64M", "rc" : 1, "stderr" : "setConfig failed" }]
+}
+'''
+        f2 = configreply.ConfigReply(jsonmsg)
+        self.assertEqual(f2['rc'], 1)
+        self.assertEqual(f2['config'][0]['rc'], 0)
+        self.assertEqual(f2['config'][1]['stderr'], "setConfig failed")
+        self.assertRaises(ValueError, configreply.ConfigReply, jsonmsg.replace('"rc" : 0', '"rc" : "0"'))
+
     def testPrint(self):
         pass
 
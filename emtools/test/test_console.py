@@ -199,6 +199,38 @@ Reported Device   = /
         self.assertEqual(reslt['alarms'][1]['Reporting Module'], 'pm6')
         self.assertEqual(reslt['alarms'][2]['Reporting Process'], 'ServerMonitor')
         self.assertEqual(reslt['alarms'][2]['Reported Device'], '/')
+
+    def test_line_iterators(self):
+        # parsers take an iterator over lines as well as a string
+        samples = {
+            'getsystemstatus' : 'getsystemstatus   Mon Feb 17 01:20:16 2014\n'
+                                'Component     Status                       Last Status Change\n'
+                                '------------  --------------------------   ------------------------\n'
+                                'System        ACTIVE                       Mon Feb  3 22:36:19 2014\n'
+                                'Module pm1    ACTIVE                       Mon Feb  3 22:35:52 2014\n'
+                                "Active Parent OAM Performance Module is 'pm1'\n",
+            'getprocessstatus' : 'getprocessstatus   Mon Feb 17 01:18:20 2014\n'
+                                'Process             Module    Status            Last Status Change        Process ID\n'
+                                '------------------  ------    ---------------   ------------------------  ----------\n'
+                                'ProcessMonitor      pm1       ACTIVE            Wed Jan 22 14:38:23 2014       19856\n',
+            'getactivealarms' : 'getactivealarms   Sun Mar 23 20:47:45 2014\n'
+                                'Brief Description = stray line before any alarm\n'
+                                'AlarmID           = 6\n'
+                                'Brief Description = DISK_USAGE_LOW\n',
+            'gettablelocks' :   '  Table     LockID  Process  PID    Session  Txn     CreationTime              State    DBRoots\n'
+                                '  test.foo  15949   DMLProc  17916  14029    340729  Sun Mar 23 20:45:41 2014  LOADING  1,2\n'
+        }
+        for cmd, stdout in samples.iteritems():
+            fn = getattr(console, cmd)
+            reslt = fn(stdout)
+            self.assertEqual(fn(iter(stdout.split('\n'))), reslt)
+            self.assertEqual(fn(stdout.splitlines()), reslt)
+        self.assertEqual(console.getsystemstatus(samples['getsystemstatus'])['activepm'], 'pm1')
+        self.assertEqual(console.getactivealarms(samples['getactivealarms'])['alarms'], 
+                         [ { 'AlarmId' : '6', 'Brief Description' : 'DISK_USAGE_LOW' } ])
+
+        # output missing the header entirely
+        self.assertEqual(console.getprocessstatus(iter(['nothing here'])), { 'modules' : {} })
         
     def test_gettablelocks(self):
         
@@ -279,6 +311,40 @@ Reported Device   = /
         self.assertEqual(reslt['locks'][0]['Process'], 'DMLProc  17916  14029')
         self.assertEqual(reslt['locks'][0]['State'], 'LOADING')
         self.assertEqual(reslt['locks'][0]['DBRoots'], '1,2,3,4,5,6')
+
+    def test_tablelocks_columnar(self):
+
+        # values wider than their column header are still split correctly
+        stdout = '''
+ There are 3 table locks
+
+  Table     LockID  Process  PID    Session  Txn     CreationTime              State    DBRoots      
+  test.foo  15949   DMLProc  17916  14029    340729  Sun Mar 23 20:45:41 2014  LOADING  1,2,3,4,5,6  
+  test.averyverylongtablename  15950   cpimport  17917  BulkLoad    340730  Sun Mar  3 20:45:42 2014  CLEANUP  2  
+  test.baz  15951   DMLProc  17918  14031    340731  Sun Mar 23 20:45:43 2014  LOADING  3,12  
+'''
+        locks = list(console.iter_tablelocks(stdout))
+        self.assertEqual(len(locks), 3)
+        self.assertEqual(locks[1], ('test.averyverylongtablename', '15950', 'cpimport', '17917', 'BulkLoad',
+                                    '340730', 'Sun Mar  3 20:45:42 2014', 'CLEANUP', '2'))
+        self.assertEqual(locks[1].State, 'CLEANUP')
+        self.assertEqual(console.gettablelocks(stdout)['locks'][1]['Process'], 'cpimport')
+
+        # filters
+        self.assertEqual([ l.LockID for l in console.iter_tablelocks(stdout, state='LOADING') ], ['15949', '15951'])
+        self.assertEqual([ l.LockID for l in console.iter_tablelocks(stdout, process='cpimport') ], ['15950'])
+        self.assertEqual([ l.LockID for l in console.iter_tablelocks(stdout, dbroot=2) ], ['15949', '15950'])
+        self.assertEqual([ l.LockID for l in console.iter_tablelocks(stdout, dbroot='1') ], ['15949'])
+        self.assertEqual(len(console.gettablelocks(stdout, state='LOADING', process='cpimport')['locks']), 0)
+
+        cols = console.tablelock_columns(iter(stdout.split('\n')), state='LOADING')
+        self.assertEqual(cols['fields'][0], 'Table')
+        self.assertEqual(cols['locks']['Table'], ['test.foo', 'test.baz'])
+        self.assertEqual(cols['locks']['DBRoots'], ['1,2,3,4,5,6', '3,12'])
+
+        cols = console.tablelock_columns(' There are no table locks\n')
+        self.assertEqual(cols['locks']['LockID'], [])
+        self.assertEqual(len(cols['locks']), 9)
                 
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
@@ -0,0 +1,91 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import shutil
+import tempfile
+from emtools.cluster.consolecache import ConsoleCache, is_read_only
+
+class ConsoleCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+        self.__now = 1000.0
+        self.__cache = ConsoleCache( '%s/cache.json' % self.__tmpdir, 5, lambda: self.__now )
+
+    def tearDown(self):
+        shutil.rmtree( self.__tmpdir )
+
+    def testReadOnly(self):
+        self.assertTrue( is_read_only('getsystemstatus') )
+        self.assertTrue( is_read_only('getProcessStatus') )
+        self.assertTrue( is_read_only('gettablelocks') )
+        self.assertFalse( is_read_only('stopsystem y') )
+        self.assertFalse( is_read_only('') )
+
+    def testCache(self):
+        reply = { 'rc' : 0, 'stdout' : 'out', 'stderr' : '', 'console_host' : 'pm1', 'results' : { 'a' : 1 } }
+        self.assertEqual( self.__cache.get('getsystemstatus'), None )
+        self.__cache.put( 'getsystemstatus', reply )
+        self.assertEqual( self.__cache.get('getsystemstatus'), reply )
+
+        # a second instance (i.e. another process) sees the same entries
+        other = ConsoleCache( '%s/cache.json' % self.__tmpdir, 5, lambda: self.__now )
+        self.assertEqual( other.get('getsystemstatus'), reply )
+
+        # expires after the ttl
+        self.__now += 5
+        self.assertEqual( self.__cache.get('getsystemstatus'), None )
+
+        # mutating commands are never cached
+        self.__cache.put( 'startsystem', reply )
+        self.assertEqual( self.__cache.get('startsystem'), None )
+
+    def testInvalidate(self):
+        self.__cache.put( 'getsystemstatus', { 'rc' : 0 } )
+        self.__cache.put( 'getprocessstatus', { 'rc' : 0 } )
+        self.__cache.invalidate()
+        self.assertEqual( self.__cache.get('getsystemstatus'), None )
+        self.assertEqual( self.__cache.get('getprocessstatus'), None )
+        # invalidating an empty cache is fine
+        self.__cache.invalidate()
+
+    def testStartedBeforeInvalidate(self):
+        # a query starts, then a mutating command invalidates the cache
+        started = self.__cache.now()
+        self.__now += 1
+        self.__cache.invalidate()
+        self.__now += 1
+        # the query's result predates the change so it is not cached
+        self.__cache.put( 'getsystemstatus', { 'rc' : 0 }, started )
+        self.assertEqual( self.__cache.get('getsystemstatus'), None )
+        # one started afterwards is
+        started = self.__cache.now()
+        self.__cache.put( 'getsystemstatus', { 'rc' : 1 }, started )
+        self.assertEqual( self.__cache.get('getsystemstatus'), { 'rc' : 1 } )
+        # and the stamp survives the rewrite
+        self.__cache.put( 'getprocessstatus', { 'rc' : 0 }, started - 2 )
+        self.assertEqual( self.__cache.get('getprocessstatus'), None )
+        self.assertEqual( self.__cache.get('__invalidated__'), None )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
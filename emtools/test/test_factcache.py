@@ -0,0 +1,84 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import shutil
+import tempfile
+from emtools.cluster.factcache import FactCache
+
+class FactCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+        self.__cachefile = '%s/facts.json' % self.__tmpdir
+        self.__now = 1000.0
+        self.__cache = FactCache( self.__cachefile, 'setup', 60, lambda: self.__now )
+
+    def tearDown(self):
+        shutil.rmtree( self.__tmpdir )
+
+    def testModuleKey(self):
+        setup_facts = { 'ansible_fqdn' : 'foo.calpont.com', 'ansible_memtotal_mb' : 2048 }
+        self.__cache.put( 'foo', setup_facts )
+        self.assertEqual( self.__cache.get('foo'), setup_facts )
+
+        # em_facts returns a subset of the setup facts, so switching the 
+        # fact module must not hand back the other module's entries
+        em_cache = FactCache( self.__cachefile, 'em_facts', 60, lambda: self.__now )
+        self.assertEqual( em_cache.get('foo'), None )
+        em_cache.put( 'foo', { 'ansible_fqdn' : 'foo.calpont.com' } )
+        self.assertEqual( em_cache.get('foo'), { 'ansible_fqdn' : 'foo.calpont.com' } )
+        self.assertEqual( self.__cache.get('foo'), setup_facts )
+
+        # a host is forgotten for its own module only
+        em_cache.invalidate('foo')
+        self.assertEqual( em_cache.get('foo'), None )
+        self.assertEqual( self.__cache.get('foo'), setup_facts )
+
+    def testTtl(self):
+        self.__cache.put_many( { 'foo' : { 'ansible_fqdn' : 'foo' }, 'bar' : { 'ansible_fqdn' : 'bar' } } )
+        self.__now += 59
+        self.assertEqual( self.__cache.get('bar'), { 'ansible_fqdn' : 'bar' } )
+        self.__now += 1
+        self.assertEqual( self.__cache.get('bar'), None )
+
+        # a ttl of 0 (the fact_cache_ttl default) bypasses the cache entirely
+        cache = FactCache( '%s/nocache.json' % self.__tmpdir, 'setup', 0 )
+        cache.put( 'foo', { 'ansible_fqdn' : 'foo' } )
+        self.assertEqual( cache.get('foo'), None )
+        self.assertFalse( os.path.exists( '%s/nocache.json' % self.__tmpdir ) )
+
+    def testInvalidate(self):
+        # facts gathered while every host was invalidated are not cached
+        started = self.__cache.now()
+        self.__now += 1
+        self.__cache.invalidate()
+        self.__cache.put_many( { 'foo' : { 'ansible_fqdn' : 'foo' } }, started )
+        self.assertEqual( self.__cache.get('foo'), None )
+        # and the cache file is rewritten rather than removed
+        self.assertTrue( os.path.exists( self.__cachefile ) )
+        self.__now += 1
+        self.__cache.put_many( { 'foo' : { 'ansible_fqdn' : 'foo' } }, self.__cache.now() )
+        self.assertEqual( self.__cache.get('foo'), { 'ansible_fqdn' : 'foo' } )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -41,6 +41,9 @@ class FactReqTest(unittest.TestCase):
         f4 = factreq.FactRequest('{ "cluster_name" : "cluster1", "hostnames" : [ "differenthost.calpont.com" ], "ssh_user" : "root", "ssh_pass" : "axj123123", "ssh_port" : 456 }')
         self.assertEqual(f4['hostnames'][0], "differenthost.calpont.com")
         self.assertEqual(f4['ssh_port'], 456)
+
+        f5 = factreq.FactRequest('{ "cluster_name" : "cluster1", "hostnames" : [ "differenthost.calpont.com" ], "ssh_user" : "root", "ssh_key" : "axj123123", "refresh_facts" : true }')
+        self.assertEqual(f5['refresh_facts'], True)
         
     def testPrint(self):
         f4 = factreq.FactRequest('{ "cluster_name" : "cluster1", "hostnames" : [ "differenthost.calpont.com" ], "ssh_user" : "root", "ssh_key" : "axj123123", "ssh_port" : 456 }')
@@ -85,6 +88,10 @@ class FactReqTest(unittest.TestCase):
         with self.assertRaisesRegexp(Exception,"Required field.*ssh_user"):        
             f1 = factreq.FactRequest('{ "cluster_name" : "c1", "hostnames" : ["abc"] }')
 
+        # test type error in refresh_facts
+        with self.assertRaisesRegexp(Exception,"refresh_facts.*not of type boolean"):        
+            f1 = factreq.FactRequest('{ "cluster_name" : "c1", "hostnames" : ["abc"], "ssh_user" : "root", "ssh_key" : "1", "refresh_facts" : "yes" }')
+
         # bad JSON
         with self.assertRaisesRegexp(ValueError,"No JSON object could be decoded"):        
             f1 = factreq.FactRequest('this is not really json')
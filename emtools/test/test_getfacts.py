@@ -0,0 +1,188 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import imp
+import json
+import shutil
+from emtools.playbookmgr import PlaybookMgr
+import emtools.msg.factreq as factreq
+import emtools.common as common
+
+getfacts = imp.load_source( 'test_getfacts_bin', '%s/bin/getfacts.py' % os.environ['INFINIDB_EM_TOOLS_HOME'] )
+
+# the hosts in test_Calpont.xml plus one that was only in the request
+_HOSTS = { 'emserver' : '10.0.3.1',
+           'cdh-head' : '10.0.3.55',
+           'cdh-data1' : '10.0.3.56',
+           'cdh-data2' : '10.0.3.57',
+           'cdh-data3' : '10.0.3.58',
+           'cdh-data4' : '10.0.3.59',
+           'cdh-dark' : '10.0.3.60' }
+_DARK = ( 'cdh-dark', 'cdh-data4' )
+
+class FakeSocket(object):
+    '''Stands in for the socket module so that _HOSTS resolve.'''
+
+    @staticmethod
+    def gethostbyname(name):
+        return _HOSTS[name]
+
+    @staticmethod
+    def gethostbyaddr(ip):
+        for name, addr in _HOSTS.iteritems():
+            if addr == ip:
+                return name, [], [ip]
+        raise Exception('unknown host %s' % ip)
+
+    @staticmethod
+    def gethostname():
+        return 'emserver'
+
+def _facts(host, module):
+    if module == 'site_facts':
+        return { 'homedir' : '/root', 'sudo' : True, 'gluster_version' : '',
+                 'hadoop_version' : '', 'pdsh_version' : '', 'infinidb_version' : '4.5.0',
+                 'infinidb_installdir' : '/usr/local/Calpont', 'infinidb_user' : 'root',
+                 'collectd_version' : '', 'python-stack_version' : '', 'graphite_version' : '',
+                 'tools_version' : '', 'port3306available' : True }
+    return { 'ansible_fqdn' : host, 'ansible_hostname' : host, 'ansible_python_version' : '2.7.5',
+             'ansible_all_ipv4_addresses' : [ _HOSTS[host] ], 'ansible_distribution' : 'CentOS',
+             'ansible_processor_vcpus' : 2, 'ansible_memtotal_mb' : 2048 }
+
+def _result(host_pattern, module):
+    reslt = { 'contacted' : {}, 'dark' : {} }
+    for h in host_pattern.split(':'):
+        if h in _DARK:
+            reslt['dark'][h] = { 'msg' : 'SSH encountered an unknown error during the connection.' }
+        else:
+            reslt['contacted'][h] = { 'ansible_facts' : _facts(h, module) }
+    return reslt
+
+class StubPlaybookMgr(PlaybookMgr):
+    '''
+    Answers module runs with canned results rather than running ansible and
+    records the (modules, host pattern, forks) of each run.
+    '''
+
+    def __init__(self, name):
+        PlaybookMgr.__init__(self, name)
+        self.runs = []
+
+    def run_module(self, inventory_file, host_pattern, module_name, module_args='', no_raise=False, sudo=False, forks=None, callback=None):
+        self.runs.append( ( [ module_name ], host_pattern, forks ) )
+        return _result(host_pattern, module_name)
+
+    def run_modules(self, inventory_file, host_pattern, modules, no_raise=False, sudo=False, forks=None):
+        self.runs.append( ( [ m for m, a in modules ], host_pattern, forks ) )
+        return [ _result(host_pattern, m) for m, a in modules ]
+
+    def run_playbook(self, playbook_file, inventory_file, host_subset=None, playbook_args=None, forks=None):
+        # getinfo.yml fetches the Calpont.xml of host_subset
+        filesdir = '%s/cluster_files' % self.get_rootdir()
+        if not os.path.exists(filesdir):
+            os.makedirs(filesdir)
+        shutil.copy( '%s/emtools/test/test_Calpont.xml' % os.environ['INFINIDB_EM_TOOLS_HOME'], filesdir )
+        os.rename( '%s/test_Calpont.xml' % filesdir, '%s/Calpont.xml' % filesdir )
+        return 0, {}, '', ''
+
+    def gathered(self, module):
+        '''Returns the hosts module was run on, in run order.'''
+        hosts = []
+        for modules, host_pattern, forks in self.runs:
+            if module in modules:
+                hosts.extend( host_pattern.split(':') )
+        return hosts
+
+class FactGetterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__props = dict( (p, common.props[p]) for p in ( 'emtools.getfacts.fact_module',
+                                                              'emtools.getfacts.fact_cache_ttl',
+                                                              'emtools.getfacts.probe_timeout_ms' ) )
+        common.props['emtools.getfacts.probe_timeout_ms'] = 0
+        self.__socket = getfacts.socket
+        getfacts.socket = FakeSocket
+        self.__pmgr = StubPlaybookMgr( 'test_getfacts' )
+
+    def tearDown(self):
+        getfacts.socket = self.__socket
+        for p, v in self.__props.iteritems():
+            common.props[p] = v
+        shutil.rmtree( self.__pmgr.get_rootdir() )
+
+    def __run(self, forks):
+        req = factreq.FactRequest( json.dumps( { 'cluster_name' : 'test_getfacts', 
+                                                 'hostnames' : [ 'cdh-dark', 'cdh-head' ],
+                                                 'ssh_user' : 'root', 'ssh_key' : 'not a real key' } ) )
+        del self.__pmgr.runs[:]
+        reply = getfacts.FactGetter( req, forks=forks, pmgr=self.__pmgr ).run()
+        return json.loads( reply.json_dumps() )
+
+    def testFactCache(self):
+        everyone = sorted( _HOSTS.keys() )
+        everyone.remove('emserver')
+
+        # fact_cache_ttl 0 gathers the facts of every host every time
+        common.props['emtools.getfacts.fact_cache_ttl'] = 0
+        for i in range(2):
+            reply = self.__run(1)
+            self.assertEqual( sorted( self.__pmgr.gathered('setup') ), everyone )
+        self.assertEqual( reply['instance_info']['cdh-data1']['memory_available'], 2048 )
+        self.assertFalse( reply['instance_info']['cdh-data4']['valid'] )
+
+        # with a ttl only the dark hosts are gathered again, but site_facts 
+        # always runs
+        common.props['emtools.getfacts.fact_cache_ttl'] = 3600
+        self.__run(1)
+        self.assertEqual( sorted( self.__pmgr.gathered('setup') ), everyone )
+        self.assertEqual( self.__run(1), reply )
+        self.assertEqual( sorted( self.__pmgr.gathered('setup') ), [ 'cdh-dark', 'cdh-data4' ] )
+        self.assertEqual( sorted( self.__pmgr.gathered('site_facts') ), 
+                          [ 'cdh-data1', 'cdh-data2', 'cdh-data3', 'cdh-head' ] )
+
+        # facts cached from setup are not used for em_facts
+        common.props['emtools.getfacts.fact_module'] = 'em_facts'
+        self.__run(1)
+        self.assertEqual( sorted( self.__pmgr.gathered('em_facts') ), everyone )
+
+    def testForks(self):
+        serial = self.__run(1)
+        serial_runs = list( self.__pmgr.runs )
+        parallel = self.__run(4)
+        self.assertEqual( parallel, serial )
+        self.assertTrue( serial['cluster_info']['valid'] )
+        self.assertEqual( serial['role_info']['pm4'], 'cdh-data4' )
+        self.assertFalse( serial['instance_info']['cdh-dark']['valid'] )
+        self.assertFalse( serial['instance_info']['cdh-data4']['valid'] )
+        self.assertEqual( serial['instance_info']['cdh-data1']['storage_type'], 'hdfs' )
+
+        # serially each host is a separate run
+        self.assertEqual( len( [ r for r in serial_runs if r[0] == [ 'setup' ] ] ), 6 )
+        # otherwise the request hosts are gathered together and then the 
+        # hosts found in Calpont.xml
+        self.assertEqual( self.__pmgr.runs, 
+                          [ ( [ 'setup', 'site_facts' ], 'cdh-dark:cdh-head', 4 ),
+                            ( [ 'setup', 'site_facts' ], 'cdh-data1:cdh-data2:cdh-data3:cdh-data4', 4 ) ] )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
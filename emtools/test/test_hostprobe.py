@@ -0,0 +1,62 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import socket
+import time
+from emtools.common.hostprobe import probe_host, probe_hosts
+
+class HostProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        # a listening port stands in for a live sshd
+        self.__listener = socket.socket()
+        self.__listener.bind( ('127.0.0.1', 0) )
+        self.__listener.listen( 5 )
+        self.__live = self.__listener.getsockname()[1]
+        # and a port nobody listens on for a dead one
+        s = socket.socket()
+        s.bind( ('127.0.0.1', 0) )
+        self.__dead = s.getsockname()[1]
+        s.close()
+
+    def tearDown(self):
+        self.__listener.close()
+
+    def testProbeHost(self):
+        self.assertEqual( probe_host( '127.0.0.1', self.__live, 1.0 ), None )
+        reason = probe_host( '127.0.0.1', self.__dead, 1.0 )
+        self.assertTrue( reason.startswith( 'ssh port %d on 127.0.0.1 is not reachable: ' % self.__dead ) )
+
+        # retries back off: 0.05 + 0.1 seconds between the 3 attempts
+        start = time.time()
+        self.assertTrue( probe_host( '127.0.0.1', self.__dead, 1.0, retries=2, backoff=0.05 ) )
+        self.assertTrue( time.time() - start >= 0.15 )
+
+    def testProbeHosts(self):
+        self.assertEqual( probe_hosts( [] ), {} )
+        dead = probe_hosts( [ '127.0.0.1', 'localhost' ], self.__live, 1.0 )
+        self.assertEqual( dead, {} )
+        dead = probe_hosts( [ '127.0.0.1' ] * 3, self.__dead, 1.0, concurrency=2 )
+        self.assertEqual( dead.keys(), [ '127.0.0.1' ] )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -21,8 +21,12 @@ Created on Feb 4, 2014
 @author: bwilkinson
 '''
 import unittest
+import emtools.idbxml as idbxml_mod
 from emtools.idbxml import IdbXml
 import os
+import shutil
+import tempfile
+import StringIO
 
 class IdbXmlTest(unittest.TestCase):
 
@@ -57,6 +61,46 @@ class IdbXmlTest(unittest.TestCase):
         value = idbxml.get_parm('NoSection', 'NoParm')
         self.assertEqual(value, '')
 
+    def testGetParms(self):
+        xml_file = '%s/test_Calpont.xml' % os.path.dirname(__file__)
+        idbxml = IdbXml( xml_file )
+        self.assertEqual(idbxml.get_parms([ ('HashJoin', 'MaxBuckets'), ('NoSection', 'NoParm'), ('HashJoin', 'NoParm') ]),
+                         [ '128', '', '' ])
+        self.assertEqual(idbxml.get_parms([]), [])
+        self.assertEqual(idbxml.get_modules('pm'), idbxml.get_pms())
+        self.assertEqual(idbxml.get_modules('um')[0]['hostname'], 'cdh-head')
+
+    def testDuplicateSections(self):
+        xml = '''<Calpont>
+    <HashJoin><MaxBuckets>128</MaxBuckets></HashJoin>
+    <HashJoin><MaxBuckets>256</MaxBuckets><PmMaxMemorySmallSide>64M</PmMaxMemorySmallSide></HashJoin>
+</Calpont>'''
+        idbxml = IdbXml( StringIO.StringIO( xml ) )
+        self.assertEqual(idbxml.get_parm('HashJoin', 'MaxBuckets'), '128')
+        # not in the first HashJoin section
+        self.assertEqual(idbxml.get_parm('HashJoin', 'PmMaxMemorySmallSide'), '')
+
+    def testCache(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            xml_file = '%s/Calpont.xml' % tmpdir
+            shutil.copy( '%s/test_Calpont.xml' % os.path.dirname(__file__), xml_file )
+            IdbXml( xml_file )
+            entry = idbxml_mod._cache[xml_file]
+            # unchanged, so not parsed again
+            self.assertEqual(IdbXml( xml_file ).get_parm('HashJoin', 'MaxBuckets'), '128')
+            self.assertTrue(idbxml_mod._cache[xml_file] is entry)
+
+            text = open( xml_file ).read().replace('<MaxBuckets>128</MaxBuckets>', '<MaxBuckets>4096</MaxBuckets>')
+            open( xml_file, 'w' ).write( text )
+            self.assertEqual(IdbXml( xml_file ).get_parm('HashJoin', 'MaxBuckets'), '4096')
+            self.assertFalse(idbxml_mod._cache[xml_file] is entry)
+
+            # open files are parsed every time
+            self.assertEqual(IdbXml( open( xml_file ) ).get_parm('HashJoin', 'MaxBuckets'), '4096')
+        finally:
+            shutil.rmtree( tmpdir )
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
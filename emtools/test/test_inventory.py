@@ -0,0 +1,147 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import shutil
+import tempfile
+import emtools.inventory as inventory
+from emtools.inventory import Inventory
+
+sample_inventory = '''ungrouped.calpont.com
+[all]
+foo.calpont.com
+bar.calpont.com infinidb_user=calpont port=2222
+# a comment
+[pm1]
+foo.calpont.com
+[pm2]
+bar.calpont.com
+[pm:children]
+pm1
+pm2
+[pm:vars]
+infinidb_installdir = /usr/local/Calpont
+'''
+
+class InventoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+        self.__path = '%s/inv' % self.__tmpdir
+        f = open( self.__path, 'w' )
+        f.write( sample_inventory )
+        f.close()
+
+    def tearDown(self):
+        shutil.rmtree( self.__tmpdir )
+
+    def testRead(self):
+        inv = inventory.read( self.__path )
+        self.assertFalse( inv.dirty )
+        self.assertEqual( inv.groups(), [ 'all', 'pm1', 'pm2' ] )
+        self.assertTrue( inv.has_host( 'bar.calpont.com' ) )
+        self.assertFalse( inv.has_host( 'baz.calpont.com' ) )
+        self.assertEqual( inv.groups_of( 'bar.calpont.com' ), [ 'all', 'pm2' ] )
+        self.assertEqual( inv.hosts( 'pm' ), [ 'foo.calpont.com', 'bar.calpont.com' ] )
+        self.assertEqual( inv.hosts(), [ 'ungrouped.calpont.com', 'foo.calpont.com', 'bar.calpont.com' ] )
+        self.assertEqual( inv.host_vars( 'bar.calpont.com' ), { 'infinidb_user' : 'calpont', 'port' : '2222' } )
+        self.assertEqual( inv.children( 'pm' ), [ 'pm1', 'pm2' ] )
+        self.assertEqual( inv.group_vars( 'pm' ), { 'infinidb_installdir' : '/usr/local/Calpont' } )
+
+        # the read_inventory format
+        d = inv.to_dict()
+        self.assertEqual( d['root'], [ 'ungrouped.calpont.com' ] )
+        self.assertEqual( d['all'], [ 'foo.calpont.com', 'bar.calpont.com infinidb_user=calpont port=2222' ] )
+        self.assertEqual( d['pm:children'], [ 'pm1', 'pm2' ] )
+        self.assertEqual( d['pm:vars'], [ 'infinidb_installdir=/usr/local/Calpont' ] )
+
+        self.assertRaises( IOError, inventory.read, '%s/missing' % self.__tmpdir )
+
+    def testSave(self):
+        inv = inventory.read( self.__path )
+        st = os.stat( self.__path )
+        # nothing changed, nothing written
+        self.assertFalse( inv.save() )
+        inv.add_host( 'foo.calpont.com', 'pm1' )
+        inv.set_hosts( 'pm2', [ 'bar.calpont.com' ] )
+        inv.set_var( 'pm', 'infinidb_installdir', '/usr/local/Calpont' )
+        self.assertFalse( inv.dirty )
+        self.assertFalse( inv.save() )
+        self.assertEqual( os.stat( self.__path ).st_ino, st.st_ino )
+
+        for i in range(100):
+            inv.add_host( 'host%d.calpont.com' % i )
+        inv.add_child( 'pm', 'pm3' )
+        inv.remove_host( 'bar.calpont.com' )
+        self.assertTrue( inv.dirty )
+        self.assertTrue( inv.save() )
+        self.assertFalse( inv.dirty )
+        self.assertEqual( os.listdir( self.__tmpdir ), [ 'inv' ] )
+
+        other = inventory.read( self.__path )
+        self.assertEqual( other.to_dict(), inv.to_dict() )
+        self.assertEqual( len( other.hosts( 'all' ) ), 102 )
+        self.assertEqual( other.groups_of( 'bar.calpont.com' ), [] )
+        self.assertEqual( other.children( 'pm' ), [ 'pm1', 'pm2', 'pm3' ] )
+
+        # a new inventory is always written
+        new = Inventory( '%s/new' % self.__tmpdir )
+        new.add_host( 'foo.calpont.com' )
+        self.assertTrue( new.save() )
+        f = open( '%s/new' % self.__tmpdir )
+        self.assertEqual( f.read(), '[all]\nfoo.calpont.com\n' )
+        f.close()
+
+    def testReset(self):
+        inv = Inventory( self.__path )
+        inv.reset( { 'all' : [ 'foo.calpont.com' ], 'pm:children' : [ 'pm1' ], 'pm1' : [ 'foo.calpont.com' ] } )
+        self.assertTrue( inv.save() )
+        self.assertEqual( inv.hosts( 'pm' ), [ 'foo.calpont.com' ] )
+
+        # the same contents again do not rewrite the file
+        inv = inventory.read( self.__path )
+        inv.reset( { 'all' : [ 'foo.calpont.com' ], 'pm:children' : [ 'pm1' ], 'pm1' : [ 'foo.calpont.com' ] } )
+        self.assertFalse( inv.dirty )
+        inv.reset( { 'all' : [ 'bar.calpont.com' ] } )
+        self.assertTrue( inv.dirty )
+        self.assertEqual( inv.hosts( 'pm' ), [] )
+
+    def testCache(self):
+        inv = inventory.read( self.__path )
+        cached = inventory._cache[self.__path]
+        inventory.read( self.__path )
+        self.assertTrue( inventory._cache[self.__path] is cached )
+
+        # a rewrite by someone else is picked up
+        f = open( self.__path, 'w' )
+        f.write( '[all]\nbaz.calpont.com\n' )
+        f.close()
+        inv.reload()
+        self.assertEqual( inv.hosts(), [ 'baz.calpont.com' ] )
+
+        # our own writes refresh the cache
+        inv.add_host( 'qux.calpont.com' )
+        inv.save()
+        self.assertEqual( inventory.read( self.__path ).hosts(), [ 'baz.calpont.com', 'qux.calpont.com' ] )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,66 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import json
+import emtools.common as common
+import emtools.msg.jsonmsg as jsonmsg
+from emtools.msg.errormsg import ErrorMsg_from_parms
+
+class JsonCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__backend = jsonmsg._backend
+
+    def tearDown(self):
+        jsonmsg.use_backend( self.__backend )
+        common.props['emtools.msg.str_format'] = jsonmsg.PRETTY
+
+    def testBackends(self):
+        data = { 'b' : [ 1, 2.5, None, True ], 'a' : u'\xe9x', 'c' : { 'd' : 'e/f' } }
+        for name in jsonmsg.BACKENDS:
+            try:
+                self.assertEqual( jsonmsg.use_backend( name ), name )
+            except ImportError:
+                continue
+            self.assertEqual( jsonmsg.loads( jsonmsg.dumps( data ) ), data )
+            self.assertEqual( jsonmsg.loads( jsonmsg.dumps( data, jsonmsg.PRETTY ) ), data )
+            self.assertFalse( ' ' in jsonmsg.dumps( { 'a' : [ 1, 2 ] } ) )
+            self.assertRaises( ValueError, jsonmsg.loads, '{ "a" : ' )
+        self.assertRaisesRegexp( ValueError, 'unknown JSON backend', jsonmsg.use_backend, 'pickle' )
+        self.assertTrue( jsonmsg.use_backend( jsonmsg.AUTO ) in jsonmsg.BACKENDS )
+        # the stdlib json unless asked otherwise
+        self.assertEqual( jsonmsg.use_backend(), 'json' )
+        self.assertEqual( type( jsonmsg.loads( '["a"]' )[0] ), unicode )
+
+    def testFormats(self):
+        jsonmsg.use_backend( 'json' )
+        err = ErrorMsg_from_parms( msg='failed', rc=2 )
+        self.assertEqual( json.loads( err.json_dumps() ), { 'failed' : True, 'msg' : 'failed', 'rc' : 2 } )
+        self.assertFalse( ' ' in err.json_dumps() )
+        self.assertEqual( str( err ), json.dumps( { 'failed' : True, 'msg' : 'failed', 'rc' : 2 }, sort_keys=True, indent=4 ) )
+        # messages nest in a larger document through to_dict()
+        self.assertEqual( jsonmsg.dumps( [ err.to_dict() ] ), '[%s]' % err.json_dumps() )
+        common.props['emtools.msg.str_format'] = jsonmsg.COMPACT
+        self.assertEqual( str( err ), err.json_dumps() )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,120 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import time
+import shutil
+import tempfile
+from emtools.cluster.pkgcatalog import PackageCatalog
+from emtools.cluster.emversionmgr import EmVersionManager
+import emtools.common as common
+
+class PackageCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+        self.__pkgdir = '%s/packages' % self.__tmpdir
+        self.__indexdir = '%s/index' % self.__tmpdir
+        os.mkdir(self.__pkgdir)
+        for v in ['4.5.0-1', '4.5.1-2', '4.5.1-10', '4.6.0-1', '4.0.2-1']:
+            self.__touch('infinidb-ent-%s.x86_64.bin.tar.gz' % v)
+        self.__touch('calpont-infinidb-ent-4.5.1-2.x86_64.bin.tar.gz.md5')
+        self.__touch('infinidb-4.6.0-1.x86_64.rpm.tar.gz')
+        self.__touch('README')
+        self.__age()
+
+    def tearDown(self):
+        shutil.rmtree(self.__tmpdir)
+
+    def __touch(self, name):
+        open('%s/%s' % (self.__pkgdir, name), 'w').close()
+
+    def __age(self, secs=60):
+        # make the directory look settled (whole seconds so that utime 
+        # sets exactly what stat returns)
+        t = int(time.time()) - secs
+        os.utime(self.__pkgdir, (t, t))
+
+    def testLookup(self):
+        cat = PackageCatalog(self.__pkgdir, self.__indexdir)
+        self.assertEqual(cat.lookup('binary', '4.5.1-2'), 'infinidb-ent-4.5.1-2.x86_64.bin.tar.gz')
+        self.assertEqual(cat.lookup('binary', '4.6.0-1'), 'infinidb-ent-4.6.0-1.x86_64.bin.tar.gz')
+        self.assertEqual(cat.lookup('rpm-std', '4.6.0-1'), 'infinidb-4.6.0-1.x86_64.rpm.tar.gz')
+        self.assertEqual(cat.lookup('binary', '4.7.0-1'), None)
+        self.assertEqual(cat.lookup('deb', '4.6.0-1'), None)
+
+    def testQueries(self):
+        cat = PackageCatalog(self.__pkgdir)
+        self.assertEqual(cat.versions('binary'), ['4.0.2-1', '4.5.0-1', '4.5.1-2', '4.5.1-10', '4.6.0-1'])
+        self.assertEqual(cat.latest('binary'), '4.6.0-1')
+        self.assertEqual(cat.latest('binary', '4.5'), '4.5.1-10')
+        self.assertEqual(cat.latest('binary', '4.1'), None)
+        self.assertEqual(cat.latest('deb'), None)
+        self.assertEqual(cat.range('binary', '4.5.0-1', '4.6.0'), ['4.5.0-1', '4.5.1-2', '4.5.1-10'])
+        self.assertEqual(cat.range('binary', '4.5.1'), ['4.5.1-2', '4.5.1-10', '4.6.0-1'])
+        self.assertEqual(cat.range('binary', maxver='4.5.1-10'), ['4.0.2-1', '4.5.0-1', '4.5.1-2'])
+        self.assertEqual(cat.range('binary', maxver='4.5.1-10', inclusive=True)[-1], '4.5.1-10')
+
+    def testFreshness(self):
+        cat = PackageCatalog(self.__pkgdir, self.__indexdir)
+        self.assertEqual(cat.latest('binary'), '4.6.0-1')
+        self.assertEqual(len(os.listdir(self.__indexdir)), 1)
+
+        # a new process picks up the saved index without listing the directory
+        t = os.stat(self.__pkgdir).st_mtime
+        os.remove('%s/infinidb-ent-4.0.2-1.x86_64.bin.tar.gz' % self.__pkgdir)
+        os.utime(self.__pkgdir, (t, t))
+        other = PackageCatalog(self.__pkgdir, self.__indexdir)
+        self.assertEqual(other.versions('binary')[0], '4.0.2-1')
+
+        # adding a package changes the directory mtime
+        self.__touch('infinidb-ent-4.6.1-1.x86_64.bin.tar.gz')
+        self.__age(30)
+        self.assertEqual(cat.latest('binary'), '4.6.1-1')
+        self.assertEqual(other.lookup('binary', '4.6.1-1'), 'infinidb-ent-4.6.1-1.x86_64.bin.tar.gz')
+
+        # a recently modified directory is rescanned until it settles
+        os.remove('%s/infinidb-ent-4.6.1-1.x86_64.bin.tar.gz' % self.__pkgdir)
+        self.assertEqual(cat.latest('binary'), '4.6.0-1')
+        self.__touch('infinidb-ent-4.6.2-1.x86_64.bin.tar.gz')
+        self.assertEqual(cat.latest('binary'), '4.6.2-1')
+
+    def testVersionManager(self):
+        saved = [ common.props[k] for k in ('cluster.emversionmgr.packages_base', 'cluster.emversionmgr.catalog_dir') ]
+        common.props['cluster.emversionmgr.packages_base'] = self.__pkgdir
+        common.props['cluster.emversionmgr.catalog_dir'] = self.__indexdir
+        try:
+            mgr = EmVersionManager()
+            self.assertEqual(mgr.retrieve('4.5.1-2', 'binary'), 'infinidb-ent-4.5.1-2.x86_64.bin.tar.gz')
+            # retrieve only finds exact versions
+            self.assertRaises(Exception, mgr.retrieve, 'Latest', 'binary')
+            self.assertRaises(Exception, mgr.retrieve, '4.5', 'binary')
+            self.assertEqual(mgr.retrieve_latest('binary'), 'infinidb-ent-4.6.0-1.x86_64.bin.tar.gz')
+            self.assertEqual(mgr.retrieve_latest('binary', '4.5'), 'infinidb-ent-4.5.1-10.x86_64.bin.tar.gz')
+            self.assertRaises(Exception, mgr.retrieve_latest, 'binary', '4.1')
+            self.assertRaises(Exception, mgr.retrieve_latest, 'binary', 'Latest')
+            self.assertEqual(mgr.versions('binary', '4.5.0-1', '4.6.0'), ['4.5.0-1', '4.5.1-2', '4.5.1-10'])
+        finally:
+            common.props['cluster.emversionmgr.packages_base'], common.props['cluster.emversionmgr.catalog_dir'] = saved
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,71 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import emtools.cluster.pkgfilenameparser as pkgfilenameparser
+from emtools.cluster.pkgfilenameparser import PkgFileNameParser, PkgFile
+
+class PkgFileNameParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__parser = PkgFileNameParser()
+
+    def testClassify(self):
+        names = [ 'calpont-infinidb-ent-4.5.1-2.x86_64.bin.tar.gz',
+                  'README',
+                  'infinidb-ent-4.6.0-1.amd64.deb.tar.gz.md5',
+                  'infinidb-4.6.0-1.x86_64.rpm.tar.gz',
+                  'calpont-infinidb-datdup-4.5.1-2.x86_64.bin.tar.gz',
+                  'calpont-datdup-4.5.1-2.x86_64.rpm' ]
+        recs = self.__parser.classify(names)
+        self.assertEqual(recs[0], PkgFile(names[0], ('binary',), 'ent', '4.5.1-2', True))
+        self.assertEqual(recs[1], PkgFile(names[2], ('deb',), 'ent', '4.6.0-1', False))
+        self.assertEqual(recs[2], PkgFile(names[3], ('rpm-std',), 'std', '4.6.0-1', True))
+        self.assertEqual(recs[3].ptypes, ('binary-datdup', 'deb-datdup'))
+        self.assertEqual(recs[4].ptypes, ('rpm-datdup',))
+        self.assertEqual(len(recs), 5)
+
+        # the same types match() reports
+        for rec in recs:
+            self.assertEqual(list(rec.ptypes), [ t for t in self.__parser.ptypes() 
+                                                 if self.__parser.match(t, rec.name) ])
+
+        self.assertEqual(self.__parser.classify_one('/some/dir/%s' % names[0]).version, '4.5.1-2')
+        self.assertEqual(self.__parser.classify_one('README'), None)
+
+    def testPkgVersion(self):
+        self.assertEqual(self.__parser.get_pkg_version('/a/infinidb-ent-4.5.1-2.x86_64.bin.tar.gz'), '4.5.1-2')
+        # not a version pattern match() accepts, but still a package name
+        self.assertEqual(self.__parser.get_pkg_version('infinidb-ent-trunk.x86_64.bin.tar.gz'), 'trunk')
+        self.assertEqual(self.__parser.get_pkg_version('calpont-infinidb-datdup-4.5.x86_64.bin.tar.gz'), 'datdup-4.5')
+        with self.assertRaisesRegexp(Exception, '.*does not look like a package file.*'):
+            self.__parser.get_pkg_version('README')
+
+    def testCache(self):
+        for i in range(pkgfilenameparser._CACHE_SIZE + 10):
+            self.__parser.classify_one('infinidb-ent-4.5.%d-1.x86_64.bin.tar.gz' % i)
+        self.assertEqual(len(pkgfilenameparser._cache), pkgfilenameparser._CACHE_SIZE)
+        # least recently used names were dropped
+        self.assertFalse('infinidb-ent-4.5.0-1.x86_64.bin.tar.gz' in pkgfilenameparser._cache)
+        self.assertTrue('infinidb-ent-4.5.10-1.x86_64.bin.tar.gz' in pkgfilenameparser._cache)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -25,7 +25,14 @@ from emtools.playbookmgr import PlaybookMgr
 import testutils
 import os
 import shutil
+import json
+import shlex
+import sys
+import tempfile
+import threading
 from emtools.common.properties import Properties
+from emtools.msg.errormsg import ErrorMsg
+import emtools.common.utils as utils
 
 props = Properties()
 
@@ -76,6 +83,245 @@ class TestPlaybookMgr(unittest.TestCase):
         
         
         shutil.rmtree( p.get_rootdir() )
+
+    def testCloseSsh(self):
+        p = PlaybookMgr( 'testbook' )
+        p.config_ssh( 'root', 'some_key_data1234567890' )
+        cpdir = '%s/.ssh/cp' % p.get_rootdir()
+        self.assertTrue( os.path.isdir( cpdir ) )
+        open( '%s/foo.calpont.com-22-root' % cpdir, 'w' ).close()
+        open( '%s/my-host.calpont.com-22-em-admin' % cpdir, 'w' ).close()
+
+        cmds = []
+        def fake_ssh(cmd):
+            cmds.append(cmd)
+            return (0, '', '')
+        utils.syscall_cb = fake_ssh
+        try:
+            # same settings should leave the master connection alone
+            p.config_ssh( 'root', 'some_key_data1234567890' )
+            self.assertEquals( cmds, [] )
+            # a new key means the master was authenticated with stale settings
+            p.config_ssh( 'root', 'some_other_key' )
+        finally:
+            utils.syscall_cb = None
+
+        self.assertEquals( sorted(cmds), [ 'ssh -o ControlPath=%s/foo.calpont.com-22-root -O exit localhost' % cpdir,
+                                           'ssh -o ControlPath=%s/my-host.calpont.com-22-em-admin -O exit localhost' % cpdir ] )
+        self.assertEquals( os.listdir( cpdir ), [] )
+
+        shutil.rmtree( p.get_rootdir() )
+
+    def testRunModules(self):
+        p = PlaybookMgr( 'testbook' )
+
+        def fake_ansible(cmd):
+            # stands in for ansible-playbook and writes the results the 
+            # generated template task would have written
+            args = cmd.split()
+            self.assertEqual(args[0], 'ansible-playbook')
+            playbook = args[3]
+            text = open(playbook).read()
+            self.assertTrue(text.find('"setup"') != -1)
+            self.assertTrue(text.find('"command /bin/true"') != -1)
+            self.assertTrue(text.find('"foo.calpont.com:bar.calpont.com"') != -1)
+            w = open('%s/foo.calpont.com.json' % os.path.dirname(playbook), 'w')
+            w.write(json.dumps([ { 'ansible_facts' : { 'ansible_fqdn' : 'foo.calpont.com' } },
+                                 { 'rc' : 0, 'cmd' : '/bin/true' } ]))
+            w.close()
+            out = '''
+fatal: [bar.calpont.com] => SSH encountered an unknown error
+
+PLAY RECAP ******************************************************************** 
+bar.calpont.com            : ok=0    changed=0    unreachable=1    failed=0   
+foo.calpont.com            : ok=3    changed=1    unreachable=0    failed=0   
+'''
+            return (3, out, '')
+
+        utils.syscall_cb = fake_ansible
+        try:
+            reslts = p.run_modules( 'testinv', 'foo.calpont.com:bar.calpont.com', 
+                                    [ ('setup', ''), ('command', '/bin/true') ], no_raise=True )
+        finally:
+            utils.syscall_cb = None
+
+        self.assertEqual(len(reslts), 2)
+        self.assertEqual(reslts[0]['contacted']['foo.calpont.com']['ansible_facts']['ansible_fqdn'], 'foo.calpont.com')
+        self.assertEqual(reslts[1]['contacted']['foo.calpont.com']['rc'], 0)
+        self.assertEqual(reslts[0]['dark']['bar.calpont.com']['msg'], 'SSH encountered an unknown error')
+        self.assertEqual(reslts[1]['dark']['bar.calpont.com']['msg'], 'SSH encountered an unknown error')
+        # the throwaway playbook is cleaned up
+        self.assertEqual([ f for f in os.listdir(p.get_rootdir()) if f.find('.run_modules') == 0 ], [])
+
+        shutil.rmtree( p.get_rootdir() )
+
+    def testStreamPlaybook(self):
+        p = PlaybookMgr( 'testbook' )
+        cmds = []
+        def fake_playbook(cmd):
+            cmds.append(cmd)
+            return (0, 'PLAY [all] ****\n\nPLAY RECAP ****\nfoo.calpont.com : ok=1 changed=0 unreachable=0 failed=0\n', '')
+        utils.syscall_cb = fake_playbook
+        try:
+            s = p.stream_playbook( 'smokecheck.yml', 'testinv', 'pm1', forks=5 )
+            events = [ e['type'] for e in s ]
+        finally:
+            utils.syscall_cb = None
+        self.assertEqual( cmds, ["ansible-playbook -i testinv smokecheck.yml -l 'pm1' -f 5"] )
+        self.assertEqual( events, ['play', 'recap'] )
+        self.assertEqual( s.rc, 0 )
+        self.assertEqual( s.results['foo.calpont.com']['ok'], 1 )
+        self.assertTrue( s.logfile.startswith( '%s/log/smokecheck-' % p.get_rootdir() ) )
+        self.assertTrue( os.path.exists( s.logfile ) )
+        shutil.rmtree( p.get_rootdir() )
+
+    def __fake_command(self, name, text):
+        '''Puts an executable script called name at the front of PATH.'''
+        bindir = tempfile.mkdtemp()
+        f = open( '%s/%s' % (bindir, name), 'w' )
+        f.write( text )
+        f.close()
+        os.chmod( '%s/%s' % (bindir, name), 0755 )
+        origpath = os.environ['PATH']
+        os.environ['PATH'] = '%s:%s' % (bindir, origpath)
+        def restore():
+            os.environ['PATH'] = origpath
+            shutil.rmtree( bindir )
+        return restore
+
+    def testConcurrentPlaybooks(self):
+        # fake ansible-playbook that reports the directory it ran in
+        restore = self.__fake_command( 'ansible-playbook', 
+            '#!/bin/sh\nsleep 0.2\necho "PLAY RECAP ****"\necho "`basename $PWD` : ok=1 changed=0 unreachable=0 failed=0"\n' )
+        cwd = os.getcwd()
+        pmgrs = [ PlaybookMgr( 'testbook%d' % i ) for i in range(4) ]
+        results = {}
+        def run(p):
+            results[p] = p.run_playbook( 'smokecheck.yml', 'testinv' )
+        try:
+            threads = [ threading.Thread( target=run, args=(p,) ) for p in pmgrs ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            restore()
+            for p in pmgrs:
+                shutil.rmtree( p.get_rootdir() )
+        self.assertEqual( os.getcwd(), cwd )
+        for i in range(4):
+            rc, reslts, out, err = results[pmgrs[i]]
+            self.assertEqual( rc, 0 )
+            self.assertEqual( reslts.keys(), [ 'testbook%d' % i ] )
+
+    def testConcurrentModules(self):
+        # fake ansible that reports its working directory, module args and
+        # whether the events plugin was turned on as a result event
+        restore = self.__fake_command( 'ansible', 
+            '#!%s\n'
+            'import sys, os, json, time\n'
+            'args = sys.argv[1:]\n'
+            'margs = [ a[len("--args="):] for a in args if a.startswith("--args=") ]\n'
+            'time.sleep(0.05)\n'
+            'print "EMTOOLS_EVENT " + json.dumps({ "host" : "localhost", "status" : "ok", "result" :\n'
+            '    { "rc" : 0, "cwd" : os.getcwd(), "args" : margs[0],\n'
+            '      "events" : os.environ.get("EMTOOLS_EVENTS"),\n'
+            '      "plugins" : os.environ.get("ANSIBLE_CALLBACK_PLUGINS") } })\n' % sys.executable )
+        cwd = os.getcwd()
+        pmgrs = [ PlaybookMgr( 'testbook%d' % i ) for i in range(4) ]
+        results = {}
+        errors = []
+        def run(t):
+            p = pmgrs[t % len(pmgrs)]
+            try:
+                for i in range(5):
+                    reslt = p.run_module( 'testinv', 'all', 'shell', 'call-%d-%d' % (t, i) )
+                    results[(t, i)] = (p.get_rootdir(), reslt['contacted']['localhost'])
+            except Exception, e:
+                errors.append(e)
+        try:
+            threads = [ threading.Thread( target=run, args=(t,) ) for t in range(12) ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            restore()
+            for p in pmgrs:
+                shutil.rmtree( p.get_rootdir() )
+        self.assertEqual( errors, [] )
+        self.assertEqual( os.getcwd(), cwd )
+        self.assertEqual( len(results), 60 )
+        for (t, i), (rootdir, reslt) in results.iteritems():
+            self.assertEqual( reslt['args'], 'call-%d-%d' % (t, i) )
+            self.assertEqual( os.path.realpath(reslt['cwd']), os.path.realpath(rootdir) )
+            self.assertEqual( reslt['events'], '1' )
+            self.assertEqual( reslt['plugins'], './callback_plugins' )
+
+    def testRunCommands(self):
+        p = PlaybookMgr( 'testbook' )
+        def fake_ansible(cmd):
+            # run the generated script locally in place of the remote shell
+            script = cmd.split('--args=')[1]
+            script = script.replace('{{ infinidb_installdir }}', '/usr/local/Calpont')
+            rc, out, err = utils.syscall_with_timeout(['sh', '-c', shlex.split(script)[0]])
+            return (0, 'EMTOOLS_EVENT ' + json.dumps( { 'host' : 'foo.calpont.com', 'status' : 'ok', 
+                        'result' : { 'rc' : rc, 'stdout' : out, 'stderr' : err, 'cmd' : 'shell' } } ), '')
+        utils.syscall_cb = fake_ansible
+        try:
+            reslt = p.run_commands( 'testinv', 'pm1', [ 'echo one; echo two', 
+                                                        "printf 'no newline'; echo 'to stderr' 1>&2; exit 3",
+                                                        'echo {{ infinidb_installdir }}' ] )
+        finally:
+            utils.syscall_cb = None
+        results = reslt['contacted']['foo.calpont.com']['results']
+        self.assertEqual( results[0], { 'cmd' : 'echo one; echo two', 'rc' : 0, 'stdout' : 'one\ntwo', 'stderr' : '' } )
+        self.assertEqual( results[1]['rc'], 3 )
+        self.assertEqual( results[1]['stdout'], 'no newline' )
+        self.assertEqual( results[1]['stderr'], 'to stderr' )
+        self.assertEqual( results[2]['stdout'], '/usr/local/Calpont' )
+        shutil.rmtree( p.get_rootdir() )
+
+    def testRunModuleEvents(self):
+        p = PlaybookMgr( 'testbook' )
+        def fake_ansible(cmd):
+            self.assertTrue( cmd.find(' -j ') == -1 )
+            return (3, '''
+EMTOOLS_EVENT {"host": "foo.calpont.com", "status": "ok", "result": {"rc": 0, "cmd": "true"}}
+bar.calpont.com | FAILED => SSH encountered an unknown error
+EMTOOLS_EVENT {"host": "bar.calpont.com", "status": "unreachable", "result": {"msg": "timed out"}}
+''', '')
+        utils.syscall_cb = fake_ansible
+        events = []
+        try:
+            reslt = p.run_module( 'testinv', 'all', 'command', 'true', no_raise=True, callback=events.append )
+            self.assertRaises( ErrorMsg, p.run_module, 'testinv', 'all', 'command', 'true' )
+        finally:
+            utils.syscall_cb = None
+        self.assertEqual( [ (e['host'], e['status']) for e in events ], 
+                          [ ('foo.calpont.com', 'ok'), ('bar.calpont.com', 'unreachable') ] )
+        self.assertEqual( reslt['contacted'], { 'foo.calpont.com' : { 'rc' : 0, 'cmd' : 'true' } } )
+        self.assertEqual( reslt['dark'], { 'bar.calpont.com' : { 'msg' : 'timed out' } } )
+        self.assertEqual( p.host_error( reslt, 'bar.calpont.com' ), 'dark host bar.calpont.com: timed out' )
+        shutil.rmtree( p.get_rootdir() )
+
+    def testHostError(self):
+        p = PlaybookMgr( 'testbook' )
+        reslt = {
+            'dark' : { 'foo.calpont.com' : { 'msg' : 'timed out' } },
+            'contacted' : {
+                'bar.calpont.com' : { 'ansible_facts' : {} },
+                'baz.calpont.com' : { 'failed' : True, 'msg' : 'module failed' },
+                'qux.calpont.com' : { 'rc' : 1, 'cmd' : 'false' }
+            }
+        }
+        self.assertEqual(p.host_error(reslt, 'foo.calpont.com'), 'dark host foo.calpont.com: timed out')
+        self.assertEqual(p.host_error(reslt, 'bar.calpont.com'), None)
+        self.assertEqual(p.host_error(reslt, 'baz.calpont.com'), 'run_module failure: module failed')
+        self.assertEqual(p.host_error(reslt, 'qux.calpont.com'), 'run_module failure: see stdout/stderr')
+        self.assertTrue(p.host_error(reslt, 'nothere.calpont.com').find('Unknown error') == 0)
+
+        shutil.rmtree( p.get_rootdir() )
     
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import tempfile
+from emtools.playbookstream import PlaybookStream, ModuleStream
+import emtools.common.utils as utils
+
+sample_output = '''
+PLAY [all] ********************************************************************
+
+GATHERING FACTS ***************************************************************
+ok: [foo.calpont.com]
+fatal: [bar.calpont.com] => SSH encountered an unknown error during the connection.
+
+TASK: [common | install packages] *********************************************
+changed: [foo.calpont.com] => (item=rsync)
+skipping: [foo.calpont.com]
+failed: [foo.calpont.com] => {"failed": true}
+
+PLAY RECAP ********************************************************************
+bar.calpont.com            : ok=0    changed=0    unreachable=1    failed=0
+foo.calpont.com            : ok=2    changed=1    unreachable=0    failed=1
+'''
+
+class FakeCall(object):
+    def __init__(self, lines, rc=0, err=''):
+        self.__lines = lines
+        self.returncode = None
+        self.stderr = None
+        self.__rc = rc
+        self.__err = err
+
+    def __iter__(self):
+        for l in self.__lines:
+            yield l
+        self.returncode = self.__rc
+        self.stderr = self.__err
+
+class PlaybookStreamTest(unittest.TestCase):
+
+    def testEvents(self):
+        s = PlaybookStream( FakeCall( sample_output.splitlines(), 2, 'some error' ) )
+        events = [ e for e in s ]
+        self.assertEqual( events[0], { 'type' : 'play', 'name' : 'all' } )
+        self.assertEqual( events[1], { 'type' : 'task', 'name' : 'setup' } )
+        self.assertEqual( events[2], { 'type' : 'host', 'host' : 'foo.calpont.com', 'task' : 'setup',
+                                       'status' : 'ok', 'detail' : None } )
+        self.assertEqual( events[3]['status'], 'fatal' )
+        self.assertEqual( events[3]['detail'], 'SSH encountered an unknown error during the connection.' )
+        self.assertEqual( events[4], { 'type' : 'task', 'name' : 'common | install packages' } )
+        self.assertEqual( events[5]['detail'], '(item=rsync)' )
+        self.assertEqual( events[5]['task'], 'common | install packages' )
+        self.assertEqual( [ e['status'] for e in events[6:8] ], ['skipping', 'failed'] )
+        self.assertEqual( events[8], { 'type' : 'recap', 'host' : 'bar.calpont.com', 'ok' : 0,
+                                       'changed' : 0, 'unreachable' : 1, 'failed' : 0 } )
+        self.assertEqual( len(events), 10 )
+
+        self.assertEqual( s.rc, 2 )
+        self.assertEqual( s.err, 'some error' )
+        self.assertEqual( s.results['foo.calpont.com'], { 'ok' : 2, 'changed' : 1, 'unreachable' : 0, 'failed' : 1 } )
+        self.assertEqual( s.out, sample_output.strip() )
+
+    def testBuffer(self):
+        (fd, logfile) = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            lines = [ 'line %03d' % i for i in range(100) ]
+            s = PlaybookStream( FakeCall( lines ), logfile, maxbuf=45 )
+            rc, results, out, err = s.run()
+            self.assertEqual( rc, 0 )
+            self.assertEqual( results, {} )
+            # 5 lines of 9 bytes each fit in the buffer
+            self.assertEqual( out, '[earlier output truncated (full output in %s)]\n%s' % \
+                              (logfile, '\n'.join( lines[95:] )) )
+            f = open( logfile )
+            self.assertEqual( f.read(), '\n'.join( lines ) + '\n' )
+            f.close()
+        finally:
+            os.remove( logfile )
+
+    def testCallback(self):
+        seen = []
+        s = PlaybookStream( FakeCall( sample_output.splitlines() ) )
+        s.run( seen.append )
+        self.assertEqual( len(seen), 10 )
+
+    def testModuleStream(self):
+        lines = [ 'EMTOOLS_EVENT {"host": "foo.calpont.com", "status": "ok", "result": {"rc": 0}}',
+                  'bar.calpont.com | FAILED => SSH encountered an unknown error',
+                  'EMTOOLS_EVENT {"host": "bar.calpont.com", "status": "unreachable", "result": {"msg": "x"}}',
+                  'EMTOOLS_EVENT {not json' ]
+        s = ModuleStream( FakeCall( lines, 2, 'oops' ) )
+        events = [ e for e in s ]
+        self.assertEqual( events, [ { 'host' : 'foo.calpont.com', 'status' : 'ok', 'result' : { 'rc' : 0 } },
+                                    { 'host' : 'bar.calpont.com', 'status' : 'unreachable', 'result' : { 'msg' : 'x' } } ] )
+        self.assertEqual( s.rc, 2 )
+        self.assertEqual( s.err, 'oops' )
+        # anything that is not a result event is kept as output
+        self.assertEqual( s.out, '\n'.join( lines[1:2] + lines[3:] ) )
+
+        s = ModuleStream( FakeCall( [ 'line %03d' % i for i in range(10) ] ), maxbuf=20 )
+        self.assertEqual( [ e for e in s ], [] )
+        self.assertEqual( s.out, '[earlier output truncated]\nline 008\nline 009' )
+
+    def testSyscallStream(self):
+        call = utils.syscall_stream( 'sh -c "echo one; echo oops 1>&2; echo two; exit 3"' )
+        self.assertEqual( [ l for l in call ], ['one', 'two'] )
+        self.assertEqual( call.returncode, 3 )
+        self.assertEqual( call.stderr, 'oops' )
+
+        # stopping early doesn't leave the command running
+        call = utils.syscall_stream( 'sh -c "echo one; sleep 30; echo two"' )
+        for l in call:
+            break
+        self.assertEqual( l, 'one' )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,171 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import copy
+import validictory
+import emtools.common as common
+from emtools.msg.schema import compile_schema, get_validator, SAMPLE_ITEMS
+from emtools.msg.jsonmsg import STRICT, SAMPLE, LAZY, NONE, reply_validation
+from emtools.msg.factreq import FactRequest
+from emtools.msg.factreply import FactReply
+from emtools.msg.commandreply import CommandReply, CommandReply_from_dict
+from emtools.msg.configreq import ConfigRequest
+from emtools.msg.installreq import InstallReq
+
+samples = [
+    ( FactRequest, { 'cluster_name' : 'c1', 'hostnames' : [ 'a', 'b' ], 'ssh_user' : 'root', 'ssh_key' : 'k' } ),
+    ( FactReply, { 'cluster_info' : { 'valid' : True, 'name' : 'c1', 'os_family' : 'CentOS',
+                                      'gluster_version' : '', 'hadoop_version' : '',
+                                      'infinidb_version' : '', 'em_version' : '1.0' },
+                   'instance_info' : { 'a' : { 'valid' : True, 'ip_address' : '10.0.0.1' } },
+                   'role_info' : { 'pm1' : 'a' } } ),
+    ( CommandReply, { 'cluster_name' : 'c1', 'command' : 'getsystemstatus', 'console_host' : 'pm1',
+                      'rc' : 0, 'stdout' : '', 'stderr' : '',
+                      'replies' : [ { 'command' : 'getsystemstatus', 'rc' : 0, 'stdout' : '', 'stderr' : '' } ] } ),
+    ( ConfigRequest, { 'cluster_name' : 'c1', 'action' : 'setConfig',
+                       'set_params' : [ { 'em_category' : 'PM', 'em_parameter' : 'x', 'value' : '1' } ] } ),
+    ( InstallReq, { 'cluster_name' : 'c1',
+                    'cluster_info' : { 'infinidb_version' : '4.5', 'dbroots_per_pm' : 1, 'dbroot_list' : [ [1] ],
+                                       'infinidb_user' : 'root', 'storage_type' : 'local',
+                                       'pm_query' : False, 'um_replication' : False },
+                    'role_info' : { 'pm1' : 'a' } } ),
+]
+
+def mutations(data):
+    '''Yields copies of data with one field removed or set to a wrong value.'''
+    if isinstance(data, dict):
+        for k in data:
+            for bad in ( None, '', 1, True, [], {}, [ 1 ], 'x' ):
+                m = copy.deepcopy(data)
+                m[k] = bad
+                yield m
+            m = copy.deepcopy(data)
+            del m[k]
+            yield m
+            for sub in mutations(data[k]):
+                m = copy.deepcopy(data)
+                m[k] = sub
+                yield m
+    elif isinstance(data, list) and data:
+        for sub in mutations(data[0]):
+            yield [ sub ] + data[1:]
+        yield []
+        yield [ 1 ]
+
+def outcome(fn, data):
+    try:
+        fn(data)
+        return None
+    except ValueError, e:
+        return (type(e), str(e))
+
+class SchemaTest(unittest.TestCase):
+
+    def testSameAsValidictory(self):
+        validator = validictory.validator.SchemaValidator(blank_by_default=True)
+        count = 0
+        for cls, data in samples:
+            schema = getattr(cls, '_%s__schema' % cls.__name__)
+            compiled = compile_schema(schema)
+            self.assertEqual( outcome(compiled, data), None )
+            for m in mutations(data):
+                self.assertEqual( outcome(compiled, m), outcome(lambda d: validator.validate(d, schema), m) )
+                count += 1
+        self.assertTrue( count > 300 )
+
+    def testFallback(self):
+        # keywords that are not compiled are still checked, by validictory
+        fn = compile_schema( { 'type' : 'object', 'properties' : { 'a' : { 'type' : 'string', 'pattern' : '^x' } } } )
+        fn( { 'a' : 'xyz' } )
+        self.assertRaisesRegexp( ValueError, 'does not match regular expression', fn, { 'a' : 'abc' } )
+        fn = compile_schema( { 'type' : [ 'string', 'integer' ] } )
+        fn( 1 )
+        self.assertRaisesRegexp( ValueError, "doesn't match any of 2 subtypes", fn, [] )
+
+    def testRegistry(self):
+        schema = { 'type' : 'object', 'properties' : { 'a' : { 'type' : 'string' } } }
+        fn = get_validator( SchemaTest, schema )
+        self.assertTrue( get_validator( SchemaTest, schema ) is fn )
+        # an equal schema built again is not recompiled
+        self.assertTrue( get_validator( SchemaTest, copy.deepcopy(schema) ) is fn )
+        # a different one is
+        other = get_validator( SchemaTest, { 'type' : 'object', 'properties' : { 'a' : { 'type' : 'integer' } } } )
+        self.assertFalse( other is fn )
+        other( { 'a' : 1 } )
+
+    def testFromDict(self):
+        d = { 'cluster_name' : 'c1', 'hostnames' : [ 'a' ], 'ssh_user' : 'root', 'ssh_key' : 'k' }
+        f = FactRequest( d )
+        self.assertEqual( f['hostnames'], [ 'a' ] )
+        self.assertEqual( f.json_dumps(), FactRequest( f.json_dumps() ).json_dumps() )
+        self.assertRaisesRegexp( ValueError, "Required field 'ssh_user'", FactRequest, { 'cluster_name' : 'c1', 'hostnames' : [ 'a' ] } )
+
+class ValidationModeTest(unittest.TestCase):
+
+    def command_reply(self, nreplies, bad=None):
+        replies = [ { 'command' : 'getsystemstatus', 'rc' : 0, 'stdout' : '', 'stderr' : '' } for i in range(nreplies) ]
+        if bad is not None:
+            replies[bad]['rc'] = 'x'
+        return { 'cluster_name' : 'c1', 'command' : 'getsystemstatus', 'console_host' : 'pm1',
+                 'rc' : 0, 'stdout' : '', 'stderr' : '', 'replies' : replies }
+
+    def testSample(self):
+        n = SAMPLE_ITEMS * 10
+        # 0, 10, 20... and the last item are checked
+        for i in ( 0, 10, n - 1 ):
+            self.assertRaisesRegexp( ValueError, "Failed to validate field 'replies' list schema",
+                                     CommandReply, self.command_reply( n, i ), SAMPLE )
+        CommandReply( self.command_reply( n, 5 ), SAMPLE )
+        self.assertRaises( ValueError, CommandReply, self.command_reply( n, 5 ), STRICT )
+        # short lists are checked completely
+        self.assertRaises( ValueError, CommandReply, self.command_reply( SAMPLE_ITEMS, 5 ), SAMPLE )
+        # the rest of the message is still checked
+        d = self.command_reply( n )
+        del d['console_host']
+        self.assertRaisesRegexp( ValueError, "Required field 'console_host'", CommandReply, d, SAMPLE )
+
+    def testLazy(self):
+        reply = CommandReply( self.command_reply( 3, 1 ), LAZY )
+        self.assertRaises( ValueError, reply.__getitem__, 'rc' )
+        self.assertRaises( ValueError, reply.json_dumps )
+        self.assertRaises( ValueError, reply.validate )
+        reply = CommandReply( self.command_reply( 3 ), LAZY )
+        self.assertEqual( reply['rc'], 0 )
+        # once validated it stays so
+        reply['rc'] = 'x'
+        self.assertEqual( reply['rc'], 'x' )
+
+    def testNone(self):
+        reply = CommandReply( self.command_reply( 3, 1 ), NONE )
+        self.assertEqual( reply['replies'][1]['rc'], 'x' )
+        self.assertRaisesRegexp( ValueError, 'unknown validation mode: fast', CommandReply, self.command_reply( 3 ), 'fast' )
+
+    def testReplyValidation(self):
+        self.assertEqual( common.props['emtools.msg.reply_validation'], STRICT )
+        self.assertEqual( reply_validation(), STRICT )
+        self.assertEqual( reply_validation( LAZY ), LAZY )
+        self.assertRaises( ValueError, CommandReply_from_dict, self.command_reply( 3, 1 ) )
+        reply = CommandReply_from_dict( self.command_reply( 3, 1 ), NONE )
+        self.assertEqual( reply['replies'][1]['rc'], 'x' )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,144 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+from emtools.server import EmToolsServer, send_request
+import emtools.msg.errormsg as errormsg
+
+def echo(server, jsonstr):
+    req = json.loads( jsonstr )
+    return req['rc'], json.dumps( req )
+
+def fail(server, jsonstr):
+    raise errormsg.ErrorMsg_from_parms( msg='failed on purpose' )
+
+def crash(server, jsonstr):
+    raise Exception('crashed on purpose')
+
+class EmToolsServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+        self.__sockpath = '%s/test.sock' % self.__tmpdir
+        self.__held = []
+        self.__release = threading.Event()
+        self.__server = EmToolsServer( self.__sockpath, { 'echo' : echo, 'fail' : fail, 'crash' : crash, 
+                                                          'hold' : self.__hold } )
+        self.__thread = threading.Thread( target=self.__server.serve_forever )
+        self.__thread.start()
+
+    def tearDown(self):
+        self.__server.shutdown()
+        self.__thread.join()
+        self.__server.server_close()
+        shutil.rmtree( self.__tmpdir )
+
+    def __hold(self, server, jsonstr):
+        '''Handler that keeps its cluster locked until the test releases it.'''
+        names = [ json.loads( jsonstr )['cluster_name'] ]
+        server.lock_clusters( names )
+        try:
+            self.__held.append( names[0] )
+            self.__release.wait()
+        finally:
+            server.unlock_clusters( names )
+        return 0, '{}'
+
+    def __send_async(self, reqtype, jsonstr):
+        t = threading.Thread( target=send_request, args=( self.__sockpath, reqtype, jsonstr ) )
+        t.start()
+        return t
+
+    def __wait_held(self, count):
+        deadline = time.time() + 5
+        while len( self.__held ) < count and time.time() < deadline:
+            time.sleep( 0.01 )
+        return len( self.__held )
+
+    def testSuccess(self):
+        rc, reply = send_request( self.__sockpath, 'echo', '{ "rc" : 3, "value" : "abc" }' )
+        self.assertEqual( rc, 3 )
+        self.assertEqual( json.loads(reply), { "rc" : 3, "value" : "abc" } )
+
+        # connections are one per request
+        rc, reply = send_request( self.__sockpath, 'echo', '{ "rc" : 0 }' )
+        self.assertEqual( rc, 0 )
+
+    def testErrors(self):
+        rc, reply = send_request( self.__sockpath, 'nosuchtype', '{}' )
+        self.assertEqual( rc, 1 )
+        err = errormsg.ErrorMsg( reply )
+        self.assertEqual( err['msg'], 'unsupported request type: nosuchtype' )
+
+        rc, reply = send_request( self.__sockpath, 'fail', '{}' )
+        self.assertEqual( rc, 1 )
+        self.assertEqual( errormsg.ErrorMsg( reply )['msg'], 'failed on purpose' )
+
+        rc, reply = send_request( self.__sockpath, 'crash', '{}' )
+        self.assertEqual( rc, 1 )
+        self.assertTrue( 'crashed on purpose' in errormsg.ErrorMsg( reply )['msg'] )
+
+    def testParallel(self):
+        threads = [ self.__send_async( 'hold', '{ "cluster_name" : "a" }' ) ]
+        try:
+            self.assertEqual( self.__wait_held(1), 1 )
+            # other requests don't wait for a long running one
+            rc, reply = send_request( self.__sockpath, 'echo', '{ "rc" : 0 }' )
+            self.assertEqual( rc, 0 )
+            threads.append( self.__send_async( 'hold', '{ "cluster_name" : "b" }' ) )
+            self.assertEqual( self.__wait_held(2), 2 )
+            # but requests for the same cluster run one at a time
+            threads.append( self.__send_async( 'hold', '{ "cluster_name" : "a" }' ) )
+            time.sleep( 0.2 )
+            self.assertEqual( self.__held, [ 'a', 'b' ] )
+        finally:
+            self.__release.set()
+            for t in threads:
+                t.join()
+        self.assertEqual( self.__held, [ 'a', 'b', 'a' ] )
+
+    def testCacheStamp(self):
+        obj = self.__server.get_cached( 'testbook', 'config', lambda: object(), stamp=1 )
+        self.assertTrue( self.__server.get_cached( 'testbook', 'config', lambda: object(), stamp=1 ) is obj )
+        # a new stamp (i.e. the file it was loaded from changed) replaces it
+        newobj = self.__server.get_cached( 'testbook', 'config', lambda: object(), stamp=2 )
+        self.assertFalse( newobj is obj )
+        self.assertTrue( self.__server.get_cached( 'testbook', 'config', lambda: None, stamp=2 ) is newobj )
+
+    def testCache(self):
+        pmgr = self.__server.get_pmgr( 'testbook' )
+        self.assertTrue( self.__server.get_pmgr( 'testbook' ) is pmgr )
+        obj = self.__server.get_cached( 'testbook', 'other', lambda: object() )
+        self.assertTrue( self.__server.get_cached( 'testbook', 'other', lambda: None ) is obj )
+
+        self.__server.invalidate( 'testbook' )
+        self.assertFalse( self.__server.get_pmgr( 'testbook' ) is pmgr )
+        self.assertEqual( self.__server.get_cached( 'testbook', 'other', lambda: None ), None )
+        shutil.rmtree( pmgr.get_rootdir() )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
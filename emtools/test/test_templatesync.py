@@ -0,0 +1,164 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from emtools.templatesync import TemplateManifest, sync_playbook, read_stamp
+
+def write_file(fname, text, mtime=None):
+    if not os.path.isdir( os.path.dirname(fname) ):
+        os.makedirs( os.path.dirname(fname) )
+    f = open( fname, 'w' )
+    f.write( text )
+    f.close()
+    if mtime:
+        os.utime( fname, (mtime, mtime) )
+
+def read_file(fname):
+    f = open( fname )
+    text = f.read()
+    f.close()
+    return text
+
+class TemplateSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__tmpdir = tempfile.mkdtemp()
+        self.__template = '%s/template' % self.__tmpdir
+        self.__extra = '%s/extra' % self.__tmpdir
+        self.__cachedir = '%s/.manifests' % self.__tmpdir
+        self.__dest = '%s/cluster' % self.__tmpdir
+        write_file( '%s/site.yml' % self.__template, 'site', 1000 )
+        write_file( '%s/roles/a/tasks/main.yml' % self.__template, 'tasks', 1000 )
+        write_file( '%s/log/ansible.log' % self.__template, '' )
+        os.makedirs( '%s/empty' % self.__template )
+        write_file( '%s/site.yml' % self.__extra, 'extra site', 2000 )
+
+    def tearDown(self):
+        shutil.rmtree( self.__tmpdir )
+
+    def testManifest(self):
+        m = TemplateManifest( self.__template, self.__cachedir ).scan()
+        self.assertEqual( sorted( m.files.keys() ), ['roles/a/tasks/main.yml', 'site.yml'] )
+        self.assertEqual( m.dirs, ['empty', 'log', 'roles', 'roles/a', 'roles/a/tasks'] )
+
+        # the cached copy loads without a scan
+        m2 = TemplateManifest( self.__template, self.__cachedir )
+        self.assertTrue( m2.load() )
+        self.assertEqual( m2.digest, m.digest )
+
+        # touching a file does not change the digest, changing content does
+        os.utime( '%s/site.yml' % self.__template, (3000, 3000) )
+        self.assertEqual( TemplateManifest( self.__template, self.__cachedir ).scan().digest, m.digest )
+        write_file( '%s/site.yml' % self.__template, 'new site', 3000 )
+        self.assertNotEqual( TemplateManifest( self.__template, self.__cachedir ).scan().digest, m.digest )
+
+    def testCurrent(self):
+        m = TemplateManifest( self.__template, self.__cachedir ).scan()
+        self.assertTrue( m.is_current() )
+        # compiled python left in the template is not part of it
+        write_file( '%s/roles/a/x.pyc' % self.__template, 'pyc' )
+        m = TemplateManifest( self.__template, self.__cachedir ).scan()
+        self.assertFalse( m.files.has_key( 'roles/a/x.pyc' ) )
+        self.assertTrue( m.is_current() )
+
+        # a new file changes its directory's mtime
+        write_file( '%s/roles/a/new.yml' % self.__template, 'new', 1000 )
+        os.utime( '%s/roles/a' % self.__template, (5000, 5000) )
+        m2 = TemplateManifest( self.__template, self.__cachedir )
+        self.assertTrue( m2.load() )
+        self.assertFalse( m2.is_current() )
+        self.assertTrue( m2.scan().files.has_key( 'roles/a/new.yml' ) )
+
+        # so does a changed file's size or mtime
+        write_file( '%s/site.yml' % self.__template, 'changed', 1000 )
+        m3 = TemplateManifest( self.__template, self.__cachedir )
+        m3.load()
+        self.assertFalse( m3.is_current() )
+        self.assertNotEqual( m3.scan().digest, m2.digest )
+        self.assertTrue( m3.is_current() )
+
+    def testSync(self):
+        synced = sync_playbook( self.__dest, [self.__template], self.__cachedir )
+        self.assertEqual( synced, [self.__template] )
+        self.assertEqual( read_file( '%s/site.yml' % self.__dest ), 'site' )
+        self.assertTrue( os.path.isdir( '%s/empty' % self.__dest ) )
+        self.assertTrue( os.path.isdir( '%s/log' % self.__dest ) )
+        self.assertFalse( os.path.exists( '%s/log/ansible.log' % self.__dest ) )
+
+        # unchanged template leaves the playbook alone, even local changes
+        write_file( '%s/site.yml' % self.__dest, 'local' )
+        self.assertEqual( sync_playbook( self.__dest, [self.__template], self.__cachedir ), [] )
+        self.assertEqual( read_file( '%s/site.yml' % self.__dest ), 'local' )
+
+        # unless forced
+        sync_playbook( self.__dest, [self.__template], self.__cachedir, force=True )
+        self.assertEqual( read_file( '%s/site.yml' % self.__dest ), 'site' )
+
+        # a trusted manifest does not see template changes until a re-scan
+        write_file( '%s/roles/a/tasks/main.yml' % self.__template, 'new tasks', 3000 )
+        self.assertEqual( sync_playbook( self.__dest, [self.__template], self.__cachedir, trust=True ), [] )
+        self.assertEqual( sync_playbook( self.__dest, [self.__template], self.__cachedir ), [self.__template] )
+        self.assertEqual( read_file( '%s/roles/a/tasks/main.yml' % self.__dest ), 'new tasks' )
+        self.assertEqual( sync_playbook( self.__dest, [self.__template], self.__cachedir, trust=True ), [] )
+
+    def testLayers(self):
+        srcroots = [self.__template, self.__extra]
+        self.assertEqual( sync_playbook( self.__dest, srcroots, self.__cachedir ), srcroots )
+        self.assertEqual( read_file( '%s/site.yml' % self.__dest ), 'extra site' )
+        self.assertEqual( [ s for s, d in read_stamp( self.__dest ) ], srcroots )
+
+        # syncing just the base template is satisfied by the layered stamp
+        self.assertEqual( sync_playbook( self.__dest, [self.__template], self.__cachedir ), [] )
+
+        # a base template change re-applies the layers on top of it
+        write_file( '%s/roles/a/tasks/main.yml' % self.__template, 'new tasks', 3000 )
+        manifests = {}
+        self.assertEqual( sync_playbook( self.__dest, srcroots, self.__cachedir, manifests=manifests ), srcroots )
+        self.assertEqual( read_file( '%s/site.yml' % self.__dest ), 'extra site' )
+        self.assertEqual( sorted( manifests.keys() ), sorted( srcroots ) )
+
+        # an extra layer change only re-applies that layer
+        write_file( '%s/site.yml' % self.__extra, 'extra site 2', 4000 )
+        self.assertEqual( sync_playbook( self.__dest, srcroots, self.__cachedir ), [self.__extra] )
+        self.assertEqual( read_file( '%s/site.yml' % self.__dest ), 'extra site 2' )
+
+    def testConcurrentSync(self):
+        # i.e. installdatabase setting up playbooks from a thread pool
+        errors = []
+        def sync(i):
+            try:
+                sync_playbook( '%s/c%d/playbook' % (self.__tmpdir, i % 2), [self.__template], self.__cachedir )
+            except Exception, exc:
+                errors.append( exc )
+        threads = [ threading.Thread( target=sync, args=(i,) ) for i in range(8) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual( errors, [] )
+        self.assertEqual( read_file( '%s/c1/playbook/site.yml' % self.__tmpdir ), 'site' )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,155 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+import os
+import time
+import threading
+import shutil
+import tempfile
+import emtools.common.utils as utils
+from emtools.common.procengine import ProcessEngine
+
+class UtilsTest(unittest.TestCase):
+
+    def testSyscallLog(self):
+        rc, out, err = utils.syscall_log('sh -c "echo hello; echo oops 1>&2; exit 4"')
+        self.assertEqual( (rc, out, err), (4, 'hello', 'oops') )
+
+        # test hook
+        utils.syscall_cb = lambda cmd: (0, ' %s \n' % cmd, '')
+        try:
+            self.assertEqual( utils.syscall_log('some command'), (0, 'some command', '') )
+        finally:
+            utils.syscall_cb = None
+
+    def testTimeout(self):
+        start = time.time()
+        rc, out, err = utils.syscall_with_timeout(['sh', '-c', 'sleep 30 & sleep 30'], 1)
+        self.assertEqual( (rc, out, err), (-9, '', '') )
+        self.assertTrue( time.time() - start < 10 )
+
+    def testConcurrent(self):
+        engine = ProcessEngine()
+        start = time.time()
+        slow = engine.start(['sh', '-c', 'sleep 30'], timeout=1)
+        fast = [ engine.start(['sh', '-c', 'echo %d' % i]) for i in range(5) ]
+        chunks = []
+        streamed = engine.start(['sh', '-c', 'echo a; echo b 1>&2'], on_stdout=chunks.append)
+        engine.wait()
+        self.assertTrue( time.time() - start < 10 )
+        self.assertTrue( slow.timed_out )
+        self.assertEqual( [ (p.returncode, p.stdout) for p in fast ],
+                          [ (0, '%d\n' % i) for i in range(5) ] )
+        self.assertEqual( ''.join(chunks), 'a\n' )
+        self.assertEqual( streamed.stdout, '' )
+        self.assertEqual( streamed.stderr, 'b\n' )
+        self.assertEqual( engine.active(), [] )
+
+    def testThreads(self):
+        results = {}
+        def run(i):
+            results[i] = utils.syscall_with_timeout(['sh', '-c', 'sleep 0.2; echo %d' % i], 10)
+        threads = [ threading.Thread(target=run, args=(i,)) for i in range(8) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual( results, dict( (i, (0, '%d\n' % i, '')) for i in range(8) ) )
+
+    def testGroupsAndMaxbuf(self):
+        engine = ProcessEngine()
+        timed = engine.start(['sh', '-c', 'ps -o pgid= -p $$'], timeout=10)
+        plain = engine.start(['sh', '-c', 'ps -o pgid= -p $$; seq 1000 1>&2'], maxbuf=100)
+        engine.wait()
+        # only a command with a timeout leaves the caller's process group
+        self.assertEqual( int(plain.stdout), os.getpgrp() )
+        self.assertNotEqual( int(timed.stdout), os.getpgrp() )
+        self.assertEqual( len(plain.stderr), 100 )
+        self.assertTrue( plain.stderr.endswith('999\n1000\n') )
+        self.assertEqual( plain.truncated, set(['stderr']) )
+        self.assertEqual( timed.truncated, set() )
+
+        # a process without its own group is still killed on its own
+        p = engine.start(['sleep', '30'])
+        engine.kill(p)
+        self.assertEqual( p.returncode, -9 )
+
+    def testStreamMaxbuf(self):
+        s = utils.syscall_stream('sh -c "echo out; seq 1000 1>&2"', maxbuf=20)
+        self.assertEqual( list(s), [ 'out' ] )
+        self.assertTrue( s.stderr.startswith('[earlier output truncated]\n') )
+        self.assertTrue( s.stderr.endswith('\n1000') )
+
+    def testThreadsDontShareOutput(self):
+        # a command must not hold the output pipes of a command another
+        # thread starts at the same time, or that one doesn't finish 
+        # until this one exits
+        slow = []
+        def run_long():
+            engine = ProcessEngine()
+            for i in range(40):
+                engine.start(['sleep', '3'], timeout=10)
+            engine.wait()
+        def run_short():
+            for i in range(40):
+                start = time.time()
+                utils.syscall_with_timeout(['true'], 10)
+                if time.time() - start > 2:
+                    slow.append(i)
+        threads = [ threading.Thread(target=run_long) ] + [ threading.Thread(target=run_short) for i in range(4) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual( slow, [] )
+
+    def testZeroTimeout(self):
+        # as before the process engine, 0 means no timeout
+        rc, out, err = utils.syscall_with_timeout(['sh', '-c', 'sleep 0.2; echo done'], 0)
+        self.assertEqual( (rc, out), (0, 'done\n') )
+
+    def testCwd(self):
+        rc, out, err = utils.syscall_with_timeout(['pwd'], cwd='/')
+        self.assertEqual( out, '/\n' )
+
+    def testJsonFiles(self):
+        d = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(d, 'data.json')
+            self.assertEqual( utils.read_json(fname, {}), {} )
+            utils.write_json_atomic(fname, { 'a' : [1, 2] })
+            self.assertEqual( utils.read_json(fname), { 'a' : [1, 2] } )
+            # a failed write leaves the old file and no temporary file behind
+            self.assertRaises( TypeError, utils.write_json_atomic, fname, { 'a' : object() } )
+            self.assertEqual( utils.read_json(fname), { 'a' : [1, 2] } )
+            self.assertEqual( os.listdir(d), ['data.json'] )
+            # can't rename a file over a directory
+            os.mkdir(os.path.join(d, 'sub'))
+            self.assertRaises( OSError, utils.write_file_atomic, os.path.join(d, 'sub'), 'x' )
+            self.assertEqual( sorted(os.listdir(d)), ['data.json', 'sub'] )
+            open(fname, 'w').write('{')
+            self.assertEqual( utils.read_json(fname), None )
+        finally:
+            shutil.rmtree(d)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
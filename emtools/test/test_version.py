@@ -0,0 +1,58 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+
+'''
+import unittest
+from emtools.cluster.version import Version, parse_version, version_key, sort_versions
+
+class VersionTest(unittest.TestCase):
+
+    def testParse(self):
+        self.assertEqual( parse_version('4.0.0-1_old'), ([4, 0, 0], 1, '_old') )
+        self.assertEqual( parse_version('3.5.1.1'), ([3, 5, 1, 1], None, None) )
+        self.assertEqual( parse_version('foo.bar'), ([99, 99], None, None) )
+        with self.assertRaisesRegexp(Exception, 'A version must at least have.*'):
+            parse_version('4')
+        # the key is cached
+        self.assertTrue( version_key('4.5.1-2') is version_key('4.5.1-2') )
+
+    def testCompare(self):
+        self.assertTrue( Version('Latest') > Version('4.6') )
+        self.assertTrue( Version('4.5') > '4.5.9-9' )
+        self.assertTrue( Version('4.5.1.1') > '4.5.1-5' )
+        self.assertTrue( Version('4.5.1.1.1') > '4.5.1.2' )
+        self.assertTrue( Version('4.5.1-1') > '4.5.1' )
+        self.assertTrue( Version('4.5.1-1_old') < '4.5.1-1' )
+        self.assertTrue( Version('2.2.10-1') > Version('2.2.7-2') )
+        self.assertTrue( Version('4.0.0-0') <= '4.0.0-0' )
+        self.assertEqual( Version('4.5'), Version('4.5-3') )
+        self.assertNotEqual( Version('4.5.1'), '4.5.2' )
+        self.assertEqual( len( set( [ Version('4.5'), Version('4.5'), Version('4.6') ] ) ), 2 )
+        self.assertEqual( str( Version( Version('4.6.0-1') ) ), '4.6.0-1' )
+
+    def testSort(self):
+        versions = ['Latest', '2.2', '4.0.0-1_old', '2.2.10-1', '4.0.0-1', '1.0.6-1', '2.0.3.1-1', '2.2.7-2', '2.0.4-1']
+        expected = ['1.0.6-1', '2.0.3.1-1', '2.0.4-1', '2.2.7-2', '2.2.10-1', '2.2', '4.0.0-1_old', '4.0.0-1', 'Latest']
+        self.assertEqual( sort_versions(versions), expected )
+        self.assertEqual( [ str(v) for v in sorted( Version(v) for v in versions ) ], expected )
+        self.assertEqual( sort_versions(versions, reverse=True)[0], 'Latest' )
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
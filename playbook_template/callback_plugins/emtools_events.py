@@ -0,0 +1,64 @@
+# Copyright (C) 2014 InfiniDB, Inc.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; version 2 of
+# the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA 02110-1301, USA.
+
+'''
+emtools_events
+
+Ansible callback plugin that writes one line to stdout for each host
+result as soon as ansible has it:
+
+    EMTOOLS_EVENT {"host": <host>, "status": <status>, "result": <result>}
+
+where status is one of ok, failed, skipped or unreachable and result is
+the module result.  PlaybookMgr.stream_module() reads these lines through
+emtools.playbookstream.ModuleStream.
+
+The plugin does nothing unless EMTOOLS_EVENTS=1 is set in the environment
+so ordinary ansible and ansible-playbook runs are not affected.
+'''
+import os
+import sys
+import json
+
+EVENT_PREFIX = 'EMTOOLS_EVENT '
+
+class CallbackModule(object):
+
+    def __init__(self):
+        self.enabled = os.environ.get('EMTOOLS_EVENTS') == '1'
+
+    def _emit(self, host, status, res):
+        if not self.enabled:
+            return
+        if not isinstance(res, dict):
+            res = { 'msg' : '%s' % res }
+        line = json.dumps({ 'host' : host, 'status' : status, 'result' : res }, default=str)
+        # one write and a flush per line so that events are never split
+        sys.stdout.write('%s%s\n' % (EVENT_PREFIX, line))
+        sys.stdout.flush()
+
+    def runner_on_ok(self, host, res):
+        self._emit(host, 'ok', res)
+
+    def runner_on_failed(self, host, res, ignore_errors=False):
+        self._emit(host, 'failed', res)
+
+    def runner_on_skipped(self, host, item=None):
+        self._emit(host, 'skipped', { 'skipped' : True })
+
+    def runner_on_unreachable(self, host, res):
+        self._emit(host, 'unreachable', res)